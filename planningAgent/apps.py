@@ -1,4 +1,8 @@
 from django.apps import AppConfig
 
 class PlanningAgentConfig(AppConfig):
-    name = 'planningAgent'
\ No newline at end of file
+    name = 'planningAgent'
+
+    def ready(self):
+        # Register the CalendarEntry signal handlers (report cache invalidation)
+        from . import signals  # noqa: F401
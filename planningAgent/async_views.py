@@ -0,0 +1,147 @@
+# planning/async_views.py
+"""
+Async-native report endpoints (calculate, retrieve, CSV/PDF export) for ASGI deployments
+(uvicorn/daphne with planningAgent.asgi.application).
+
+The DRF viewsets are synchronous, so under ASGI every request holds a thread while it
+waits on the database. These plain Django async views await the async ORM instead and
+push CPU-bound work (grid computation, PDF rendering) to worker threads, so a single
+worker can keep many requests in flight. They accept the same session or HTTP Basic
+credentials as the DRF endpoints and return the same JSON representations.
+"""
+import functools
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .engine import DEFAULT_SLOT_MINUTES, SLOT_MINUTES_CHOICES
+from .models import AvailabilityReport, ArtifactKind, UserProfile
+from .serializers import REPORT_REPRESENTATIONS
+from .services import AvailabilityService, ArtifactService, ExportService
+from .views import _parse_bool, _parse_date, _parse_slot_minutes
+
+logger = logging.getLogger(__name__)
+
+
+def _error(detail, status):
+    return JsonResponse({"detail": detail}, status=status)
+
+
+def _authenticate(request):
+    """
+    Runs DRF's configured authentication classes (session with its CSRF check, HTTP Basic)
+    over the request. Returns (user, None), or (None, the 401/403 response).
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException as exc:
+        response = _error(exc.detail, exc.status_code)
+    else:
+        if user.is_authenticated:
+            return user, None
+        response = _error("Authentication credentials were not provided.", 401)
+    if response.status_code == 401:
+        headers = (authenticator.authenticate_header(drf_request) for authenticator in drf_request.authenticators)
+        response['WWW-Authenticate'] = next(filter(None, headers), 'Basic realm="api"')
+    return None, response
+
+
+def async_api_view(methods):
+    """
+    Turns an async function into an authenticated endpoint: checks the HTTP method and the
+    credentials with the same authentication classes as the DRF endpoints (CSRF is only
+    enforced for session-authenticated writes), then calls the view with the user's profile.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return _error(f"Method \"{request.method}\" not allowed.", 405)
+            # The authentication classes use the sync ORM
+            user, response = await sync_to_async(_authenticate)(request)
+            if response is not None:
+                return response
+            profile = await UserProfile.objects.filter(user=user).afirst()
+            if profile is None:
+                return _error("User profile not found.", 404)
+            return await view(request, profile, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _report_response(request, report, status=200):
+    view = request.GET.get('view', 'full')
+    if view not in REPORT_REPRESENTATIONS:
+        return _error(f"Invalid 'view'. Choose from {', '.join(REPORT_REPRESENTATIONS)}.", 400)
+    return JsonResponse(REPORT_REPRESENTATIONS[view](report).data, status=status)
+
+
+async def _get_report(profile, pk):
+    return await AvailabilityReport.objects.filter(user_profile=profile, pk=pk).with_grid_data().afirst()
+
+
+@async_api_view(['POST'])
+async def calculate_report(request, profile):
+    """Async version of POST /availability/calculate/ ('date', 'slot_minutes', 'force')."""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return _error("Request body must be JSON.", 400)
+    target_date = _parse_date(payload.get('date'))
+    if target_date is None:
+        return _error("Missing or invalid 'date' parameter (YYYY-MM-DD) in request body.", 400)
+    slot_minutes = _parse_slot_minutes(payload.get('slot_minutes', DEFAULT_SLOT_MINUTES))
+    if slot_minutes is None:
+        return _error(f"Invalid 'slot_minutes'. Choose from {', '.join(map(str, SLOT_MINUTES_CHOICES))}.", 400)
+
+    try:
+        service = AvailabilityService(user_profile=profile, slot_minutes=slot_minutes)
+        report, created = await service.aget_or_calculate_for_week(target_date, force=_parse_bool(payload.get('force')))
+    except Exception:
+        logger.exception("Availability calculation failed for profile %s (week of %s)", profile.pk, target_date)
+        return _error("An internal error occurred during calculation.", 500)
+    return _report_response(request, report, 201 if created else 200)
+
+
+@async_api_view(['GET'])
+async def retrieve_report(request, profile, pk):
+    report = await _get_report(profile, pk)
+    if report is None:
+        return _error("Report not found or not authorized.", 404)
+    return _report_response(request, report)
+
+
+async def _stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@async_api_view(['GET'])
+async def export_csv(request, profile, pk):
+    report = await _get_report(profile, pk)
+    if report is None:
+        return _error("Report not found or not authorized.", 404)
+    # Everything the CSV needs is loaded: stream it straight from the grid
+    response = StreamingHttpResponse(_stream(ExportService(report=report).stream_csv()), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="availability_report_{report.start_week}_{report.id}.csv"'
+    return response
+
+
+@async_api_view(['GET'])
+async def export_pdf(request, profile, pk):
+    report = await _get_report(profile, pk)
+    if report is None:
+        return _error("Report not found or not authorized.", 404)
+    kind = ArtifactKind.HEATMAP_PDF if request.GET.get('layout') == 'heatmap' else ArtifactKind.PDF
+    pdf_data = await ArtifactService(report).arender(kind)
+    response = HttpResponse(pdf_data, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="availability_report_{report.start_week}_{report.id}.pdf"'
+    return response
@@ -0,0 +1,109 @@
+# planning/benchmarking.py
+"""
+Synthetic calendars and timing helpers shared by the benchmark commands
+(run_benchmarks, benchmark_entry_queries).
+
+Datasets are reproducible: the same seed and scale always produce the same entries.
+Synthetic users are recognisable by their username prefix, so they can be removed
+afterwards without touching real data.
+"""
+import random
+import statistics
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from .models import CalendarEntry, EventCategory, UserProfile
+
+CATEGORIES = [value for value, _ in EventCategory.choices]
+
+
+def this_monday() -> datetime:
+    """Midnight (aware) at the start of the current week."""
+    today = timezone.localdate()
+    return timezone.make_aware(datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time()))
+
+
+def create_profiles(prefix: str, count: int):
+    """Bulk-creates `count` users named <prefix><n> with their profiles. Returns the profiles."""
+    usernames = [f"{prefix}{index}" for index in range(count)]
+    users = User.objects.bulk_create([User(username=username) for username in usernames])
+    if users[0].pk is None:
+        # MySQL does not return the new primary keys from a bulk insert
+        users = list(User.objects.filter(username__in=usernames).order_by('pk'))
+    UserProfile.objects.bulk_create([
+        UserProfile(user=user, first_name='Bench', last_name=str(index)) for index, user in enumerate(users)
+    ])
+    return list(UserProfile.objects.filter(user__username__in=usernames).select_related('user').order_by('pk'))
+
+
+def generate_entries(profile, first_week: datetime, weeks: int, count: int, overlap: float = 0.0,
+                     rng: random.Random = None, min_minutes: int = 15, max_minutes: int = 180):
+    """
+    Yields `count` unsaved entries for the profile, spread uniformly over `weeks` weeks from
+    first_week, lasting min_minutes to max_minutes in 15-minute steps. With probability
+    `overlap` an entry starts inside the previous one instead of at a random time, so 0.0
+    gives mostly disjoint calendars and 1.0 long chains of overlapping meetings.
+    """
+    rng = rng or random.Random(0)
+    span_minutes = weeks * 7 * 24 * 60
+    previous = None
+    for _ in range(count):
+        if previous is not None and rng.random() < overlap:
+            offset = rng.randrange(int((previous[1] - previous[0]).total_seconds() // 60))
+            start_time = previous[0] + timedelta(minutes=offset)
+        else:
+            start_time = first_week + timedelta(minutes=rng.randrange(span_minutes))
+        end_time = start_time + timedelta(minutes=15 * rng.randint(min_minutes // 15, max_minutes // 15))
+        previous = (start_time, end_time)
+        yield CalendarEntry(
+            user_profile=profile,
+            category=rng.choice(CATEGORIES),
+            title="Benchmark entry",
+            start_time=start_time,
+            end_time=end_time
+        )
+
+
+def bulk_insert(entries, batch_size: int = 1000) -> int:
+    """Inserts an iterable of unsaved entries batch by batch (no signals are sent). Returns the count."""
+    entries = iter(entries)
+    inserted = 0
+    while batch := list(islice(entries, batch_size)):
+        CalendarEntry.objects.bulk_create(batch)
+        inserted += len(batch)
+    return inserted
+
+
+def delete_profiles(prefix: str):
+    """Removes the synthetic users named <prefix>... and their data (see delete_created_profiles)."""
+    delete_created_profiles(UserProfile.objects.filter(user__username__startswith=prefix))
+
+
+def delete_created_profiles(profiles):
+    """
+    Removes exactly the given profiles, their users and their data, deleting entries with
+    plain DELETEs (no per-entry signals).
+    """
+    rows = [(profile.pk, profile.user_id) for profile in profiles]
+    table = connection.ops.quote_name(CalendarEntry._meta.db_table)
+    column = connection.ops.quote_name(CalendarEntry._meta.get_field('user_profile').column)
+    with connection.cursor() as cursor:
+        for profile_id, _ in rows:
+            cursor.execute(f"DELETE FROM {table} WHERE {column} = %s", [profile_id])
+    User.objects.filter(pk__in=[user_id for _, user_id in rows]).delete()
+
+
+def latency_stats(durations_ms):
+    """Summary statistics of a list of durations in milliseconds."""
+    durations = sorted(durations_ms)
+    return {
+        'count': len(durations),
+        'median': statistics.median(durations),
+        'p95': durations[int(0.95 * (len(durations) - 1))],
+        'min': durations[0],
+        'max': durations[-1],
+    }
@@ -0,0 +1,28 @@
+# planning/config/benchmark_settings.py
+"""
+Settings for the benchmark suite: the project settings on a throwaway SQLite database, so
+results are comparable between machines and runs and no real data is touched.
+
+    python manage.py run_benchmarks --settings=planningAgent.config.benchmark_settings --output results.json
+"""
+import os
+import tempfile
+
+from planningAgent.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver', 'localhost']
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('BENCHMARK_DB', os.path.join(tempfile.gettempdir(), 'planning_agent_benchmark.sqlite3')),
+    }
+}
+# Lets benchmark_entry_queries --compare-without-indexes drop indexes on this database
+BENCHMARK_DATABASE = True
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Measure the code paths, not the extras
+AVAILABILITY_INSTRUMENTATION = False
+AVAILABILITY_INCREMENTAL_UPDATES = False
+EXPORT_PRERENDER_KINDS = []
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
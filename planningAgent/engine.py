@@ -0,0 +1,379 @@
+# planning/engine.py
+"""
+Availability engines used by the AvailabilityService.
+
+An engine receives the (start_time, end_time) intervals of the calendar entries
+overlapping a week and returns a WeekGrid: the week's slots (15, 30 or 60 minutes
+long) stored as a bitset, where a set bit marks a busy slot. All engines are pure
+Python except 'numpy', which needs the optional NumPy dependency. The IntervalIndex
+answers free-time queries straight from the merged intervals, without any grid, and
+common_availability intersects several users' bitsets over an arbitrary window.
+"""
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+from functools import reduce
+from itertools import accumulate
+from operator import or_
+
+from django.utils import timezone
+
+DAYS_PER_WEEK = 7
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_SLOT_MINUTES = 60
+SLOT_MINUTES_CHOICES = (15, 30, 60)
+HORIZON_PERIODS = ('day', 'week', 'month')
+
+
+def range_mask(lo: int, hi: int) -> int:
+    """Returns the bitmask with the bits of the half-open slot range [lo, hi) set."""
+    return ((1 << (hi - lo)) - 1) << lo if lo < hi else 0
+
+
+class WeekGrid:
+    """
+    Compact availability grid for one week.
+
+    Slots are numbered from Monday 00:00 onwards; bit i of `busy` is set when slot i
+    overlaps at least one calendar entry. 672 fifteen-minute slots fit in a single
+    Python int, and busy-slot counts are popcounts instead of Python loops.
+    """
+
+    def __init__(self, slot_minutes: int = DEFAULT_SLOT_MINUTES, busy: int = 0):
+        if slot_minutes not in SLOT_MINUTES_CHOICES:
+            raise ValueError(f"Unsupported slot size: {slot_minutes} minutes. Choose from {SLOT_MINUTES_CHOICES}.")
+        self.slot_minutes = slot_minutes
+        self.slots_per_day = MINUTES_PER_DAY // slot_minutes
+        self.total_slots = DAYS_PER_WEEK * self.slots_per_day
+        self.busy = busy
+
+    @property
+    def slot_duration(self) -> timedelta:
+        return timedelta(minutes=self.slot_minutes)
+
+    @property
+    def busy_count(self) -> int:
+        return self.busy.bit_count()
+
+    @property
+    def available_count(self) -> int:
+        return self.total_slots - self.busy_count
+
+    @property
+    def available_hours(self) -> float:
+        return self.available_count * self.slot_minutes / 60
+
+    def day_available_hours(self):
+        """Returns the available hours of each day of the week, Monday first."""
+        day_mask = (1 << self.slots_per_day) - 1
+        return [
+            (self.slots_per_day - ((self.busy >> (day * self.slots_per_day)) & day_mask).bit_count()) * self.slot_minutes / 60
+            for day in range(DAYS_PER_WEEK)
+        ]
+
+    def mark_busy(self, lo: int, hi: int):
+        """Marks the half-open slot range [lo, hi) as busy."""
+        self.busy |= range_mask(lo, hi)
+
+    def replace_range(self, lo: int, hi: int, other: 'WeekGrid'):
+        """Copies the slots [lo, hi) from another grid of the same slot size, leaving the rest untouched."""
+        mask = range_mask(lo, hi)
+        self.busy = (self.busy & ~mask) | (other.busy & mask)
+
+    def is_available(self, slot: int) -> bool:
+        return not (self.busy >> slot) & 1
+
+    def slot_position(self, slot: int):
+        """Returns the (day_of_week, hour_of_day, minute_of_hour) at which a slot starts."""
+        day, slot_of_day = divmod(slot, self.slots_per_day)
+        hour, minute = divmod(slot_of_day * self.slot_minutes, 60)
+        return day, hour, minute
+
+    def iter_slots(self):
+        """Yields (day_of_week, hour_of_day, minute_of_hour, is_available) for every slot in order."""
+        for slot in range(self.total_slots):
+            yield (*self.slot_position(slot), self.is_available(slot))
+
+    def to_bytes(self) -> bytes:
+        """Packs the busy bitset into little-endian bytes (21 bytes for hourly slots)."""
+        return self.busy.to_bytes((self.total_slots + 7) // 8, 'little')
+
+    @classmethod
+    def from_bytes(cls, data: bytes, slot_minutes: int = DEFAULT_SLOT_MINUTES) -> 'WeekGrid':
+        return cls(slot_minutes, int.from_bytes(bytes(data), 'little'))
+
+    @classmethod
+    def from_slots(cls, slots, slot_minutes: int = DEFAULT_SLOT_MINUTES) -> 'WeekGrid':
+        """Builds a grid from (day_of_week, hour_of_day, minute_of_hour, is_available) tuples."""
+        grid = cls(slot_minutes)
+        for day, hour, minute, is_available in slots:
+            if not is_available:
+                slot = day * grid.slots_per_day + (hour * 60 + minute) // slot_minutes
+                grid.mark_busy(slot, slot + 1)
+        return grid
+
+    def __eq__(self, other):
+        if not isinstance(other, WeekGrid):
+            return NotImplemented
+        return self.slot_minutes == other.slot_minutes and self.busy == other.busy
+
+    def __repr__(self):
+        return f"<WeekGrid {self.slot_minutes}min busy={self.busy_count}/{self.total_slots}>"
+
+
+def interval_to_slots(start, end, window_start, slot=timedelta(minutes=DEFAULT_SLOT_MINUTES), total_slots=None):
+    """
+    Converts a datetime interval into the half-open slot range [lo, hi) it overlaps,
+    clamped to the window. A slot is touched if the interval overlaps it at all.
+    """
+    if total_slots is None:
+        total_slots = DAYS_PER_WEEK * (timedelta(days=1) // slot)
+    lo = (start - window_start) // slot
+    # Ceil division: the slot holding end_time is only touched if end_time is past its start
+    hi = -((window_start - end) // slot)
+    return max(lo, 0), min(hi, total_slots)
+
+
+def merge_slot_ranges(ranges):
+    """
+    Sorts slot ranges and merges the overlapping/adjacent ones into disjoint ranges.
+    Works for any comparable bounds, e.g. datetime intervals.
+    """
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            if hi > merged[-1][1]:
+                merged[-1][1] = hi
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+def sweep_slot_ranges(intervals, window_start, slot, total_slots):
+    """Converts intervals into slot ranges of the window, sorted and merged into disjoint ranges."""
+    ranges = []
+    for start, end in intervals:
+        lo, hi = interval_to_slots(start, end, window_start, slot, total_slots)
+        if lo < hi:
+            ranges.append((lo, hi))
+    return merge_slot_ranges(ranges)
+
+
+def sweep_engine(intervals, window_start, window_end, slot_minutes=DEFAULT_SLOT_MINUTES) -> WeekGrid:
+    """
+    Interval-sweep engine: O(N log N + slots).
+
+    Every interval is converted once into its slot range, the ranges are sorted and
+    merged, and the merged ranges are swept into the grid.
+    """
+    grid = WeekGrid(slot_minutes)
+    for lo, hi in sweep_slot_ranges(intervals, window_start, grid.slot_duration, grid.total_slots):
+        grid.mark_busy(lo, hi)
+    return grid
+
+
+def category_masks(rows, window_start, slot_minutes=DEFAULT_SLOT_MINUTES):
+    """
+    Sweeps (start_time, end_time, category) rows into one busy bitset per category, in a
+    single pass over the rows. Their union is exactly the sweep engine's busy grid.
+    """
+    grid = WeekGrid(slot_minutes)
+    ranges_by_category = {}
+    for start, end, category in rows:
+        lo, hi = interval_to_slots(start, end, window_start, grid.slot_duration, grid.total_slots)
+        if lo < hi:
+            ranges_by_category.setdefault(category, []).append((lo, hi))
+
+    masks = {}
+    for category, ranges in ranges_by_category.items():
+        mask = 0
+        for lo, hi in merge_slot_ranges(ranges):
+            mask |= range_mask(lo, hi)
+        masks[category] = mask
+    return masks
+
+
+def weighted_availability_ratio(masks, total_slots, weights=None, excluded=()) -> float:
+    """
+    Availability ratio where each category counts with its own weight.
+
+    A slot covered only by `excluded` categories (e.g. SLEEP) is left out of the ratio
+    entirely instead of counting as busy. Any other busy slot counts as `weight` busy
+    slots (default 1.0, so 0.5 makes a GYM hour half busy); a slot covered by several
+    categories takes the highest weight among them.
+    """
+    weights = weights or {}
+    counted = [(weights.get(category, 1.0), mask) for category, mask in masks.items() if category not in excluded]
+    counted_busy = reduce(or_, (mask for _, mask in counted), 0)
+    excluded_only = reduce(or_, (mask for category, mask in masks.items() if category in excluded), 0) & ~counted_busy
+
+    considered_slots = total_slots - excluded_only.bit_count()
+    if considered_slots <= 0:
+        return 0.0
+
+    # Heaviest categories first, so each slot is charged its highest weight once
+    weighted_busy = 0.0
+    charged = 0
+    for weight, mask in sorted(counted, key=lambda item: item[0], reverse=True):
+        weighted_busy += weight * (mask & ~charged).bit_count()
+        charged |= mask
+    return (considered_slots - weighted_busy) / considered_slots
+
+
+def slot_scan_engine(intervals, window_start, window_end, slot_minutes=DEFAULT_SLOT_MINUTES) -> WeekGrid:
+    """
+    Reference engine: O(slots * N).
+
+    Iterates through every slot of the week and checks each slot against all the
+    intervals. Kept as the baseline the faster engines are checked against.
+    """
+    intervals = list(intervals)
+    grid = WeekGrid(slot_minutes)
+
+    current_slot_start = window_start
+    slot_index = 0
+    while current_slot_start < window_end:
+        current_slot_end = current_slot_start + grid.slot_duration
+
+        # Overlap condition: (A_start < B_end) AND (A_end > B_start)
+        # A = Event time, B = Slot time
+        for start, end in intervals:
+            if start < current_slot_end and end > current_slot_start:
+                grid.mark_busy(slot_index, slot_index + 1)
+                break  # Found one overlapping event, slot is busy.
+
+        # Move to the next slot
+        current_slot_start = current_slot_end
+        slot_index += 1
+
+    return grid
+
+
+def numpy_engine(intervals, window_start, window_end, slot_minutes=DEFAULT_SLOT_MINUTES) -> WeekGrid:
+    """
+    Vectorized engine: difference array over NumPy slot indices (see planningAgent.vectorized).
+    Requires NumPy, which is imported on first use.
+    """
+    vectorized = import_vectorized()
+    grid = WeekGrid(slot_minutes)
+    busy = vectorized.busy_slots(intervals, window_start, grid.total_slots, slot_minutes)
+    return WeekGrid.from_bytes(vectorized.pack_busy(busy), slot_minutes)
+
+
+def import_vectorized():
+    """Imports the NumPy-backed module, with a clear error when NumPy is not installed."""
+    try:
+        from . import vectorized
+    except ImportError as exc:
+        raise ImportError("The 'numpy' availability engine requires NumPy. Install it with: pip install numpy") from exc
+    return vectorized
+
+
+class IntervalIndex:
+    """
+    Sorted, merged busy intervals of a calendar, answering free-time queries without
+    materializing any slot grid. Building costs O(N log N); a query bisects to its start
+    and walks only the intervals inside the queried range.
+    """
+
+    def __init__(self, intervals):
+        self.busy = merge_slot_ranges((start, end) for start, end in intervals if start < end)
+        self._ends = [end for _, end in self.busy]
+
+    def free_windows(self, range_start, range_end, min_duration=timedelta(0), working_hours=None, weekdays_only=False):
+        """
+        Returns the (start, end) free windows inside [range_start, range_end) lasting at least
+        min_duration. `working_hours` is an optional (start_minute, end_minute) pair of local
+        minutes since midnight; free time outside it (and on weekends when `weekdays_only`)
+        is dropped.
+        """
+        free = []
+        cursor = range_start
+        # First busy interval that ends after the range starts
+        for start, end in self.busy[bisect_right(self._ends, range_start):]:
+            if start >= range_end:
+                break
+            if start > cursor:
+                free.append((cursor, start))
+            cursor = max(cursor, end)
+        if cursor < range_end:
+            free.append((cursor, range_end))
+
+        if working_hours is not None or weekdays_only:
+            free = intersect_windows(free, working_windows(range_start, range_end, working_hours, weekdays_only))
+        return [(start, end) for start, end in free if end - start >= min_duration]
+
+
+def working_windows(range_start, range_end, working_hours=None, weekdays_only=False):
+    """Yields the daily (start, end) working windows, in the current timezone, covering the range."""
+    start_minute, end_minute = working_hours or (0, MINUTES_PER_DAY)
+    day = timezone.localtime(range_start).date()
+    last_day = timezone.localtime(range_end).date()
+    while day <= last_day:
+        if not weekdays_only or day.weekday() < 5:
+            midnight = timezone.make_aware(datetime.combine(day, time.min))
+            yield midnight + timedelta(minutes=start_minute), midnight + timedelta(minutes=end_minute)
+        day += timedelta(days=1)
+
+
+def intersect_windows(windows, other_windows):
+    """Intersects two sorted lists of disjoint (start, end) windows with a two-pointer walk."""
+    result = []
+    other_windows = list(other_windows)
+    i = j = 0
+    while i < len(windows) and j < len(other_windows):
+        start = max(windows[i][0], other_windows[j][0])
+        end = min(windows[i][1], other_windows[j][1])
+        if start < end:
+            result.append((start, end))
+        if windows[i][1] < other_windows[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def iter_bit_runs(mask: int):
+    """Yields the (lo, hi) slot ranges of consecutive set bits in a bitmask, lowest first."""
+    offset = 0
+    while mask:
+        skip = (mask & -mask).bit_length() - 1
+        mask >>= skip
+        run = (~mask & (mask + 1)).bit_length() - 1  # Number of trailing ones
+        yield offset + skip, offset + skip + run
+        mask >>= run
+        offset += skip + run
+
+
+def common_availability(intervals_by_user, window_start, window_end, slot_minutes=DEFAULT_SLOT_MINUTES):
+    """
+    Intersects the availability of several users over an arbitrary window.
+
+    Each user's intervals are swept into a busy bitset; the slots free for everyone are the
+    bitwise AND of the users' free bitsets (one C-level big-int operation per user). The
+    per-slot count of free users comes from a difference array over the merged ranges.
+    Returns (common_free_mask, free_counts, total_slots).
+    """
+    intervals_by_user = list(intervals_by_user)
+    slot = timedelta(minutes=slot_minutes)
+    total_slots = -((window_start - window_end) // slot)
+    all_slots = range_mask(0, total_slots)
+    common_free = all_slots
+    busy_diff = [0] * (total_slots + 1)
+    for intervals in intervals_by_user:
+        busy = 0
+        for lo, hi in sweep_slot_ranges(intervals, window_start, slot, total_slots):
+            busy |= range_mask(lo, hi)
+            busy_diff[lo] += 1
+            busy_diff[hi] -= 1
+        common_free &= all_slots & ~busy
+
+    attendees = len(intervals_by_user)
+    free_counts = [attendees - busy_count for busy_count in accumulate(busy_diff[:total_slots])]
+    return common_free, free_counts, total_slots
+
+
+ENGINES = {
+    'sweep': sweep_engine,
+    'scan': slot_scan_engine,
+    'numpy': numpy_engine,
+}
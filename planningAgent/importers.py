@@ -0,0 +1,230 @@
+# planning/importers.py
+"""
+Streaming parsers for bulk calendar imports (CalendarImportService).
+
+Each parser reads a text stream incrementally and yields (row_number, fields) pairs, where
+fields holds the raw 'external_id', 'title', 'category', 'start_time' and 'end_time' values
+of one entry. Nothing is validated here: iCalendar dates are converted to datetimes when
+they parse, and everything else is left for the service to check chunk by chunk, so a
+malformed row is reported without stopping the import.
+
+Supported formats:
+- 'csv': a header row with the field names above (extra columns are ignored);
+- 'json': an array of objects, or {"entries": [...]} (loaded in one piece);
+- 'ndjson': one JSON object per line;
+- 'ics': VEVENT components of an iCalendar file (UID, SUMMARY, CATEGORIES, DTSTART and
+  DTEND or DURATION). Recurrence rules are not expanded: only the first occurrence is read.
+"""
+import csv
+import json
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+
+from .models import EventCategory
+
+IMPORT_FIELDS = ('external_id', 'title', 'category', 'start_time', 'end_time')
+
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/calendar': 'ics',
+}
+
+
+class ImportFormatError(ValueError):
+    """The payload as a whole cannot be read (as opposed to a single invalid row)."""
+
+
+_CATEGORY_NAMES = {
+    **{str(value).lower(): value for value in EventCategory.values},
+    **{str(label).lower(): value for value, label in EventCategory.choices},
+}
+
+
+def resolve_category(name):
+    """Returns the EventCategory value matching a code ('MEET') or label ('Meeting'), or None."""
+    return _CATEGORY_NAMES.get(str(name).strip().lower())
+
+
+def _project(record):
+    return {field: record.get(field) for field in IMPORT_FIELDS}
+
+
+def parse_csv(lines):
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None:
+        return
+    missing = {'start_time', 'end_time'} - set(reader.fieldnames)
+    if missing:
+        raise ImportFormatError(f"CSV header is missing: {', '.join(sorted(missing))}.")
+    for row in reader:
+        # Data starts on line 2, after the header
+        yield reader.line_num, _project(row)
+
+
+def parse_json(lines):
+    try:
+        payload = json.loads(''.join(lines))
+    except ValueError as exc:
+        raise ImportFormatError(f"Invalid JSON: {exc}.")
+    if isinstance(payload, dict):
+        payload = payload.get('entries')
+    if not isinstance(payload, list):
+        raise ImportFormatError("JSON payload must be a list of entries or an object with an 'entries' list.")
+    for index, record in enumerate(payload, start=1):
+        yield index, _project(record) if isinstance(record, dict) else {'__error__': "Entry must be an object."}
+
+
+def parse_ndjson(lines):
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, {'__error__': "Line is not valid JSON."}
+            continue
+        yield line_number, _project(record) if isinstance(record, dict) else {'__error__': "Entry must be an object."}
+
+
+def _unfold(lines):
+    """Joins iCalendar continuation lines (starting with a space or tab) to the line they continue."""
+    current, current_number = None, 0
+    for line_number, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current_number, current
+        current, current_number = line, line_number
+    if current is not None:
+        yield current_number, current
+
+
+def _split_property(line):
+    """Splits 'NAME;PARAM=VALUE:value' into (NAME, {PARAM: VALUE}, value)."""
+    in_quotes = False
+    for position, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ':' and not in_quotes:
+            head, value = line[:position], line[position + 1:]
+            break
+    else:
+        return None, {}, ''
+    name, *params = head.split(';')
+    parameters = {}
+    for param in params:
+        key, _, param_value = param.partition('=')
+        parameters[key.upper()] = param_value.strip('"')
+    return name.upper(), parameters, value
+
+
+def _unescape(value):
+    return (value.replace('\\n', '\n').replace('\\N', '\n')
+            .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+_DURATION = re.compile(r'^P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+
+def _parse_duration(value):
+    """Parses a positive iCalendar DURATION such as 'PT1H30M' or 'P1D', or returns None."""
+    match = _DURATION.match(value.strip().lstrip('+'))
+    if match is None or not any(match.groups()):
+        return None
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def parse_ics_datetime(value, parameters):
+    """
+    Converts a DATE or DATE-TIME value to an aware datetime: UTC when it ends with 'Z', in its
+    TZID otherwise, and in the current time zone for floating times and all-day dates.
+    """
+    value = value.strip()
+    if parameters.get('VALUE') == 'DATE' or len(value) == 8:
+        return timezone.make_aware(datetime.strptime(value, '%Y%m%d'))
+    if value.endswith('Z'):
+        return datetime.strptime(value[:-1], '%Y%m%dT%H%M%S').replace(tzinfo=dt_timezone.utc)
+    naive = datetime.strptime(value, '%Y%m%dT%H%M%S')
+    if 'TZID' in parameters:
+        try:
+            return naive.replace(tzinfo=ZoneInfo(parameters['TZID']))
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone '{parameters['TZID']}'.")
+    return timezone.make_aware(naive)
+
+
+def parse_ics(lines):
+    event, event_line, depth = None, 0, 0
+    for line_number, line in _unfold(lines):
+        name, parameters, value = _split_property(line)
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and event is None:
+                event, event_line, depth = {}, line_number, 0
+            elif event is not None:
+                depth += 1 # e.g. a VALARM inside the event
+            continue
+        if name == 'END' and event is not None:
+            if depth:
+                depth -= 1
+            elif value.upper() == 'VEVENT':
+                yield event_line, _finish_event(event)
+                event = None
+            continue
+        if event is None or depth:
+            continue
+
+        if name == 'UID':
+            event['external_id'] = value.strip()
+        elif name == 'SUMMARY':
+            event['title'] = _unescape(value)
+        elif name == 'CATEGORIES':
+            # iCalendar categories are free text: the first one that names an entry category wins
+            labels = [_unescape(label).strip() for label in value.split(',')]
+            event['category'] = next(filter(None, map(resolve_category, labels)), EventCategory.OTHER)
+        elif name in ('DTSTART', 'DTEND'):
+            field = 'start_time' if name == 'DTSTART' else 'end_time'
+            try:
+                event[field] = parse_ics_datetime(value, parameters)
+            except ValueError:
+                event[field] = value
+            if name == 'DTSTART' and (parameters.get('VALUE') == 'DATE' or len(value.strip()) == 8):
+                event['all_day'] = True
+        elif name == 'DURATION':
+            event['duration'] = _parse_duration(value)
+    if event is not None:
+        yield event_line, {'__error__': "VEVENT is not closed."}
+
+
+def _finish_event(event):
+    """Derives the end of an event without DTEND from its DURATION, or from an all-day DTSTART (one day)."""
+    start_time = event.get('start_time')
+    if event.get('end_time') is None and isinstance(start_time, datetime):
+        if event.get('duration') is not None:
+            event['end_time'] = start_time + event['duration']
+        elif event.get('all_day'):
+            event['end_time'] = start_time + timedelta(days=1)
+    return _project(event)
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'json': parse_json,
+    'ndjson': parse_ndjson,
+    'ics': parse_ics,
+}
+
+
+def iter_import_rows(lines, file_format):
+    """Yields (row_number, fields) for every entry of a text stream in the given format."""
+    if file_format not in PARSERS:
+        raise ImportFormatError(f"Unknown import format '{file_format}'. Choose from: {', '.join(PARSERS)}.")
+    return PARSERS[file_format](lines)
@@ -0,0 +1,240 @@
+# planning/instrumentation.py
+"""
+Timing and query instrumentation for the availability and export hot paths.
+
+Phases of the work are wrapped in spans (span('availability.grid'), @timed('export.pdf')).
+Each span records its duration and the number and time of the SQL queries it ran. Totals
+go to an in-process registry served in the Prometheus text format
+(GET /api/v1/metrics/). With AVAILABILITY_SERVER_TIMING, the phases of each request are
+also reported in a Server-Timing response header, which browser dev tools display.
+
+Everything is off unless AVAILABILITY_INSTRUMENTATION is set: span() then returns a
+shared no-op context manager and count() returns at once, so the hot paths pay one
+settings lookup per call. The registry is per process; with several workers, scrape
+each one (or aggregate the series in Prometheus).
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+# Upper bounds of the duration histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    'availability_phase_seconds': ('histogram', "Duration of an instrumented phase."),
+    'availability_phase_errors_total': ('counter', "Phases that raised an exception."),
+    'availability_phase_queries_total': ('counter', "SQL queries run inside a phase."),
+    'availability_phase_query_seconds_total': ('counter', "Time spent in SQL queries inside a phase."),
+    'availability_entries_total': ('counter', "Calendar entries read to build reports."),
+    'availability_slots_total': ('counter', "Slots computed for reports."),
+    'availability_request_seconds': ('histogram', "Duration of instrumented HTTP requests."),
+    'availability_request_queries_total': ('counter', "SQL queries run by HTTP requests."),
+    'availability_request_query_seconds_total': ('counter', "Time spent in SQL queries by HTTP requests."),
+}
+
+_NULL_SPAN = nullcontext()
+# (phase, seconds, queries) of the spans run for the current request, when one is being timed
+_request_timings = ContextVar('availability_request_timings', default=None)
+
+
+def enabled() -> bool:
+    return getattr(settings, 'AVAILABILITY_INSTRUMENTATION', False)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and label values."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total = self._histograms.get(key, ([0] * len(BUCKETS), [0, 0.0]))
+            for index, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    buckets[index] += 1
+            total[0] += 1
+            total[1] += value
+            self._histograms[key] = (buckets, total)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Returns every series in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(buckets), list(total))) for key, (buckets, total) in self._histograms.items())
+
+        series = {}
+        for (name, labels), value in counters:
+            series.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), (buckets, (count, total)) in histograms:
+            lines = series.setdefault(name, [])
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        output = []
+        for name in sorted(series):
+            kind, description = METRICS.get(name, ('untyped', ''))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(series[name])
+        return '\n'.join(output) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def _query_counter(totals):
+    """Returns a database execute wrapper adding each query's count and duration to totals."""
+    def count_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            totals[0] += 1
+            totals[1] += time.perf_counter() - started
+    return count_query
+
+
+def span(name: str):
+    """Context manager timing one phase, e.g. `with span('availability.save'): ...`."""
+    if not enabled():
+        return _NULL_SPAN
+    return _span(name)
+
+
+@contextmanager
+def _span(name):
+    queries = [0, 0.0]
+    started = time.perf_counter()
+    try:
+        with connection.execute_wrapper(_query_counter(queries)):
+            yield
+    except BaseException:
+        REGISTRY.inc('availability_phase_errors_total', phase=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        REGISTRY.observe('availability_phase_seconds', elapsed, phase=name)
+        REGISTRY.inc('availability_phase_queries_total', queries[0], phase=name)
+        REGISTRY.inc('availability_phase_query_seconds_total', queries[1], phase=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed, queries[0]))
+
+
+def timed(name: str):
+    """Decorator form of span() for functions and methods."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: int):
+    """Adds to one of the availability_*_total counters, e.g. count('availability_slots_total', 672)."""
+    if enabled():
+        REGISTRY.inc(name, value)
+
+
+class InstrumentationMiddleware:
+    """
+    Times each request and the spans it runs. Adds the request's query count and time to the
+    metrics and, with AVAILABILITY_SERVER_TIMING, a Server-Timing header such as
+    `db;dur=4.1;desc="6 queries", availability.grid;dur=2.3, total;dur=12.0`.
+
+    Under ASGI the queries of async views run in worker threads, so only the spans (which
+    count the queries of the thread they run in) report them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+
+        timings, queries = [], [0, 0.0]
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(_query_counter(queries)):
+                response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        self._finish(response, time.perf_counter() - started, timings, queries)
+        return response
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+
+        timings = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        self._finish(response, time.perf_counter() - started, timings, None)
+        return response
+
+    @staticmethod
+    def _finish(response, elapsed, timings, queries):
+        REGISTRY.observe('availability_request_seconds', elapsed)
+        metrics = []
+        if queries is not None:
+            REGISTRY.inc('availability_request_queries_total', queries[0])
+            REGISTRY.inc('availability_request_query_seconds_total', queries[1])
+            metrics.append(f'db;dur={queries[1] * 1000:.1f};desc="{queries[0]} queries"')
+        if not getattr(settings, 'AVAILABILITY_SERVER_TIMING', False):
+            return
+        # Phases repeated within the request (e.g. one grid per week of a range) are summed
+        phases = {}
+        for name, seconds, _ in timings:
+            phases[name] = phases.get(name, 0.0) + seconds
+        metrics.extend(f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases.items())
+        metrics.append(f"total;dur={elapsed * 1000:.1f}")
+        response['Server-Timing'] = ', '.join(metrics)
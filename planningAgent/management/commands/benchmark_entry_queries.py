@@ -0,0 +1,133 @@
+# planning/management/commands/benchmark_entry_queries.py
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from planningAgent import benchmarking
+from planningAgent.models import CalendarEntry
+
+BENCH_USERNAME_PREFIX = 'bench-entries-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the CalendarEntry window lookup used by the availability calculation: "
+        "creates a synthetic dataset, prints the query plan (EXPLAIN) and latency, and with "
+        "--compare-without-indexes measures again without the composite window indexes (only "
+        "on the benchmark settings' database or a database whose name ends in '_bench'). "
+        "The synthetic rows are removed afterwards. Run it against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help="Synthetic users to create.")
+        parser.add_argument('--entries-per-user', type=int, default=2000, help="Calendar entries per user.")
+        parser.add_argument('--weeks', type=int, default=104, help="Weeks of history the entries are spread over.")
+        parser.add_argument('--queries', type=int, default=200, help="Window lookups to time per phase.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--compare-without-indexes', action='store_true',
+                            help="Also measure with the composite indexes dropped (they are re-created afterwards).")
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help="Do not ask for confirmation.")
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['entries_per_user'], options['weeks'], options['queries']) < 1:
+            raise CommandError("--users, --entries-per-user, --weeks and --queries must be at least 1.")
+        if options['compare_without_indexes'] and not self._is_benchmark_database():
+            raise CommandError(
+                "--compare-without-indexes drops indexes: it only runs with "
+                "--settings=planningAgent.config.benchmark_settings or on a database whose name ends in '_bench'."
+            )
+        if options['interactive']:
+            answer = input(
+                f"This creates {options['users'] * options['entries_per_user']} calendar entries in the "
+                f"'{connection.alias}' database ({connection.vendor}) and deletes them afterwards. Continue? [y/N] "
+            )
+            if answer.lower() not in ('y', 'yes'):
+                raise CommandError("Benchmark cancelled.")
+
+        rng = random.Random(options['seed'])
+        first_week = benchmarking.this_monday() - timedelta(weeks=options['weeks'])
+        profiles = [] # Only the rows created here are deleted afterwards
+        try:
+            self._create_dataset(profiles, rng, first_week, options)
+            # The same (user, week) windows are timed in every phase
+            windows = [
+                (rng.choice(profiles).pk, first_week + timedelta(weeks=rng.randrange(options['weeks'] + 1)))
+                for _ in range(options['queries'])
+            ]
+            results = [self._measure("with composite indexes", windows)]
+            if options['compare_without_indexes']:
+                with self._without_window_indexes():
+                    results.append(self._measure("without composite indexes", windows))
+        finally:
+            benchmarking.delete_created_profiles(profiles)
+
+        for label, stats in results:
+            self.stdout.write(
+                f"{label}: median {stats['median']:.2f} ms, p95 {stats['p95']:.2f} ms, "
+                f"max {stats['max']:.2f} ms over {stats['count']} queries"
+            )
+        if len(results) == 2 and results[0][1]['median']:
+            speedup = results[1][1]['median'] / results[0][1]['median']
+            self.stdout.write(self.style.SUCCESS(f"Median speed-up from the indexes: {speedup:.1f}x"))
+
+    @staticmethod
+    def _is_benchmark_database():
+        """The throwaway database of the benchmark settings, or one explicitly named for benchmarks."""
+        return getattr(settings, 'BENCHMARK_DATABASE', False) or str(connection.settings_dict['NAME']).endswith('_bench')
+
+    @staticmethod
+    def _window_query(profile_id, start_dt):
+        """The lookup AvailabilityService._fetch_week_entries runs for one week."""
+        return CalendarEntry.objects.filter(
+            user_profile_id=profile_id,
+            start_time__lt=start_dt + timedelta(days=7),
+            end_time__gt=start_dt
+        ).order_by('start_time').values_list('id', 'start_time', 'end_time', 'category')
+
+    def _create_dataset(self, profiles, rng, first_week, options):
+        """Bulk-creates the synthetic users and their entries (no signals are sent), adding the users to `profiles`."""
+        started = time.monotonic()
+        profiles.extend(benchmarking.create_profiles(BENCH_USERNAME_PREFIX, options['users']))
+        for profile in profiles:
+            benchmarking.bulk_insert(benchmarking.generate_entries(
+                profile, first_week, options['weeks'], options['entries_per_user'], rng=rng, max_minutes=8 * 60
+            ))
+        self.stdout.write(
+            f"Created {len(profiles)} users and {len(profiles) * options['entries_per_user']} entries "
+            f"in {time.monotonic() - started:.1f}s."
+        )
+
+    def _measure(self, label, windows):
+        """Prints the query plan of the first window and returns (label, latency stats in ms)."""
+        profile_id, start_dt = windows[0]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Query plan {label}:"))
+        self.stdout.write(self._window_query(profile_id, start_dt).explain())
+
+        durations = []
+        for profile_id, start_dt in windows:
+            started = time.perf_counter()
+            list(self._window_query(profile_id, start_dt))
+            durations.append((time.perf_counter() - started) * 1000)
+        return label, benchmarking.latency_stats(durations)
+
+    @contextmanager
+    def _without_window_indexes(self):
+        """Drops the CalendarEntry composite indexes for the duration of a with block."""
+        indexes = CalendarEntry._meta.indexes
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(CalendarEntry, index)
+        self.stdout.write(f"Dropped {', '.join(index.name for index in indexes)}.")
+        try:
+            yield
+        finally:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(CalendarEntry, index)
+            self.stdout.write("Re-created the composite indexes.")
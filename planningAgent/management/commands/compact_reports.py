@@ -0,0 +1,52 @@
+# planning/management/commands/compact_reports.py
+from django.core.management.base import BaseCommand, CommandError
+
+from planningAgent.services import ReportRetentionService
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes duplicate and superseded availability reports with their detail rows, in small "
+        "batches with an optional pause between them so production tables are never locked for "
+        "long. The newest report of every user, week and slot size is always kept. Schedule it "
+        "(e.g. nightly) with the retention options, and try it with --dry-run first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-latest', type=int, help="Reports kept per user, week and slot size.")
+        parser.add_argument('--max-age-days', type=int,
+                            help="Delete the reports created more than this many days ago (except the newest of each week).")
+        parser.add_argument('--no-dedupe', action='store_true',
+                            help="Keep older reports that were computed from the same calendar as a newer one.")
+        parser.add_argument('--batch-size', type=int, default=ReportRetentionService.BATCH_SIZE,
+                            help="Reports deleted per transaction.")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches, to leave room for production traffic.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be deleted.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options['sleep'] < 0:
+            raise CommandError("--sleep must not be negative.")
+        try:
+            service = ReportRetentionService(
+                keep_latest=options['keep_latest'],
+                max_age_days=options['max_age_days'],
+                dedupe=not options['no_dedupe'],
+                batch_size=options['batch_size'],
+                pause_seconds=options['sleep'],
+                dry_run=options['dry_run']
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        verb = "would be deleted" if options['dry_run'] else "deleted"
+        summary = service.compact(on_batch=lambda progress: self.stdout.write(
+            f"{progress['reports_deleted']} reports and {progress['details_deleted']} detail rows {verb}..."
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {summary['scanned']} reports: {summary['duplicate']} duplicate, {summary['over_limit']} over "
+            f"the limit, {summary['expired']} expired. {summary['reports_deleted']} reports and "
+            f"{summary['details_deleted']} detail rows {verb}."
+        ))
@@ -0,0 +1,40 @@
+# planning/management/commands/rebuild_availability_aggregates.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from planningAgent.models import AvailabilityAggregate, AvailabilityReport
+from planningAgent.services import AggregateService
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily, weekly and monthly availability aggregates from the latest report "
+        "of every user, week and slot size. New reports keep the aggregates up to date on their "
+        "own: run this once after deploying the aggregate table, or to repair it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Reports read and aggregated per transaction.")
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete every aggregate first (drops the periods whose reports are gone).")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options['clear']:
+            deleted, _ = AvailabilityAggregate.objects.all().delete()
+            self.stdout.write(f"Deleted {deleted} aggregates.")
+
+        # The id of the latest report of each (user, week, slot size)
+        latest_ids = list(
+            AvailabilityReport.objects.latest_per_week()
+            .order_by('user_profile_id', 'start_week', 'slot_minutes')
+            .values_list('pk', flat=True)
+        )
+        for offset in range(0, len(latest_ids), options['batch_size']):
+            batch = latest_ids[offset:offset + options['batch_size']]
+            reports = AvailabilityReport.objects.filter(pk__in=batch).with_grid_data()
+            with transaction.atomic():
+                AggregateService.record((report, report.get_grid()) for report in reports)
+            self.stdout.write(f"[{offset + len(batch)}/{len(latest_ids)}] reports aggregated")
+        self.stdout.write(self.style.SUCCESS(f"Done: {len(latest_ids)} reports aggregated."))
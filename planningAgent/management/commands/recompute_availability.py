@@ -0,0 +1,165 @@
+# planning/management/commands/recompute_availability.py
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from planningAgent.engine import DEFAULT_SLOT_MINUTES, SLOT_MINUTES_CHOICES
+
+
+def _init_worker():
+    """Runs once in every worker process: set up Django and never reuse the parent's DB connections."""
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
+
+def _recompute_chunk(profile_ids, start_date, end_date, slot_minutes, storage):
+    """Recomputes the reports of one chunk of profiles. Returns (profile_ids, report_count)."""
+    from planningAgent.models import UserProfile
+    from planningAgent.services import BulkAvailabilityService
+
+    close_old_connections()
+    try:
+        profiles = list(UserProfile.objects.filter(pk__in=profile_ids))
+        service = BulkAvailabilityService(profiles, slot_minutes=slot_minutes, storage=storage)
+        reports = service.calculate_for_range(start_date, end_date)
+        return profile_ids, len(reports)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the availability reports of every user over a date range, splitting the "
+        "users in chunks across worker processes. Progress is checkpointed to a state file "
+        "so an interrupted run can continue with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help="First day of the range (YYYY-MM-DD). Defaults to this week's Monday.")
+        parser.add_argument('--end-date', help="Last day of the range (YYYY-MM-DD). Defaults to the start date.")
+        parser.add_argument('--slot-minutes', type=int, default=DEFAULT_SLOT_MINUTES, choices=SLOT_MINUTES_CHOICES)
+        parser.add_argument('--storage', choices=('rows', 'packed'), help="Detail storage mode (default: settings).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes; 0 runs everything in this process.")
+        parser.add_argument('--chunk-size', type=int, default=50, help="Users per task.")
+        parser.add_argument('--max-tasks-per-worker', type=int, default=None,
+                            help="Recycle a worker process (and its DB connection) after this many tasks.")
+        parser.add_argument('--state-file', default='recompute_availability.state.json',
+                            help="Checkpoint file recording the completed users.")
+        parser.add_argument('--resume', action='store_true',
+                            help="Skip the users already completed according to --state-file.")
+
+    def handle(self, *args, **options):
+        from planningAgent.models import UserProfile
+
+        start_date = self._parse_date(options['start_date']) or (date.today() - timedelta(days=date.today().weekday()))
+        end_date = self._parse_date(options['end_date']) or start_date
+        if end_date < start_date:
+            raise CommandError("--end-date must not be before --start-date.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+
+        run = {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'slot_minutes': options['slot_minutes'],
+            'storage': options['storage'],
+        }
+        state_file = options['state_file']
+        completed = self._load_state(state_file, run) if options['resume'] else set()
+
+        profile_ids = [pk for pk in UserProfile.objects.order_by('pk').values_list('pk', flat=True) if pk not in completed]
+        chunks = [profile_ids[i:i + options['chunk_size']] for i in range(0, len(profile_ids), options['chunk_size'])]
+        self.stdout.write(
+            f"Recomputing {len(profile_ids)} users from {start_date} to {end_date} in {len(chunks)} chunks "
+            f"({len(completed)} already done)."
+        )
+
+        task_args = (start_date, end_date, options['slot_minutes'], options['storage'])
+        self.started = time.monotonic()
+        self.users_done = self.reports_done = 0
+        self.total_users = len(profile_ids)
+        try:
+            if options['workers'] <= 0:
+                for chunk in chunks:
+                    self._chunk_done(*_recompute_chunk(chunk, *task_args), completed, run, state_file)
+            else:
+                self._run_pool(chunks, task_args, options, completed, run, state_file)
+        except KeyboardInterrupt:
+            raise CommandError(
+                f"Interrupted after {self.users_done} users. Re-run with --resume --state-file {state_file} to continue."
+            )
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.users_done} users, {self.reports_done} reports in {elapsed:.1f}s "
+            f"({self.reports_done / elapsed if elapsed else 0:.1f} reports/s)."
+        ))
+        if os.path.exists(state_file):
+            os.remove(state_file)
+
+    def _run_pool(self, chunks, task_args, options, completed, run, state_file):
+        # Connections must not be shared with forked children
+        connections.close_all()
+        pool_kwargs = {'max_workers': options['workers'], 'initializer': _init_worker}
+        if options['max_tasks_per_worker']:
+            pool_kwargs['max_tasks_per_child'] = options['max_tasks_per_worker']
+        executor = ProcessPoolExecutor(**pool_kwargs)
+        try:
+            futures = [executor.submit(_recompute_chunk, chunk, *task_args) for chunk in chunks]
+            for future in as_completed(futures):
+                self._chunk_done(*future.result(), completed, run, state_file)
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        executor.shutdown(wait=True)
+
+    def _chunk_done(self, profile_ids, report_count, completed, run, state_file):
+        """Checkpoints a finished chunk and reports progress and throughput."""
+        completed.update(profile_ids)
+        self._save_state(state_file, run, completed)
+
+        self.users_done += len(profile_ids)
+        self.reports_done += report_count
+        elapsed = time.monotonic() - self.started
+        rate = self.users_done / elapsed if elapsed else 0.0
+        remaining = (self.total_users - self.users_done) / rate if rate else 0.0
+        self.stdout.write(
+            f"[{self.users_done}/{self.total_users}] {self.reports_done} reports, "
+            f"{rate:.1f} users/s, {self.reports_done / elapsed if elapsed else 0:.1f} reports/s, ETA {remaining:.0f}s"
+        )
+
+    @staticmethod
+    def _parse_date(value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}'. Use YYYY-MM-DD.")
+
+    @staticmethod
+    def _load_state(state_file, run):
+        if not os.path.exists(state_file):
+            return set()
+        with open(state_file) as f:
+            state = json.load(f)
+        if state.get('run') != run:
+            raise CommandError(f"{state_file} belongs to a different run ({state.get('run')}); refusing to resume.")
+        return set(state.get('completed_profile_ids', []))
+
+    @staticmethod
+    def _save_state(state_file, run, completed):
+        # Write-then-rename so a crash never leaves a truncated checkpoint behind
+        tmp_file = f"{state_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({'run': run, 'completed_profile_ids': sorted(completed)}, f)
+        os.replace(tmp_file, state_file)
@@ -0,0 +1,67 @@
+# planning/management/commands/run_availability_worker.py
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from planningAgent.models import JobStatus
+from planningAgent.services import AvailabilityJobService
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued availability calculations (POST /availability/calculate/ with async=true). "
+        "Start as many workers as needed; each job is claimed by exactly one of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty instead of polling.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--max-jobs', type=int, default=None, help="Exit after running this many jobs.")
+        parser.add_argument('--worker-id', default=f"{socket.gethostname()}:{os.getpid()}",
+                            help="Name recorded on the jobs this worker runs.")
+
+    def handle(self, *args, **options):
+        if options['poll_interval'] <= 0:
+            raise CommandError("--poll-interval must be positive.")
+        self.stopping = False
+        # Finish the current job, then exit, on Ctrl+C or a service manager's SIGTERM
+        previous_handlers = {signum: signal.signal(signum, self._stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self._work(options)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+    def _work(self, options):
+        service = AvailabilityJobService(worker_id=options['worker_id'])
+        self.stdout.write(f"Worker {options['worker_id']} started.")
+        done = 0
+        while not self.stopping and (options['max_jobs'] is None or done < options['max_jobs']):
+            close_old_connections()
+            job = service.run_next()
+            if job is None:
+                requeued = service.requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Recovered {requeued} abandoned jobs.")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            done += 1
+            elapsed = (job.finished_at - job.started_at).total_seconds()
+            if job.status == JobStatus.SUCCEEDED:
+                self.stdout.write(f"Job {job.pk}: report {job.report_id} in {elapsed:.2f}s")
+            else:
+                self.stdout.write(self.style.WARNING(f"Job {job.pk}: {job.status.lower()} after {elapsed:.2f}s: {job.error}"))
+
+        close_old_connections()
+        self.stdout.write(self.style.SUCCESS(f"Worker {options['worker_id']} stopped after {done} jobs."))
+
+    def _stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,186 @@
+# planning/management/commands/run_benchmarks.py
+import json
+import platform
+import random
+import sqlite3
+import time
+from datetime import timedelta
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from planningAgent import benchmarking
+from planningAgent.engine import DEFAULT_SLOT_MINUTES, SLOT_MINUTES_CHOICES
+from planningAgent.models import AvailabilityReport
+from planningAgent.services import AvailabilityService, ExportService
+
+BENCH_USERNAME_PREFIX = 'bench-suite-'
+SCALE_OPTIONS = ('users', 'weeks', 'entries_per_week', 'overlap', 'slot_minutes', 'repeat', 'export_samples', 'seed')
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the availability calculation, the CSV and PDF exports and the report list "
+        "endpoint on a synthetic dataset, and writes the timings as JSON. Pass a previous run "
+        "with --compare to report the change of each median. Runs on SQLite: use "
+        "--settings=planningAgent.config.benchmark_settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5, help="Synthetic users to create.")
+        parser.add_argument('--weeks', type=int, default=8, help="Weeks of calendar per user.")
+        parser.add_argument('--entries-per-week', type=int, default=40, help="Calendar entries per user and week.")
+        parser.add_argument('--overlap', type=float, default=0.2,
+                            help="Probability (0-1) that an entry starts inside the previous one.")
+        parser.add_argument('--slot-minutes', type=int, default=DEFAULT_SLOT_MINUTES, choices=SLOT_MINUTES_CHOICES)
+        parser.add_argument('--repeat', type=int, default=3, help="Calculations per user and week.")
+        parser.add_argument('--export-samples', type=int, default=10, help="Reports exported as CSV and PDF.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="JSON results of a previous run to compare against.")
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help="Median slow-down, in percent, reported as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error when a regression is found (for CI).")
+        parser.add_argument('--allow-any-database', action='store_true',
+                            help="Run even if the default database is not SQLite.")
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['weeks'], options['entries_per_week'], options['repeat'],
+               options['export_samples']) < 1:
+            raise CommandError("--users, --weeks, --entries-per-week, --repeat and --export-samples must be at least 1.")
+        if not 0 <= options['overlap'] <= 1:
+            raise CommandError("--overlap must be between 0 and 1.")
+        if connection.vendor != 'sqlite' and not options['allow_any_database']:
+            raise CommandError(
+                f"The default database is {connection.vendor}. Run with "
+                "--settings=planningAgent.config.benchmark_settings, or pass --allow-any-database."
+            )
+        baseline = self._load_baseline(options['compare']) if options['compare'] else None
+
+        call_command('migrate', verbosity=0, interactive=False)
+        rng = random.Random(options['seed'])
+        first_week = benchmarking.this_monday() - timedelta(weeks=options['weeks'])
+        benchmarking.delete_profiles(BENCH_USERNAME_PREFIX) # Leftovers of an interrupted run
+        try:
+            profiles = self._create_dataset(rng, first_week, options)
+            results = {'calculate_availability_for_week': self._time_calculations(profiles, first_week, options)}
+            reports = list(
+                AvailabilityReport.objects.filter(user_profile__in=profiles)
+                .with_grid_data().order_by('id')[:options['export_samples']]
+            )
+            results['generate_csv'] = self._time_calls([ExportService(report).generate_csv for report in reports])
+            results['generate_pdf'] = self._time_calls([ExportService(report).generate_pdf for report in reports])
+            results['report_list'] = self._time_report_list(profiles, options)
+        finally:
+            benchmarking.delete_profiles(BENCH_USERNAME_PREFIX)
+
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name}: median {stats['median']:.2f} ms, p95 {stats['p95']:.2f} ms, "
+                f"min {stats['min']:.2f} ms, max {stats['max']:.2f} ms over {stats['count']} calls"
+            )
+        payload = {'meta': self._meta(options), 'results': results}
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(payload, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
+        if baseline is not None:
+            regressions = self._compare(baseline, payload, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"Slower than the baseline: {', '.join(regressions)}.")
+
+    def _create_dataset(self, rng, first_week, options):
+        started = time.monotonic()
+        profiles = benchmarking.create_profiles(BENCH_USERNAME_PREFIX, options['users'])
+        count = options['entries_per_week'] * options['weeks']
+        for profile in profiles:
+            benchmarking.bulk_insert(benchmarking.generate_entries(
+                profile, first_week, options['weeks'], count, overlap=options['overlap'], rng=rng
+            ))
+        self.stdout.write(
+            f"Created {len(profiles)} users and {len(profiles) * count} entries in {time.monotonic() - started:.1f}s."
+        )
+        return profiles
+
+    @staticmethod
+    def _time_calls(calls):
+        """Runs each call once, after an untimed warm-up call, and returns the latency stats."""
+        calls[0]()
+        durations = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            durations.append((time.perf_counter() - started) * 1000)
+        return benchmarking.latency_stats(durations)
+
+    def _time_calculations(self, profiles, first_week, options):
+        calls = []
+        for profile in profiles:
+            service = AvailabilityService(user_profile=profile, slot_minutes=options['slot_minutes'])
+            for week in range(options['weeks']):
+                target_date = (first_week + timedelta(weeks=week)).date()
+                calls.extend([lambda service=service, target_date=target_date:
+                              service.calculate_availability_for_week(target_date)] * options['repeat'])
+        return self._time_calls(calls)
+
+    def _time_report_list(self, profiles, options):
+        """GET /api/v1/availability/ with every report of a user on one page, through the full request stack."""
+        calls = []
+        for profile in profiles:
+            client = Client()
+            client.force_login(profile.user)
+            calls.extend([lambda client=client: self._get(client, '/api/v1/availability/', {'page_size': 100})]
+                         * options['repeat'])
+        return self._time_calls(calls)
+
+    @staticmethod
+    def _get(client, url, params):
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}.")
+
+    @staticmethod
+    def _meta(options):
+        return {
+            'scale': {option: options[option] for option in SCALE_OPTIONS},
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        }
+
+    @staticmethod
+    def _load_baseline(path):
+        try:
+            with open(path) as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read the baseline {path}: {exc}")
+        if not isinstance(baseline, dict) or 'results' not in baseline:
+            raise CommandError(f"{path} is not a run_benchmarks result file.")
+        return baseline
+
+    def _compare(self, baseline, payload, threshold):
+        """Prints the change of each median against the baseline. Returns the names of the regressions."""
+        if baseline.get('meta', {}).get('scale') != payload['meta']['scale']:
+            self.stdout.write(self.style.WARNING("The baseline was run at a different scale; changes are indicative only."))
+        regressions = []
+        for name, stats in payload['results'].items():
+            before = baseline['results'].get(name)
+            if not before or not before.get('median'):
+                continue
+            change = (stats['median'] - before['median']) / before['median'] * 100
+            line = f"{name}: {before['median']:.2f} -> {stats['median']:.2f} ms ({change:+.1f}%)"
+            if change > threshold:
+                regressions.append(name)
+                self.stdout.write(self.style.WARNING(f"{line} regression"))
+            else:
+                self.stdout.write(line)
+        return regressions
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='availabilityhourlydetail',
+            options={'ordering': ['day_of_week', 'hour_of_day', 'minute_of_hour']},
+        ),
+        migrations.AlterUniqueTogether(
+            name='availabilityhourlydetail',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='availabilityhourlydetail',
+            name='minute_of_hour',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Start minute of the slot (0, 15, 30 or 45).'),
+        ),
+        migrations.AddField(
+            model_name='availabilityreport',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=60, help_text='Length of each grid slot in minutes (15, 30 or 60).'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='availabilityhourlydetail',
+            unique_together={('report', 'day_of_week', 'hour_of_day', 'minute_of_hour')},
+        ),
+    ]
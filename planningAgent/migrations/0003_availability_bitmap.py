@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:24
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+# The packing of AvailabilityReport.availability_bitmap as of this migration, inlined so the
+# migration does not depend on the current engine: bit i (little-endian) is set when slot i,
+# counted from Monday 00:00 in steps of slot_minutes, is busy.
+def _slot_index(day, hour, minute, slot_minutes):
+    return day * (24 * 60 // slot_minutes) + (hour * 60 + minute) // slot_minutes
+
+
+def _to_bytes(busy, slot_minutes):
+    total_slots = 7 * 24 * 60 // slot_minutes
+    return busy.to_bytes((total_slots + 7) // 8, 'little')
+
+
+def _iter_slots(bitmap, slot_minutes):
+    """Yields (day_of_week, hour_of_day, minute_of_hour, is_available) for every slot of a packed week."""
+    busy = int.from_bytes(bytes(bitmap), 'little')
+    slots_per_day = 24 * 60 // slot_minutes
+    for slot in range(7 * slots_per_day):
+        day, minutes = divmod(slot, slots_per_day)
+        hour, minute = divmod(minutes * slot_minutes, 60)
+        yield day, hour, minute, not (busy >> slot) & 1
+
+
+def backfill_bitmaps(apps, schema_editor):
+    """Packs the hourly detail rows of every existing report into its bitmap column, a batch of reports at a time."""
+    AvailabilityReport = apps.get_model('planningAgent', 'AvailabilityReport')
+    AvailabilityHourlyDetail = apps.get_model('planningAgent', 'AvailabilityHourlyDetail')
+
+    reports = AvailabilityReport.objects.filter(availability_bitmap__isnull=True).order_by('id')
+    last_id = 0
+    while batch := list(reports.filter(id__gt=last_id).values_list('id', 'slot_minutes')[:BATCH_SIZE]):
+        last_id = batch[-1][0]
+        slot_minutes_by_report = dict(batch)
+        busy = dict.fromkeys(slot_minutes_by_report, 0)
+        details = AvailabilityHourlyDetail.objects.filter(
+            report_id__in=list(slot_minutes_by_report), is_available=False
+        ).values_list('report_id', 'day_of_week', 'hour_of_day', 'minute_of_hour')
+        for report_id, day, hour, minute in details.iterator(chunk_size=2000):
+            busy[report_id] |= 1 << _slot_index(day, hour, minute, slot_minutes_by_report[report_id])
+
+        AvailabilityReport.objects.bulk_update([
+            AvailabilityReport(id=report_id, availability_bitmap=_to_bytes(busy[report_id], slot_minutes))
+            for report_id, slot_minutes in batch
+        ], ['availability_bitmap'])
+
+
+def restore_detail_rows(apps, schema_editor):
+    """Recreates hourly detail rows for reports stored only in packed form."""
+    AvailabilityReport = apps.get_model('planningAgent', 'AvailabilityReport')
+    AvailabilityHourlyDetail = apps.get_model('planningAgent', 'AvailabilityHourlyDetail')
+
+    reports = AvailabilityReport.objects.filter(
+        availability_bitmap__isnull=False, hourly_details__isnull=True
+    ).values_list('id', 'slot_minutes', 'availability_bitmap')
+    details_to_create = []
+    for report_id, slot_minutes, bitmap in reports.iterator(chunk_size=BATCH_SIZE):
+        details_to_create.extend(
+            AvailabilityHourlyDetail(
+                report_id=report_id,
+                day_of_week=day,
+                hour_of_day=hour,
+                minute_of_hour=minute,
+                is_available=is_available
+            )
+            for day, hour, minute, is_available in _iter_slots(bitmap, slot_minutes)
+        )
+        if len(details_to_create) >= BATCH_SIZE * 168:
+            AvailabilityHourlyDetail.objects.bulk_create(details_to_create, batch_size=2000)
+            details_to_create = []
+    AvailabilityHourlyDetail.objects.bulk_create(details_to_create, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0002_slot_granularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availabilityreport',
+            name='availability_bitmap',
+            field=models.BinaryField(blank=True, help_text='Packed week grid: one bit per slot, set when the slot is busy (little-endian).', null=True),
+        ),
+        migrations.RunPython(backfill_bitmaps, restore_detail_rows),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0003_availability_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availabilityreport',
+            name='entries_fingerprint',
+            field=models.CharField(blank=True, help_text='Hash of the calendar entries the report was computed from.', max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='availabilityreport',
+            index=models.Index(fields=['user_profile', 'start_week', 'slot_minutes', 'entries_fingerprint'], name='report_memo_idx'),
+        ),
+    ]
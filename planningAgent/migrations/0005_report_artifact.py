@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0004_report_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF')], max_length=8)),
+                ('content_hash', models.CharField(help_text='Hash of the report content the artifact was rendered from.', max_length=64)),
+                ('status', models.CharField(choices=[('PENDING', 'Rendering'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='PENDING', max_length=8)),
+                ('data', models.BinaryField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artifacts', to='planningAgent.availabilityreport')),
+            ],
+            options={
+                'unique_together': {('report', 'kind', 'content_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0005_report_artifact'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportartifact',
+            name='kind',
+            field=models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF'), ('heatmap', 'Heatmap PDF')], max_length=8),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0006_heatmap_artifact_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availabilityreport',
+            name='category_hours',
+            field=models.JSONField(blank=True, default=dict, help_text='Busy hours per event category, e.g. {"MEET": 4.5}. Overlapping categories each count.'),
+        ),
+        migrations.AddField(
+            model_name='availabilityreport',
+            name='weighted_availability_ratio',
+            field=models.DecimalField(blank=True, decimal_places=3, help_text='Ratio (0.0 to 1.0) using the category weights; excluded categories (e.g. sleep) are left out.', max_digits=4, null=True),
+        ),
+    ]
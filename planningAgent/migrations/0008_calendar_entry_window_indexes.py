@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0007_category_breakdown'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendarentry',
+            index=models.Index(fields=['user_profile', 'start_time', 'end_time'], name='entry_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendarentry',
+            index=models.Index(fields=['user_profile', 'end_time'], name='entry_end_idx'),
+        ),
+    ]
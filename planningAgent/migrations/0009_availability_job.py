@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0008_calendar_entry_window_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_date', models.DateField(help_text='Any date of the week to calculate.')),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=60)),
+                ('force', models.BooleanField(default=False, help_text='Recalculate even if a matching report exists.')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], default='QUEUED', max_length=9)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, help_text='Worker that ran (or is running) the job.', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('report', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='planningAgent.availabilityreport')),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_jobs', to='planningAgent.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='job_queue_idx')],
+            },
+        ),
+    ]
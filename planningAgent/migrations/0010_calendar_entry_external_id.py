@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0009_availability_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarentry',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Identifier in the source calendar (e.g. an iCalendar UID); re-imports update the matching entry.', max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='calendarentry',
+            constraint=models.UniqueConstraint(fields=('user_profile', 'external_id'), name='unique_entry_external_id'),
+        ),
+    ]
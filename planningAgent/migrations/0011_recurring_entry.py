@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0010_calendar_entry_external_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('MEET', 'Meeting'), ('WORK', 'Work'), ('GYM', 'Gym/Exercise'), ('MEAL', 'Meal'), ('SLEEP', 'Sleep'), ('VAC', 'Vacation/Time Off'), ('OTHR', 'Other')], max_length=5)),
+                ('title', models.CharField(max_length=255)),
+                ('start_time', models.DateTimeField(help_text='Start of the first occurrence.')),
+                ('end_time', models.DateTimeField(help_text='End of the first occurrence; every occurrence lasts as long.')),
+                ('frequency', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly')], max_length=7)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every `interval` days, weeks or months.')),
+                ('by_weekday', models.CharField(blank=True, help_text="Weekly rules: days such as 'MO,WE,FR' (default: the day of the first occurrence).", max_length=20)),
+                ('until', models.DateTimeField(blank=True, help_text='No occurrence starts after this time.', null=True)),
+                ('count', models.PositiveIntegerField(blank=True, help_text='Number of occurrences, excluded ones included.', null=True)),
+                ('excluded_dates', models.JSONField(blank=True, default=list, help_text='Dates (YYYY-MM-DD) whose occurrence is skipped.')),
+                ('series_end', models.DateTimeField(editable=False, help_text='End of the last occurrence; empty if endless.', null=True)),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_entries', to='planningAgent.userprofile')),
+            ],
+            options={
+                'verbose_name_plural': 'Recurring Entries',
+                'ordering': ['start_time'],
+                'indexes': [models.Index(fields=['user_profile', 'start_time'], name='recurring_window_idx')],
+            },
+        ),
+    ]
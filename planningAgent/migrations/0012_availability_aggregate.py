@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planningAgent', '0011_recurring_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('DAY', 'Day'), ('WEEK', 'Week'), ('MONTH', 'Month')], max_length=5)),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=60, help_text='Slot size of the reports aggregated.')),
+                ('period_start', models.DateField(help_text='The day, the Monday of the week, or the first day of the month.')),
+                ('total_hours', models.DecimalField(decimal_places=2, help_text='Hours covered by reports.', max_digits=6)),
+                ('available_hours', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('busy_hours', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('availability_ratio', models.DecimalField(decimal_places=3, help_text='Ratio (0.0 to 1.0).', max_digits=4)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('report', models.ForeignKey(blank=True, help_text='Report a day or week was taken from (empty for months).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='planningAgent.availabilityreport')),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_aggregates', to='planningAgent.userprofile')),
+            ],
+            options={
+                'ordering': ['period_start'],
+                'constraints': [models.UniqueConstraint(fields=('user_profile', 'period', 'slot_minutes', 'period_start'), name='unique_availability_aggregate')],
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
+from .engine import WeekGrid
+from . import recurrence
 
 # --- Enums (using Django's CharField choices) ---
 class EventCategory(models.TextChoices):
@@ -13,6 +15,12 @@ class EventCategory(models.TextChoices):
     OTHER = 'OTHR', _('Other')
 
 
+class RecurrenceFrequency(models.TextChoices):
+    DAILY = 'DAILY', _('Daily')
+    WEEKLY = 'WEEKLY', _('Weekly')
+    MONTHLY = 'MONTHLY', _('Monthly')
+
+
 # --- 1. User/Profile Models ---
 class UserProfile(models.Model):
     """Application-specific profile data linked to a User."""
@@ -54,10 +62,26 @@ class CalendarEntry(models.Model):
     title = models.CharField(max_length=255)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    external_id = models.CharField(
+        max_length=255, null=True, blank=True,
+        help_text="Identifier in the source calendar (e.g. an iCalendar UID); re-imports update the matching entry."
+    )
 
     class Meta:
         ordering = ['start_time']
         verbose_name_plural = "Calendar Entries"
+        constraints = [
+            # NULLs never collide, so entries created by hand need no external id
+            models.UniqueConstraint(fields=['user_profile', 'external_id'], name='unique_entry_external_id'),
+        ]
+        indexes = [
+            # Window lookups: user_profile = ? AND start_time < ? AND end_time > ? ORDER BY start_time.
+            # end_time is in the index, so the overlap check needs no row lookups.
+            models.Index(fields=['user_profile', 'start_time', 'end_time'], name='entry_window_idx'),
+            # For recent weeks 'start_time < ?' matches the user's whole history, while only
+            # a few entries end after the window starts
+            models.Index(fields=['user_profile', 'end_time'], name='entry_end_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.get_category_display()}] {self.title} @ {self.start_time.strftime('%Y-%m-%d %H:%M')}"
@@ -65,31 +89,269 @@ class CalendarEntry(models.Model):
     # You would add clean() or save() method here for validation (e.g., end_time > start_time)
 
 
+class RecurringEntryQuerySet(models.QuerySet):
+
+    def overlapping(self, start_dt, end_dt):
+        """Series that may have occurrences in [start_dt, end_dt): started before its end and not over before its start."""
+        return self.filter(
+            models.Q(series_end__isnull=True) | models.Q(series_end__gt=start_dt),
+            start_time__lt=end_dt
+        )
+
+
+class RecurringEntry(models.Model):
+    """
+    A calendar entry repeating on a schedule (standing meetings, sleep, gym), stored once.
+    Occurrences are expanded for the calculated window only; see planningAgent.recurrence.
+    """
+    user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='recurring_entries')
+    category = models.CharField(max_length=5, choices=EventCategory.choices)
+    title = models.CharField(max_length=255)
+    start_time = models.DateTimeField(help_text="Start of the first occurrence.")
+    end_time = models.DateTimeField(help_text="End of the first occurrence; every occurrence lasts as long.")
+    frequency = models.CharField(max_length=7, choices=RecurrenceFrequency.choices)
+    interval = models.PositiveSmallIntegerField(default=1, help_text="Repeat every `interval` days, weeks or months.")
+    by_weekday = models.CharField(
+        max_length=20, blank=True,
+        help_text="Weekly rules: days such as 'MO,WE,FR' (default: the day of the first occurrence)."
+    )
+    until = models.DateTimeField(null=True, blank=True, help_text="No occurrence starts after this time.")
+    count = models.PositiveIntegerField(null=True, blank=True, help_text="Number of occurrences, excluded ones included.")
+    excluded_dates = models.JSONField(default=list, blank=True, help_text="Dates (YYYY-MM-DD) whose occurrence is skipped.")
+    # Derived on save, so window lookups can skip finished series
+    series_end = models.DateTimeField(null=True, editable=False, help_text="End of the last occurrence; empty if endless.")
+
+    objects = RecurringEntryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['start_time']
+        verbose_name_plural = "Recurring Entries"
+        indexes = [
+            models.Index(fields=['user_profile', 'start_time'], name='recurring_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.get_category_display()}] {self.title} ({self.rrule})"
+
+    @property
+    def rrule(self) -> str:
+        return recurrence.format_rrule(self)
+
+    def save(self, *args, **kwargs):
+        self.series_end = recurrence.series_end(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'series_end'}
+        super().save(*args, **kwargs)
+
+
 # --- 3. Availability Models (The Output) ---
+class AvailabilityReportQuerySet(models.QuerySet):
+    # The one rule for "the latest report" of a week: the newest, with the id breaking created_at ties
+    NEWEST_FIRST = ('-created_at', '-id')
+
+    def newest_first(self):
+        return self.order_by(*self.NEWEST_FIRST)
+
+    def latest_per_week(self):
+        """Keeps only the latest report of each user, week and slot size (see NEWEST_FIRST)."""
+        latest = self.model._default_manager.filter(
+            user_profile=models.OuterRef('user_profile'),
+            start_week=models.OuterRef('start_week'),
+            slot_minutes=models.OuterRef('slot_minutes')
+        ).newest_first().values('pk')[:1]
+        return self.filter(pk=models.Subquery(latest))
+
+    def with_grid_data(self):
+        """
+        Loads what serializers and exports read from each report in a fixed number of queries:
+        the owner's user, and the detail rows of legacy reports that have no packed bitmap
+        (reports with a bitmap never read their detail rows, so none are fetched for them).
+        """
+        return self.select_related('user_profile__user').prefetch_related(models.Prefetch(
+            'hourly_details',
+            queryset=AvailabilityHourlyDetail.objects.filter(report__availability_bitmap__isnull=True)
+        ))
+
+
 class AvailabilityReport(models.Model):
     """Weekly summary of the calculated availability."""
     user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='reports')
     start_week = models.DateField(help_text="The Monday date of the week being analyzed.")
     end_week = models.DateField(help_text="The Sunday date of the week being analyzed.")
+    slot_minutes = models.PositiveSmallIntegerField(default=60, help_text="Length of each grid slot in minutes (15, 30 or 60).")
     total_hours = models.DecimalField(max_digits=5, decimal_places=2, default=24 * 7) # 168 hours total
     total_available_hours = models.DecimalField(max_digits=5, decimal_places=2)
     availability_ratio = models.DecimalField(max_digits=4, decimal_places=3, help_text="Ratio (0.0 to 1.0).")
+    weighted_availability_ratio = models.DecimalField(
+        max_digits=4,
+        decimal_places=3,
+        null=True,
+        blank=True,
+        help_text="Ratio (0.0 to 1.0) using the category weights; excluded categories (e.g. sleep) are left out."
+    )
+    category_hours = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Busy hours per event category, e.g. {\"MEET\": 4.5}. Overlapping categories each count."
+    )
+    availability_bitmap = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text="Packed week grid: one bit per slot, set when the slot is busy (little-endian)."
+    )
+    entries_fingerprint = models.CharField(
+        max_length=40,
+        blank=True,
+        help_text="Hash of the calendar entries the report was computed from."
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = AvailabilityReportQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_profile', 'start_week', 'slot_minutes', 'entries_fingerprint'],
+                         name='report_memo_idx'),
+        ]
+
     def __str__(self):
         return f"Report for {self.user_profile.user.username} (Week of {self.start_week})"
 
+    def get_grid(self) -> WeekGrid:
+        """
+        Returns the week grid, decoded from the packed bitmap when present and
+        rebuilt from the hourly detail rows otherwise.
+        """
+        if self.availability_bitmap is not None:
+            return WeekGrid.from_bytes(self.availability_bitmap, self.slot_minutes)
+        slots = ((d.day_of_week, d.hour_of_day, d.minute_of_hour, d.is_available) for d in self.hourly_details.all())
+        return WeekGrid.from_slots(slots, self.slot_minutes)
+
+    def iter_slots(self):
+        """Yields (day_of_week, hour_of_day, minute_of_hour, is_available) for every slot of the week."""
+        return self.get_grid().iter_slots()
+
 
 class AvailabilityHourlyDetail(models.Model):
-    """Granular availability status for each hour of the week."""
+    """Granular availability status for each slot of the week (hourly by default)."""
     report = models.ForeignKey(AvailabilityReport, on_delete=models.CASCADE, related_name='hourly_details')
     day_of_week = models.PositiveSmallIntegerField(help_text="0=Monday, 6=Sunday")
     hour_of_day = models.PositiveSmallIntegerField(help_text="0-23")
+    minute_of_hour = models.PositiveSmallIntegerField(default=0, help_text="Start minute of the slot (0, 15, 30 or 45).")
     is_available = models.BooleanField(default=False)
 
     class Meta:
-        unique_together = ('report', 'day_of_week', 'hour_of_day')
-        ordering = ['day_of_week', 'hour_of_day']
+        unique_together = ('report', 'day_of_week', 'hour_of_day', 'minute_of_hour')
+        ordering = ['day_of_week', 'hour_of_day', 'minute_of_hour']
+
+    def __str__(self):
+        return f"Day {self.day_of_week} @ {self.hour_of_day}:{self.minute_of_hour:02d}: {self.is_available}"
+
+
+# --- 4. Export Artifacts ---
+class ArtifactKind(models.TextChoices):
+    CSV = 'csv', _('CSV')
+    PDF = 'pdf', _('PDF')
+    HEATMAP_PDF = 'heatmap', _('Heatmap PDF')
+
+
+class ArtifactStatus(models.TextChoices):
+    PENDING = 'PENDING', _('Rendering')
+    READY = 'READY', _('Ready')
+    FAILED = 'FAILED', _('Failed')
+
+
+class ReportArtifact(models.Model):
+    """A rendered export of a report, cached for as long as the report content is unchanged."""
+    report = models.ForeignKey(AvailabilityReport, on_delete=models.CASCADE, related_name='artifacts')
+    kind = models.CharField(max_length=8, choices=ArtifactKind.choices)
+    content_hash = models.CharField(max_length=64, help_text="Hash of the report content the artifact was rendered from.")
+    status = models.CharField(max_length=8, choices=ArtifactStatus.choices, default=ArtifactStatus.PENDING)
+    data = models.BinaryField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('report', 'kind', 'content_hash')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of report {self.report_id} ({self.status})"
+
+
+# --- 5. Background Jobs ---
+class JobStatus(models.TextChoices):
+    QUEUED = 'QUEUED', _('Queued')
+    RUNNING = 'RUNNING', _('Running')
+    SUCCEEDED = 'SUCCEEDED', _('Succeeded')
+    FAILED = 'FAILED', _('Failed')
+
+
+class AvailabilityJob(models.Model):
+    """A report calculation queued by the API and run by the run_availability_worker command."""
+    user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='availability_jobs')
+    target_date = models.DateField(help_text="Any date of the week to calculate.")
+    slot_minutes = models.PositiveSmallIntegerField(default=60)
+    force = models.BooleanField(default=False, help_text="Recalculate even if a matching report exists.")
+    status = models.CharField(max_length=9, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    report = models.ForeignKey(AvailabilityReport, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, help_text="Worker that ran (or is running) the job.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll for the oldest queued job
+            models.Index(fields=['status', 'created_at'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.pk} for {self.user_profile_id} (week of {self.target_date}, {self.status})"
+
+
+# --- 6. Aggregates ---
+class AggregatePeriod(models.TextChoices):
+    DAY = 'DAY', _('Day')
+    WEEK = 'WEEK', _('Week')
+    MONTH = 'MONTH', _('Month')
+
+
+class AvailabilityAggregate(models.Model):
+    """
+    Available and busy hours of a user per day, week and month at one slot size, kept up
+    to date from the latest report of each week (see AggregateService). Trend queries read
+    these rows instead of loading and averaging reports.
+    """
+    user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='availability_aggregates')
+    period = models.CharField(max_length=5, choices=AggregatePeriod.choices)
+    slot_minutes = models.PositiveSmallIntegerField(default=60, help_text="Slot size of the reports aggregated.")
+    period_start = models.DateField(help_text="The day, the Monday of the week, or the first day of the month.")
+    total_hours = models.DecimalField(max_digits=6, decimal_places=2, help_text="Hours covered by reports.")
+    available_hours = models.DecimalField(max_digits=6, decimal_places=2)
+    busy_hours = models.DecimalField(max_digits=6, decimal_places=2)
+    availability_ratio = models.DecimalField(max_digits=4, decimal_places=3, help_text="Ratio (0.0 to 1.0).")
+    report = models.ForeignKey(
+        AvailabilityReport,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        help_text="Report a day or week was taken from (empty for months)."
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['period_start']
+        constraints = [
+            # Also the index of trend queries: user_profile = ? AND period = ? AND slot_minutes = ?
+            # AND period_start BETWEEN ? AND ?
+            models.UniqueConstraint(fields=['user_profile', 'period', 'slot_minutes', 'period_start'],
+                                    name='unique_availability_aggregate'),
+        ]
 
     def __str__(self):
-        return f"Day {self.day_of_week} @ {self.hour_of_day}: {self.is_available}"
\ No newline at end of file
+        return f"{self.get_period_display()} of {self.period_start} for {self.user_profile_id}: {self.availability_ratio}"
+
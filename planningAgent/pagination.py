@@ -0,0 +1,9 @@
+# planning/pagination.py
+from rest_framework.pagination import PageNumberPagination
+
+
+class ReportPagination(PageNumberPagination):
+    """Pages of availability reports; clients may ask for up to 100 per page with 'page_size'."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
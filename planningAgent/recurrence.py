@@ -0,0 +1,151 @@
+# planning/recurrence.py
+"""
+Expansion of recurring calendar entries (RecurringEntry) into concrete occurrences.
+
+A recurrence follows a subset of the iCalendar RRULE: FREQ=DAILY, WEEKLY or MONTHLY with
+an INTERVAL, BYDAY for weekly rules, and an optional UNTIL or COUNT, plus excluded dates
+(EXDATE). A monthly rule repeats on the day of month of its first occurrence and skips
+the months without that day, like RRULE does.
+
+Occurrences are never stored: the availability calculation expands each rule for the
+window it needs only. Daily and weekly rules jump straight to the first period of the
+window, so expanding a week costs the same however old the series is. Times are
+expanded in the current time zone, so a 09:00 meeting stays at 09:00 across DST changes.
+"""
+import calendar
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAY_CODES = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# Largest COUNT accepted by the API (series_end walks every occurrence of a counted series)
+MAX_COUNT = 10000
+
+
+def parse_weekdays(value: str):
+    """Parses 'MO,WE,FR' into sorted weekday numbers (Monday=0). Raises ValueError on unknown codes."""
+    days = set()
+    for code in filter(None, (part.strip().upper() for part in (value or '').split(','))):
+        if code not in WEEKDAY_CODES:
+            raise ValueError(f"Unknown weekday '{code}'. Use {', '.join(WEEKDAY_CODES)}.")
+        days.add(WEEKDAY_CODES.index(code))
+    return sorted(days)
+
+
+def format_rrule(rule) -> str:
+    """The rule as an iCalendar RRULE value, e.g. 'FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,WE'."""
+    parts = [f"FREQ={rule.frequency}", f"INTERVAL={rule.interval}"]
+    if rule.frequency == 'WEEKLY' and rule.by_weekday:
+        parts.append(f"BYDAY={','.join(WEEKDAY_CODES[day] for day in parse_weekdays(rule.by_weekday))}")
+    if rule.until is not None:
+        parts.append(f"UNTIL={rule.until.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')}")
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    return ';'.join(parts)
+
+
+def _local(value: datetime) -> datetime:
+    return timezone.localtime(value).replace(tzinfo=None)
+
+
+def _candidate_starts(rule, first: datetime, not_before: datetime):
+    """
+    Yields (index, naive local start) of the rule's occurrences in order, starting at the
+    first one on or after not_before. The index counts occurrences from the series start
+    (before excluded dates are removed), as COUNT does.
+    """
+    interval = max(rule.interval, 1)
+    if rule.frequency == 'DAILY':
+        step = timedelta(days=interval)
+        index = max(0, -((first - not_before) // step)) # ceil((not_before - first) / step)
+        while True:
+            yield index, first + index * step
+            index += 1
+
+    elif rule.frequency == 'WEEKLY':
+        weekdays = parse_weekdays(rule.by_weekday) or [first.weekday()]
+        monday = first - timedelta(days=first.weekday())
+        in_first_week = [day for day in weekdays if day >= first.weekday()]
+        period = max(0, (not_before - monday) // timedelta(weeks=interval))
+        while True:
+            week_start = monday + timedelta(weeks=period * interval)
+            if period == 0:
+                days, index = in_first_week, 0
+            else:
+                days, index = weekdays, len(in_first_week) + (period - 1) * len(weekdays)
+            for position, day in enumerate(days):
+                start = week_start + timedelta(days=day)
+                if start >= not_before:
+                    yield index + position, start
+            period += 1
+
+    elif rule.frequency == 'MONTHLY':
+        # Skipped months do not count, so walk the months from the series start
+        index, months = 0, 0
+        while True:
+            year, month = divmod(first.month - 1 + months, 12)
+            year, month = first.year + year, month + 1
+            months += interval
+            if first.day > calendar.monthrange(year, month)[1]:
+                continue
+            start = first.replace(year=year, month=month)
+            if start >= not_before:
+                yield index, start
+            index += 1
+
+    else:
+        raise ValueError(f"Unknown frequency '{rule.frequency}'. Choose from: {', '.join(FREQUENCIES)}.")
+
+
+def occurrences(rule, window_start: datetime, window_end: datetime):
+    """Yields the (start, end) aware datetimes of the rule's occurrences overlapping [window_start, window_end)."""
+    duration = rule.end_time - rule.start_time
+    if duration <= timedelta(0) or rule.start_time >= window_end:
+        return
+    first = _local(rule.start_time)
+    excluded = {date.fromisoformat(value) for value in rule.excluded_dates or ()}
+    # A day of margin on both sides absorbs DST shifts between local and absolute time
+    not_before = _local(window_start - duration) - timedelta(days=1)
+    stop = _local(window_end) + timedelta(days=1)
+    for index, naive_start in _candidate_starts(rule, first, max(first, not_before)):
+        if naive_start >= stop or (rule.count is not None and index >= rule.count):
+            return
+        start = timezone.make_aware(naive_start)
+        if rule.until is not None and start > rule.until:
+            return
+        if naive_start.date() in excluded:
+            continue
+        end = start + duration
+        if start < window_end and end > window_start:
+            yield start, end
+
+
+def series_end(rule):
+    """Returns the end of the rule's last occurrence, or None for a series without UNTIL or COUNT."""
+    duration = rule.end_time - rule.start_time
+    if rule.count is not None:
+        first = _local(rule.start_time)
+        last_start = None
+        for index, naive_start in _candidate_starts(rule, first, first):
+            if index >= rule.count:
+                break
+            last_start = naive_start
+        ends = [timezone.make_aware(last_start) + duration] if last_start is not None else []
+        if rule.until is not None:
+            ends.append(rule.until + duration)
+        return min(ends) if ends else rule.end_time
+    if rule.until is not None:
+        return max(rule.until, rule.start_time) + duration
+    return None
+
+
+def occurrence_rows(rules, window_start: datetime, window_end: datetime):
+    """
+    Yields (user_profile_id, -rule id, start, end, category) for every occurrence of the rules
+    overlapping the window: the rows of CalendarEntry lookups, with a negated id so they can
+    be mixed with (and fingerprinted alongside) real entries.
+    """
+    for rule in rules:
+        for start, end in occurrences(rule, window_start, window_end):
+            yield rule.user_profile_id, -rule.pk, start, end, rule.category
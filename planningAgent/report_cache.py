@@ -0,0 +1,129 @@
+# planning/report_cache.py
+"""
+Memoization layer for AvailabilityReport calculations.
+
+Three kinds of keys are kept in the Django cache:
+- a generation token per user week, replaced whenever a CalendarEntry touching that
+  week is saved or deleted (after the transaction commits), combined with a token per
+  user replaced when one of their RecurringEntry series changes (a series can span
+  any number of weeks);
+- the fingerprint of a user's week (a hash of the week's calendar entries), stored
+  under the current generation, so replacing the token invalidates it. A fingerprint
+  computed from rows read before a concurrent write lands under the old token and
+  is never served;
+- the id of the report computed for (user_profile, week, slot size, fingerprint).
+  Since the fingerprint changes with the calendar, these never need invalidation.
+
+The cache is only a shortcut: AvailabilityReport.entries_fingerprint is the source
+of truth. Deployments running several worker processes should point
+AVAILABILITY_CACHE_ALIAS at a shared backend (Redis, Memcached, database cache).
+"""
+import hashlib
+import uuid
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+KEY_PREFIX = 'planningAgent:availability'
+
+
+def _cache():
+    return caches[getattr(settings, 'AVAILABILITY_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 3600)
+
+
+def week_start(value) -> date:
+    """Returns the Monday of the week containing a date or an aware datetime (in local time)."""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date()
+    return value - timedelta(days=value.weekday())
+
+
+def weeks_spanned(start_time: datetime, end_time: datetime):
+    """Returns the Monday of every week the half-open interval [start_time, end_time) touches."""
+    first = week_start(start_time)
+    # An entry ending exactly at Monday 00:00 does not touch that week
+    last = week_start(max(end_time - timedelta(microseconds=1), start_time))
+    weeks = []
+    while first <= last:
+        weeks.append(first)
+        first += timedelta(days=7)
+    return weeks
+
+
+def fingerprint_entries(rows) -> str:
+    """
+    Hashes the (id, start_time, end_time, category) rows of a week's calendar entries.
+    Any created, edited or deleted entry yields a different fingerprint. Occurrences of
+    recurring entries appear with the negated RecurringEntry id.
+    """
+    digest = hashlib.sha1()
+    for entry_id, start_time, end_time, category in sorted(rows):
+        digest.update(f"{entry_id}|{start_time.isoformat()}|{end_time.isoformat()}|{category}\n".encode())
+    return digest.hexdigest()
+
+
+def _generation_key(profile_id, start_week):
+    return f"{KEY_PREFIX}:generation:{profile_id}:{start_week.isoformat()}"
+
+
+def _fingerprint_key(profile_id, start_week, generation):
+    return f"{KEY_PREFIX}:fingerprint:{profile_id}:{start_week.isoformat()}:{generation}"
+
+
+def _report_key(profile_id, start_week, slot_minutes, fingerprint):
+    return f"{KEY_PREFIX}:report:{profile_id}:{start_week.isoformat()}:{slot_minutes}:{fingerprint}"
+
+
+def _profile_generation_key(profile_id):
+    return f"{KEY_PREFIX}:profile-generation:{profile_id}"
+
+
+def get_generation(profile_id, start_week) -> str:
+    """
+    Returns the current generation of a user week: the week's token combined with the
+    user's profile-wide token (see invalidate_profile), creating missing tokens.
+    """
+    cache = _cache()
+    keys = [_generation_key(profile_id, start_week), _profile_generation_key(profile_id)]
+    tokens = cache.get_many(keys)
+    for key in keys:
+        if key not in tokens:
+            tokens[key] = cache.get_or_set(key, uuid.uuid4().hex, None)
+    return '.'.join(tokens[key] for key in keys)
+
+
+def get_fingerprint(profile_id, start_week, generation):
+    return _cache().get(_fingerprint_key(profile_id, start_week, generation))
+
+
+def set_fingerprint(profile_id, start_week, generation, fingerprint):
+    _cache().set(_fingerprint_key(profile_id, start_week, generation), fingerprint, _timeout())
+
+
+def get_report_id(profile_id, start_week, slot_minutes, fingerprint):
+    return _cache().get(_report_key(profile_id, start_week, slot_minutes, fingerprint))
+
+
+def set_report_id(profile_id, start_week, slot_minutes, fingerprint, report_id):
+    _cache().set(_report_key(profile_id, start_week, slot_minutes, fingerprint), report_id, _timeout())
+
+
+def invalidate_weeks(profile_id, weeks):
+    """Replaces the generation of the given weeks so the next lookup re-reads the calendar."""
+    _cache().set_many({_generation_key(profile_id, start_week): uuid.uuid4().hex for start_week in weeks}, None)
+
+
+def invalidate_span(profile_id, start_time: datetime, end_time: datetime):
+    """Drops the cached fingerprints of every week touched by [start_time, end_time)."""
+    invalidate_weeks(profile_id, weeks_spanned(start_time, end_time))
+
+
+def invalidate_profile(profile_id):
+    """Drops the cached fingerprints of every week of a user, e.g. when a recurring entry changes."""
+    _cache().set(_profile_generation_key(profile_id), uuid.uuid4().hex, None)
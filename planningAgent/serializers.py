@@ -1,9 +1,13 @@
+import base64
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.db import transaction
+from drf_yasg.utils import swagger_serializer_method
 from .models import UserProfile
-from .models import CalendarEntry
-from .models import AvailabilityReport, AvailabilityHourlyDetail
+from .models import CalendarEntry, RecurringEntry
+from .recurrence import MAX_COUNT, WEEKDAY_CODES, parse_weekdays
+from .models import AvailabilityReport, AvailabilityHourlyDetail, AvailabilityJob, AvailabilityAggregate
+from rest_framework.reverse import reverse
 
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer for the application-specific UserProfile."""
@@ -59,35 +63,206 @@ class CalendarEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = CalendarEntry
         # user_profile is handled automatically by the view, so it's read_only
-        fields = ('id', 'category', 'category_display', 'title', 'start_time', 'end_time', 'user_profile')
-        read_only_fields = ('user_profile',)
+        fields = ('id', 'category', 'category_display', 'title', 'start_time', 'end_time', 'external_id', 'user_profile')
+        # external_id is set by bulk imports (POST /api/v1/calendar/import/)
+        read_only_fields = ('user_profile', 'external_id')
 
     def validate(self, data):
         """Custom validation to ensure end_time is after start_time."""
         if data['start_time'] >= data['end_time']:
             raise serializers.ValidationError({"end_time": "End time must occur after start time."})
         return data
+class RecurringEntrySerializer(serializers.ModelSerializer):
+    """Serializer for the RecurringEntry model; 'rrule' shows the schedule as an iCalendar RRULE."""
+    category_display = serializers.CharField(source='get_category_display', read_only=True)
+    excluded_dates = serializers.ListField(child=serializers.DateField(), required=False)
+    rrule = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = RecurringEntry
+        fields = (
+            'id', 'category', 'category_display', 'title', 'start_time', 'end_time', 'frequency', 'interval',
+            'by_weekday', 'until', 'count', 'excluded_dates', 'rrule', 'series_end', 'user_profile'
+        )
+        read_only_fields = ('user_profile', 'series_end')
+        extra_kwargs = {
+            'interval': {'min_value': 1},
+            'count': {'min_value': 1, 'max_value': MAX_COUNT},
+        }
+
+    def validate_by_weekday(self, value):
+        """Normalizes 'we, mo' to 'MO,WE'."""
+        try:
+            return ','.join(WEEKDAY_CODES[day] for day in parse_weekdays(value))
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+    def validate_excluded_dates(self, value):
+        return sorted({excluded.isoformat() for excluded in value})
+
+    def validate(self, data):
+        """Checks the schedule as a whole, taking unchanged fields from the instance on partial updates."""
+        def current(field):
+            return data[field] if field in data else getattr(self.instance, field, None)
+
+        if current('start_time') >= current('end_time'):
+            raise serializers.ValidationError({"end_time": "End time must occur after start time."})
+        if current('until') is not None and current('count') is not None:
+            raise serializers.ValidationError({"count": "Set either 'until' or 'count', not both."})
+        if current('until') is not None and current('until') < current('start_time'):
+            raise serializers.ValidationError({"until": "'until' must not be before the first occurrence."})
+        if current('by_weekday') and current('frequency') != 'WEEKLY':
+            raise serializers.ValidationError({"by_weekday": "Only weekly rules can repeat on given weekdays."})
+        return data
+
+
 class AvailabilityHourlyDetailSerializer(serializers.ModelSerializer):
-    """Serializer for the granular hourly availability data."""
+    """Serializer for the granular (hourly by default) availability data."""
     class Meta:
         model = AvailabilityHourlyDetail
         exclude = ('id', 'report')
 
 
-class AvailabilityReportSerializer(serializers.ModelSerializer):
-    """Serializer for the weekly availability summary and its details."""
-    hourly_details = AvailabilityHourlyDetailSerializer(many=True, read_only=True)
+class AvailabilityReportSummarySerializer(serializers.ModelSerializer):
+    """Aggregate fields of a weekly availability report, without the slot grid."""
 
     class Meta:
         model = AvailabilityReport
         fields = (
             'id',
+            'user_profile',
             'start_week',
             'end_week',
+            'slot_minutes',
             'total_hours',
             'total_available_hours',
             'availability_ratio',
+            'weighted_availability_ratio',
+            'category_hours',
             'created_at',
-            'hourly_details'
         )
-        read_only_fields = fields # All fields are results, not user inputs
\ No newline at end of file
+        read_only_fields = fields # All fields are results, not user inputs
+
+
+class AvailabilityReportCompactSerializer(AvailabilityReportSummarySerializer):
+    """
+    Summary plus the slot grid as a base64 bitmask: bit i (little-endian) is set when slot i,
+    counted from Monday 00:00 in steps of 'slot_minutes', is busy. 28 characters for hourly slots.
+    """
+    busy_bitmap = serializers.SerializerMethodField()
+
+    class Meta(AvailabilityReportSummarySerializer.Meta):
+        fields = AvailabilityReportSummarySerializer.Meta.fields + ('busy_bitmap',)
+        read_only_fields = fields
+
+    @swagger_serializer_method(serializer_or_field=serializers.CharField())
+    def get_busy_bitmap(self, obj):
+        return base64.b64encode(obj.get_grid().to_bytes()).decode('ascii')
+
+
+class AvailabilityReportSerializer(AvailabilityReportSummarySerializer):
+    """Serializer for the weekly availability summary and its details."""
+    hourly_details = serializers.SerializerMethodField()
+
+    class Meta(AvailabilityReportSummarySerializer.Meta):
+        fields = AvailabilityReportSummarySerializer.Meta.fields + ('hourly_details',)
+        read_only_fields = fields
+
+    @swagger_serializer_method(serializer_or_field=AvailabilityHourlyDetailSerializer(many=True))
+    def get_hourly_details(self, obj):
+        """Decodes the packed week grid into the same shape as the hourly detail rows."""
+        return [
+            {'day_of_week': day, 'hour_of_day': hour, 'minute_of_hour': minute, 'is_available': is_available}
+            for day, hour, minute, is_available in obj.iter_slots()
+        ]
+
+
+# '?view=' representations of a report: aggregates only, aggregates + base64 grid, or every slot
+REPORT_REPRESENTATIONS = {
+    'summary': AvailabilityReportSummarySerializer,
+    'compact': AvailabilityReportCompactSerializer,
+    'full': AvailabilityReportSerializer,
+}
+
+
+class FreeWindowSerializer(serializers.Serializer):
+    """A free time window returned by the free-slot search."""
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    duration_hours = serializers.SerializerMethodField()
+
+    def get_duration_hours(self, obj):
+        return round((obj['end'] - obj['start']).total_seconds() / 3600, 2)
+
+
+class HorizonPeriodSerializer(serializers.Serializer):
+    """Availability of one day, week or month of a long-horizon calculation."""
+    period_start = serializers.DateField()
+    period_end = serializers.DateField()
+    total_hours = serializers.FloatField()
+    total_available_hours = serializers.FloatField()
+    availability_ratio = serializers.FloatField()
+
+
+class AvailabilityAggregateSerializer(serializers.ModelSerializer):
+    """Available and busy hours of one day, week or month, from the maintained aggregates."""
+
+    class Meta:
+        model = AvailabilityAggregate
+        fields = (
+            'period',
+            'period_start',
+            'slot_minutes',
+            'total_hours',
+            'available_hours',
+            'busy_hours',
+            'availability_ratio',
+            'updated_at',
+        )
+        read_only_fields = fields
+
+
+class AvailabilityJobSerializer(serializers.ModelSerializer):
+    """State and timings of a queued report calculation."""
+    status_url = serializers.SerializerMethodField()
+    report_url = serializers.SerializerMethodField()
+    wait_seconds = serializers.SerializerMethodField()
+    run_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AvailabilityJob
+        fields = (
+            'id',
+            'status',
+            'target_date',
+            'slot_minutes',
+            'force',
+            'report',
+            'report_url',
+            'status_url',
+            'error',
+            'attempts',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'wait_seconds',
+            'run_seconds',
+        )
+        read_only_fields = fields
+
+    def get_status_url(self, obj):
+        return reverse('availability-job-status', kwargs={'job_id': obj.pk}, request=self.context.get('request'))
+
+    def get_report_url(self, obj):
+        if obj.report_id is None:
+            return None
+        return reverse('availability-detail', kwargs={'pk': obj.report_id}, request=self.context.get('request'))
+
+    def get_wait_seconds(self, obj):
+        """Time spent in the queue before a worker picked the job up."""
+        return round((obj.started_at - obj.created_at).total_seconds(), 3) if obj.started_at else None
+
+    def get_run_seconds(self, obj):
+        if obj.started_at is None or obj.finished_at is None:
+            return None
+        return round((obj.finished_at - obj.started_at).total_seconds(), 3)
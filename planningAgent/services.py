@@ -1,37 +1,70 @@
 # planning/services.py
+import asyncio
+import csv
+import hashlib
+import io
+import logging
+import operator
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, date, datetime
-from django.db import transaction
+from functools import reduce
+from itertools import chain, groupby
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
-from .models import AvailabilityReport, AvailabilityHourlyDetail, UserProfile, CalendarEntry
-import io
-import csv
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from django.utils.dateparse import parse_datetime
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, landscape
 from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfgen import canvas
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from django.conf import settings
-from datetime import timedelta, date, datetime
-from django.db import transaction
-from django.utils import timezone
+
+from . import instrumentation, report_cache
+from .engine import ENGINES, DEFAULT_SLOT_MINUTES, SLOT_MINUTES_CHOICES, interval_to_slots, IntervalIndex
+from .engine import common_availability, iter_bit_runs, intersect_windows, working_windows, import_vectorized
+from .engine import WeekGrid, category_masks, weighted_availability_ratio, range_mask
+from .importers import ImportFormatError, resolve_category
+from .models import AvailabilityReport, AvailabilityHourlyDetail, UserProfile, CalendarEntry
+from .models import ReportArtifact, ArtifactKind, ArtifactStatus, AvailabilityJob, JobStatus, EventCategory
+from .models import RecurringEntry, AvailabilityAggregate, AggregatePeriod, AvailabilityReportQuerySet
+from .recurrence import occurrence_rows
+
+logger = logging.getLogger(__name__)
+
+DETAIL_STORAGE_MODES = ('rows', 'packed')
+
 class AvailabilityService:
     """
     The 'AI Agent or function algorithms' responsible for calculating availability
     and generating the AvailabilityReport.
     """
 
-    def __init__(self, user_profile: UserProfile):
+    def __init__(self, user_profile: UserProfile, engine: str = 'sweep', slot_minutes: int = DEFAULT_SLOT_MINUTES,
+                 storage: str = None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown availability engine '{engine}'. Choose from: {', '.join(ENGINES)}.")
+        if slot_minutes not in SLOT_MINUTES_CHOICES:
+            raise ValueError(f"Unsupported slot size: {slot_minutes} minutes. Choose from {SLOT_MINUTES_CHOICES}.")
+        # 'packed' keeps the grid only in AvailabilityReport.availability_bitmap,
+        # 'rows' additionally writes one AvailabilityHourlyDetail row per slot.
+        storage = storage or getattr(settings, 'AVAILABILITY_DETAIL_STORAGE', 'rows')
+        if storage not in DETAIL_STORAGE_MODES:
+            raise ValueError(f"Unknown detail storage '{storage}'. Choose from: {', '.join(DETAIL_STORAGE_MODES)}.")
         self.user_profile = user_profile
+        self.engine = engine
+        self.slot_minutes = slot_minutes
+        self.storage = storage
 
-    def calculate_availability_for_week(self, target_date: date) -> AvailabilityReport:
-        """
-        Calculates availability for the entire week containing the target_date.
-
-        The calculation is robust: it iterates through all 168 hours (7 days * 24 hours)
-        and checks each hour slot against all user events.
-        """
-
-        # 1. Determine the Start of the Week (Monday)
+    @staticmethod
+    def _week_window(target_date: date):
+        """Returns (start_week, start_dt, end_dt) for the week containing target_date."""
+        # Determine the Start of the Week (Monday)
         # Note: Monday=0, Sunday=6
         start_week = target_date - timedelta(days=target_date.weekday())
 
@@ -40,83 +73,692 @@ class AvailabilityService:
 
         # End time should be the *very end* of Sunday (7 days later)
         end_dt = start_dt + timedelta(days=7)
+        return start_week, start_dt, end_dt
 
-        # 2. Fetch relevant calendar entries
-        # Events that start before the week ends AND end after the week starts
-        entries = CalendarEntry.objects.filter(
+    def _week_entries(self, start_dt: datetime, end_dt: datetime):
+        """
+        Queryset of the (id, start_time, end_time, category) rows of the entries overlapping
+        the window: events that start before it ends AND end after it starts.
+        Only these columns are needed, so skip model instantiation.
+        """
+        return CalendarEntry.objects.filter(
             user_profile=self.user_profile,
             start_time__lt=end_dt,
             end_time__gt=start_dt
-        ).order_by('start_time')
+        ).order_by('start_time').values_list('id', 'start_time', 'end_time', 'category')
 
-        # 3. Initialize Availability Grid
-        # availability_grid[day_of_week][hour_of_day] = is_available (Boolean)
-        availability_grid = [[True] * 24 for _ in range(7)]
-        total_busy_hours = 0.0
+    def _week_recurring(self, start_dt: datetime, end_dt: datetime):
+        """Queryset of the user's recurring entries that may have occurrences in the window."""
+        return RecurringEntry.objects.filter(user_profile=self.user_profile).overlapping(start_dt, end_dt)
 
-        # 4. Iterate through every hour of the week and check for overlap
-        current_slot_start = start_dt
+    @staticmethod
+    def _with_occurrences(rows, rules, start_dt: datetime, end_dt: datetime):
+        """Adds the window's occurrences of the recurring entries to the entry rows, keeping them ordered by start."""
+        occurrences = [row[1:] for row in occurrence_rows(rules, start_dt, end_dt)]
+        if not occurrences:
+            return rows
+        return sorted(rows + occurrences, key=lambda row: row[1])
 
-        while current_slot_start < end_dt:
-            current_slot_end = current_slot_start + timedelta(hours=1)
+    def _fetch_week_entries(self, start_dt: datetime, end_dt: datetime):
+        """Fetches the week's entry rows (see _week_entries), recurring entries expanded."""
+        with instrumentation.span('availability.fetch_entries'):
+            rows = list(self._week_entries(start_dt, end_dt))
+            rows = self._with_occurrences(rows, self._week_recurring(start_dt, end_dt), start_dt, end_dt)
+        instrumentation.count('availability_entries_total', len(rows))
+        return rows
 
-            # Calculate indices for the grid
-            day_index = current_slot_start.weekday()
-            hour_index = current_slot_start.hour
+    def calculate_availability_for_week(self, target_date: date) -> AvailabilityReport:
+        """
+        Calculates availability for the entire week containing the target_date.
 
-            # Check if this slot has already been marked busy (shouldn't happen with this loop structure,
-            # but good practice if using a different calculation method later)
-            if availability_grid[day_index][hour_index]:
+        The grid is built by the selected engine (see planningAgent.engine): the default
+        'sweep' engine sorts and merges the week's entries once and sweeps them into the
+        week's slots, while 'scan' checks every slot against all user events. Slots are
+        `slot_minutes` long (15, 30 or 60), i.e. 672 to 168 slots per week.
+        A new report is always created; see get_or_calculate_for_week for the memoized path.
+        """
+        # 1. Determine the week window
+        start_week, start_dt, end_dt = self._week_window(target_date)
 
-                # Check for overlap: Is any event active during the slot [current_slot_start, current_slot_end)?
-                is_busy = False
-                for entry in entries:
-                    # Overlap condition: (A_start < B_end) AND (A_end > B_start)
-                    # A = Event time, B = Slot time
-                    if entry.start_time < current_slot_end and entry.end_time > current_slot_start:
-                        is_busy = True
-                        break # Found one overlapping event, slot is busy.
+        # 2. Fetch relevant calendar entries
+        rows = self._fetch_week_entries(start_dt, end_dt)
 
-                if is_busy:
-                    availability_grid[day_index][hour_index] = False
-                    total_busy_hours += 1.0
+        return self._create_report(start_week, start_dt, end_dt, rows)
 
-            # Move to the next hourly slot
-            current_slot_start = current_slot_end
+    def get_or_calculate_for_week(self, target_date: date):
+        """
+        Returns (report, created). An existing report is reused when it was computed
+        for the same week and slot size from exactly the same calendar entries.
 
-        # 5. Save the Report and Details atomically
-        with transaction.atomic():
-            # Calculate Summary
-            total_hours_in_week = 7 * 24 # 168 hours
-            total_available_hours = total_hours_in_week - total_busy_hours
-            availability_ratio = total_available_hours / total_hours_in_week if total_hours_in_week > 0 else 0.0
+        On a warm cache this costs a report lookup and an aggregate check; otherwise the week's entries
+        are fetched once, fingerprinted and, if no matching report exists, reused for
+        the calculation.
+        """
+        start_week, start_dt, end_dt = self._week_window(target_date)
+        profile_id = self.user_profile.pk
+
+        rows = None
+        generation = report_cache.get_generation(profile_id, start_week)
+        fingerprint = report_cache.get_fingerprint(profile_id, start_week, generation)
+        if fingerprint is None:
+            rows = self._fetch_week_entries(start_dt, end_dt)
+            fingerprint = report_cache.fingerprint_entries(rows)
+            report_cache.set_fingerprint(profile_id, start_week, generation, fingerprint)
+
+        reports = AvailabilityReport.objects.filter(
+            user_profile=self.user_profile,
+            start_week=start_week,
+            slot_minutes=self.slot_minutes,
+        )
+        report_id = report_cache.get_report_id(profile_id, start_week, self.slot_minutes, fingerprint)
+        reports = reports.filter(entries_fingerprint=fingerprint)
+        report = reports.filter(pk=report_id).first() if report_id is not None else None
+        if report is None:
+            report = reports.newest_first().first()
+        if report is not None:
+            report_cache.set_report_id(profile_id, start_week, self.slot_minutes, fingerprint, report.pk)
+            AggregateService.record_if_missing(report)
+            return report, False
 
-            # Create the main report
-            report = AvailabilityReport.objects.create(
+        if rows is None:
+            rows = self._fetch_week_entries(start_dt, end_dt)
+        return self._create_report(start_week, start_dt, end_dt, rows), True
+
+    async def aget_or_calculate_for_week(self, target_date: date, force: bool = False):
+        """
+        Async counterpart of get_or_calculate_for_week for ASGI views. Returns (report, created).
+
+        The entries are read with the async ORM and matched against the stored fingerprints
+        directly (the database is the source of truth, so the cache is not consulted); the
+        grid is built in a worker thread so the event loop keeps serving other requests, and
+        only the transactional write goes through sync_to_async, since a transaction cannot
+        span awaits.
+        """
+        start_week, start_dt, end_dt = self._week_window(target_date)
+        with instrumentation.span('availability.fetch_entries'):
+            rows = [row async for row in self._week_entries(start_dt, end_dt)]
+            rules = [rule async for rule in self._week_recurring(start_dt, end_dt)]
+            rows = self._with_occurrences(rows, rules, start_dt, end_dt)
+        instrumentation.count('availability_entries_total', len(rows))
+
+        if not force:
+            report = await AvailabilityReport.objects.filter(
                 user_profile=self.user_profile,
                 start_week=start_week,
-                # The week ends on the *day* before the start_dt + 7 days
-                end_week=start_dt.date() + timedelta(days=6),
-                total_hours=total_hours_in_week,
-                total_available_hours=total_available_hours,
-                availability_ratio=availability_ratio
+                slot_minutes=self.slot_minutes,
+                entries_fingerprint=report_cache.fingerprint_entries(rows)
+            ).newest_first().afirst()
+            if report is not None:
+                await sync_to_async(AggregateService.record_if_missing)(report)
+                return report, False
+
+        report, grid = await asyncio.to_thread(self._build_report, start_week, start_dt, end_dt, rows)
+        return await sync_to_async(self._save_report)(report, grid), True
+
+    def _create_report(self, start_week: date, start_dt: datetime, end_dt: datetime, rows) -> AvailabilityReport:
+        """Builds the grid from the week's entry rows and saves the report (and detail rows)."""
+        # 3. Build the Availability Grid
+        report, grid = self._build_report(start_week, start_dt, end_dt, rows)
+
+        # 4. Save the Report and Details atomically
+        return self._save_report(report, grid)
+
+    @instrumentation.timed('availability.save')
+    def _save_report(self, report: AvailabilityReport, grid) -> AvailabilityReport:
+        """Saves a built report and, in 'rows' storage mode, its detail rows in one transaction."""
+        with transaction.atomic():
+            report.save()
+            transaction.on_commit(lambda: report_cache.set_report_id(
+                self.user_profile.pk, report.start_week, self.slot_minutes, report.entries_fingerprint, report.pk
+            ))
+
+            if self.storage == 'rows':
+                AvailabilityHourlyDetail.objects.bulk_create(self._build_details(report, grid))
+
+            AggregateService.record([(report, grid)])
+            return report
+
+    @instrumentation.timed('availability.grid')
+    def _build_report(self, start_week: date, start_dt: datetime, end_dt: datetime, rows):
+        """Runs the engine over the week's entry rows and returns the unsaved report and its grid."""
+        instrumentation.count('availability_slots_total', 7 * 24 * 60 // self.slot_minutes)
+        # One bit per slot of the week and category, set when the slot is busy
+        masks = category_masks([row[1:] for row in rows], start_dt, self.slot_minutes)
+        if self.engine == 'sweep':
+            # The per-category sweep already covers every entry: the busy grid is its union
+            grid = WeekGrid(self.slot_minutes, reduce(operator.or_, masks.values(), 0))
+        else:
+            intervals = [(start_time, end_time) for _, start_time, end_time, _ in rows]
+            grid = ENGINES[self.engine](intervals, start_dt, end_dt, self.slot_minutes)
+
+        # Calculate Summary
+        total_hours_in_week = 7 * 24 # 168 hours
+        total_available_hours = grid.available_hours
+        availability_ratio = total_available_hours / total_hours_in_week if total_hours_in_week > 0 else 0.0
+        category_hours, weighted_ratio = self._category_summary(masks, grid)
+
+        report = AvailabilityReport(
+            user_profile=self.user_profile,
+            start_week=start_week,
+            # The week ends on the *day* before the start_dt + 7 days
+            end_week=start_dt.date() + timedelta(days=6),
+            slot_minutes=self.slot_minutes,
+            total_hours=total_hours_in_week,
+            total_available_hours=total_available_hours,
+            availability_ratio=availability_ratio,
+            weighted_availability_ratio=weighted_ratio,
+            category_hours=category_hours,
+            availability_bitmap=grid.to_bytes(),
+            entries_fingerprint=report_cache.fingerprint_entries(rows)
+        )
+        return report, grid
+
+    @staticmethod
+    def _category_summary(masks, grid):
+        """Returns the busy hours per category and the weighted availability ratio of a week."""
+        category_hours = {
+            category: mask.bit_count() * grid.slot_minutes / 60
+            for category, mask in sorted(masks.items()) if mask
+        }
+        weighted_ratio = weighted_availability_ratio(
+            masks, grid.total_slots,
+            weights=getattr(settings, 'AVAILABILITY_CATEGORY_WEIGHTS', {}),
+            excluded=getattr(settings, 'AVAILABILITY_EXCLUDED_CATEGORIES', [])
+        )
+        return category_hours, round(weighted_ratio, 3)
+
+    @staticmethod
+    def _build_details(report: AvailabilityReport, grid):
+        """Returns the unsaved granular detail rows (one per slot) of a saved report."""
+        return [
+            AvailabilityHourlyDetail(
+                report=report,
+                day_of_week=day,
+                hour_of_day=hour,
+                minute_of_hour=minute,
+                is_available=is_available
             )
+            for day, hour, minute, is_available in grid.iter_slots()
+        ]
+
+    def calculate_horizon(self, start_date: date, end_date: date, period: str = 'week'):
+        """
+        Returns the availability of every day, week or month between start_date and end_date
+        (inclusive) as a list of dicts, without creating reports.
+
+        Meant for quarterly/yearly views: the whole horizon is computed in one vectorized
+        pass (NumPy), from a single query, instead of week by week. Periods are clipped to
+        the range, so a week starting before start_date only counts its days in range.
+        """
+        vectorized = import_vectorized()
+
+        # 1. Period boundaries, as local midnights, and their slot indices
+        bounds = vectorized.period_bounds(start_date, end_date, period)
+        bound_dts = [timezone.make_aware(datetime.combine(bound, datetime.min.time())) for bound in bounds]
+        start_dt, end_dt = bound_dts[0], bound_dts[-1]
+        slot = timedelta(minutes=self.slot_minutes)
+        boundary_slots = [(bound_dt - start_dt) // slot for bound_dt in bound_dts]
+
+        # 2. One query for the whole horizon, one pass to mark busy slots
+        intervals = list(CalendarEntry.objects.filter(
+            user_profile=self.user_profile,
+            start_time__lt=end_dt,
+            end_time__gt=start_dt
+        ).values_list('start_time', 'end_time'))
+        intervals += [row[2:4] for row in occurrence_rows(self._week_recurring(start_dt, end_dt), start_dt, end_dt)]
+        busy = vectorized.busy_slots(intervals, start_dt, boundary_slots[-1], self.slot_minutes)
+
+        # 3. Available hours per period from the running count of free slots
+        total_hours, available_hours = vectorized.period_availability(busy, boundary_slots, self.slot_minutes)
+        return [
+            {
+                'period_start': bounds[index],
+                'period_end': bounds[index + 1] - timedelta(days=1),
+                'total_hours': float(total_hours[index]),
+                'total_available_hours': float(available_hours[index]),
+                'availability_ratio': float(available_hours[index] / total_hours[index]) if total_hours[index] else 0.0,
+            }
+            for index in range(len(bounds) - 1)
+        ]
+
+    def apply_entry_change(self, entry_id, before=None, after=None):
+        """
+        Incrementally refreshes the latest report of every week touched by one calendar entry
+        write, in place (one report per slot size). `before`/`after` are the entry's
+        (start_time, end_time, category) prior to and after the write (None for a created/deleted entry).
+
+        When the report matches the calendar as it was before the write, only the slots covered
+        by the old and new intervals are recomputed; otherwise the report was already stale and
+        the whole week is recomputed. Either way only the changed detail rows are updated.
+        Returns the reports that were patched.
+        """
+        weeks = set()
+        for span in (before, after):
+            if span is not None:
+                weeks.update(report_cache.weeks_spanned(span[0], span[1]))
+        return self._patch_weeks(weeks, entry_id, before, after)
+
+    def refresh_weeks(self, weeks):
+        """
+        Recomputes the latest report of each given week and slot size in place if the calendar
+        changed under it, e.g. after a bulk import (bulk writes bypass the entry signals).
+        Returns the patched reports.
+        """
+        return self._patch_weeks(weeks)
+
+    def _patch_weeks(self, weeks, entry_id=None, before=None, after=None):
+        """
+        Brings the latest report of each week and slot size up to date, patching only the slots
+        of one entry change if given.
+        """
+        patched = []
+        for start_week in sorted(weeks):
+            _, start_dt, end_dt = self._week_window(start_week)
+            with transaction.atomic():
+                reports = list(AvailabilityReport.objects.select_for_update().filter(
+                    user_profile=self.user_profile,
+                    start_week=start_week
+                ).latest_per_week().order_by('slot_minutes'))
+                if not reports:
+                    continue
+
+                rows = self._fetch_week_entries(start_dt, end_dt)
+                fingerprint = report_cache.fingerprint_entries(rows)
+                previous_rows = previous_fingerprint = None
+                if entry_id is not None:
+                    previous_rows = [row for row in rows if row[0] != entry_id]
+                    if before is not None and before[0] < end_dt and before[1] > start_dt:
+                        previous_rows.append((entry_id, *before))
+                    previous_fingerprint = report_cache.fingerprint_entries(previous_rows)
+
+                for report in reports:
+                    if report.entries_fingerprint == fingerprint:
+                        continue # Already up to date
+                    partial = previous_fingerprint == report.entries_fingerprint
+                    change = (previous_rows, before, after) if partial else None
+                    self._patch_report(report, rows, fingerprint, start_dt, end_dt, change)
+                    patched.append(report)
+        return patched
+
+    def _patch_report(self, report: AvailabilityReport, rows, fingerprint: str, start_dt, end_dt, change=None):
+        """
+        Recomputes one report from the week's rows. With a `change` (the rows before one entry
+        write, and its old and new (start, end, category)), only the slots under the old and new
+        intervals are recomputed, and the busy hours of the entry's old and new categories are
+        adjusted by what changed in those slots.
+
+        The weighted ratio cannot be adjusted that way once a weighted or excluded category is
+        in the week, since it depends on how every category overlaps: those weeks, and reports
+        patched without a `change`, fall back to rebuilding all the category masks.
+        """
+        engine = ENGINES[self.engine]
+        grid = report.get_grid()
+        if change is None:
+            intervals = [(s, e) for _, s, e, _ in rows]
+            grid = engine(intervals, start_dt, end_dt, grid.slot_minutes)
+            masks = category_masks([row[1:] for row in rows], start_dt, grid.slot_minutes)
+            self._save_patched_report(report, grid, fingerprint, *self._category_summary(masks, grid))
+            return
+
+        # Only the slots under the old and new intervals can have changed
+        previous_rows, *spans = change
+        touched, touched_ranges = 0, []
+        for span in spans:
+            if span is None:
+                continue
+            lo, hi = interval_to_slots(span[0], span[1], start_dt, grid.slot_duration, grid.total_slots)
+            if lo >= hi:
+                continue
+            range_start = start_dt + lo * grid.slot_duration
+            range_end = start_dt + hi * grid.slot_duration
+            intervals = [(s, e) for _, s, e, _ in rows if s < range_end and e > range_start]
+            grid.replace_range(lo, hi, engine(intervals, start_dt, end_dt, grid.slot_minutes))
+            touched |= range_mask(lo, hi)
+            touched_ranges.append((range_start, range_end))
+
+        weights = getattr(settings, 'AVAILABILITY_CATEGORY_WEIGHTS', {})
+        excluded = getattr(settings, 'AVAILABILITY_EXCLUDED_CATEGORIES', [])
+        if any(row[3] in weights or row[3] in excluded for row in chain(rows, previous_rows)):
+            masks = category_masks([row[1:] for row in rows], start_dt, grid.slot_minutes)
+            self._save_patched_report(report, grid, fingerprint, *self._category_summary(masks, grid))
+            return
+
+        # Busy slots of the changed categories within the touched slots, before and after the write
+        category_hours = dict(report.category_hours)
+        for category in {span[2] for span in spans if span is not None}:
+            old, new = (
+                category_masks([
+                    row[1:] for row in week_rows
+                    if row[3] == category and any(row[1] < e and row[2] > s for s, e in touched_ranges)
+                ], start_dt, grid.slot_minutes).get(category, 0) & touched
+                for week_rows in (previous_rows, rows)
+            )
+            hours = category_hours.get(category, 0) + (new.bit_count() - old.bit_count()) * grid.slot_minutes / 60
+            if hours:
+                category_hours[category] = hours
+            else:
+                category_hours.pop(category, None)
+        # Without weighted or excluded categories the weighted ratio is the plain ratio
+        weighted_ratio = round(grid.available_count / grid.total_slots, 3)
+        self._save_patched_report(report, grid, fingerprint, dict(sorted(category_hours.items())), weighted_ratio)
+
+    @staticmethod
+    def _save_patched_report(report: AvailabilityReport, grid, fingerprint: str, category_hours, weighted_ratio):
+        """Writes a recomputed grid into an existing report, touching only the changed detail rows."""
+        changed = report.get_grid().busy ^ grid.busy
+        total_hours_in_week = 7 * 24 # 168 hours
+        report.total_available_hours = grid.available_hours
+        report.availability_ratio = grid.available_hours / total_hours_in_week
+        report.weighted_availability_ratio = weighted_ratio
+        report.category_hours = category_hours
+        report.availability_bitmap = grid.to_bytes()
+        report.entries_fingerprint = fingerprint
+        report.save(update_fields=['total_available_hours', 'availability_ratio', 'weighted_availability_ratio',
+                                   'category_hours', 'availability_bitmap', 'entries_fingerprint'])
+        AggregateService.record([(report, grid)])
+
+        # Detail rows only exist for reports stored in 'rows' mode; in 'packed' mode nothing matches
+        positions = {True: [], False: []}
+        while changed:
+            lowest_bit = changed & -changed
+            slot = lowest_bit.bit_length() - 1
+            changed ^= lowest_bit
+            day, hour, minute = grid.slot_position(slot)
+            positions[grid.is_available(slot)].append(Q(day_of_week=day, hour_of_day=hour, minute_of_hour=minute))
+        for is_available, conditions in positions.items():
+            if conditions:
+                AvailabilityHourlyDetail.objects.filter(
+                    reduce(operator.or_, conditions), report=report
+                ).update(is_available=is_available)
+class BulkAvailabilityService:
+    """
+    Calculates the weekly reports of several users over a date range at once.
+
+    All the calendar entries of the range are fetched in a single query, split by user
+    and week in memory, and every report and detail row is written with a few large
+    bulk inserts inside one transaction.
+    """
+    REPORT_BATCH_SIZE = 500
+    DETAIL_BATCH_SIZE = 2000
+
+    def __init__(self, user_profiles, engine: str = 'sweep', slot_minutes: int = DEFAULT_SLOT_MINUTES,
+                 storage: str = None):
+        self.services = {
+            profile.pk: AvailabilityService(profile, engine=engine, slot_minutes=slot_minutes, storage=storage)
+            for profile in user_profiles
+        }
+        self.slot_minutes = slot_minutes
+
+    @staticmethod
+    def weeks_in_range(start_date: date, end_date: date):
+        """Returns the Monday of every week between start_date and end_date (inclusive)."""
+        return report_cache.weeks_spanned(*(
+            timezone.make_aware(datetime.combine(day, datetime.min.time()))
+            for day in (start_date, end_date + timedelta(days=1))
+        ))
+
+    def _fetch_entries_by_week(self, weeks):
+        """Fetches the range's entries in one query and buckets the rows per (profile id, week)."""
+        _, range_start, _ = AvailabilityService._week_window(weeks[0])
+        _, _, range_end = AvailabilityService._week_window(weeks[-1])
+        rows = CalendarEntry.objects.filter(
+            user_profile_id__in=list(self.services),
+            start_time__lt=range_end,
+            end_time__gt=range_start
+        ).order_by('start_time').values_list('user_profile_id', 'id', 'start_time', 'end_time', 'category')
+
+        rules = RecurringEntry.objects.filter(user_profile_id__in=list(self.services)).overlapping(range_start, range_end)
+
+        wanted_weeks = set(weeks)
+        buckets = {}
+        for profile_id, *row in chain(rows.iterator(chunk_size=self.DETAIL_BATCH_SIZE),
+                                      occurrence_rows(rules, range_start, range_end)):
+            # Entries spanning several weeks belong to each of them
+            for start_week in report_cache.weeks_spanned(row[1], row[2]):
+                if start_week in wanted_weeks:
+                    buckets.setdefault((profile_id, start_week), []).append(tuple(row))
+        for bucket in buckets.values():
+            bucket.sort(key=lambda row: row[1])
+        return buckets
+
+    def calculate_for_range(self, start_date: date, end_date: date):
+        """Creates one report per user and week between start_date and end_date. Returns the reports."""
+        if end_date < start_date:
+            raise ValueError("end_date must not be before start_date.")
+        weeks = self.weeks_in_range(start_date, end_date)
+        buckets = self._fetch_entries_by_week(weeks)
+
+        reports, grids = [], []
+        for profile_id, service in self.services.items():
+            for start_week in weeks:
+                _, start_dt, end_dt = service._week_window(start_week)
+                report, grid = service._build_report(start_week, start_dt, end_dt, buckets.get((profile_id, start_week), []))
+                reports.append(report)
+                grids.append(grid)
+
+        with transaction.atomic():
+            AvailabilityReport.objects.bulk_create(reports, batch_size=self.REPORT_BATCH_SIZE)
+            if reports and reports[0].pk is None:
+                self._fetch_report_ids(reports, weeks)
 
-            # Create the granular details
             details_to_create = []
-            for day in range(7):
-                for hour in range(24):
-                    is_available = availability_grid[day][hour]
-                    details_to_create.append(AvailabilityHourlyDetail(
-                        report=report,
-                        day_of_week=day,
-                        hour_of_day=hour,
-                        is_available=is_available
-                    ))
+            for report, grid in zip(reports, grids):
+                if self.services[report.user_profile_id].storage == 'rows':
+                    details_to_create.extend(AvailabilityService._build_details(report, grid))
+            AvailabilityHourlyDetail.objects.bulk_create(details_to_create, batch_size=self.DETAIL_BATCH_SIZE)
+            AggregateService.record(zip(reports, grids))
+
+            transaction.on_commit(lambda: [
+                report_cache.set_report_id(report.user_profile_id, report.start_week, report.slot_minutes,
+                                           report.entries_fingerprint, report.pk)
+                for report in reports
+            ])
+        return reports
+
+    def _fetch_report_ids(self, reports, weeks):
+        """
+        Backends that cannot return ids from a bulk insert (MySQL) get them re-read here, by
+        the (user, week, created_at) of each report: bulk_create stamped every instance with its
+        own created_at, so reports other writers inserted meanwhile for the same weeks never match.
+        """
+        created = [report.created_at for report in reports]
+        rows = AvailabilityReport.objects.filter(
+            user_profile_id__in=list(self.services),
+            start_week__in=weeks,
+            slot_minutes=self.slot_minutes,
+            created_at__range=(min(created), max(created))
+        ).values_list('user_profile_id', 'start_week', 'created_at', 'id')
+        ids_by_key = {tuple(row[:3]): row[3] for row in rows}
+        for report in reports:
+            report.pk = ids_by_key[(report.user_profile_id, report.start_week, report.created_at)]
+            report._state.adding = False
+
+
+class AggregateService:
+    """
+    Maintains the AvailabilityAggregate table: the available and busy hours of each user per
+    day, week and month and slot size, taken from the latest report of every week.
+
+    Day and week rows are upserted from the grids of the reports just written; the month rows
+    touched are then re-summed from their day rows (a week can straddle two months). The whole
+    update is a few set-based queries per batch, run in the transaction that saves the reports.
+    A report reused by the memoized path is recorded again unless its week already comes from
+    it: a recalculation may have replaced it in the meantime (e.g. after a calendar edit that
+    was later undone).
+    """
+    BATCH_SIZE = 500
+    UPDATE_FIELDS = ['total_hours', 'available_hours', 'busy_hours', 'availability_ratio', 'report', 'updated_at']
+
+    @classmethod
+    def record(cls, reports_and_grids):
+        """Upserts the aggregates of saved reports, given as (report, grid) pairs."""
+        rows, months = {}, set()
+        for report, grid in reports_and_grids:
+            key = (report.user_profile_id, report.slot_minutes)
+            # A later report of the same user, week and slot size wins
+            rows[(*key, AggregatePeriod.WEEK, report.start_week)] = (7 * 24, grid.available_hours, report.pk)
+            for day, available_hours in enumerate(grid.day_available_hours()):
+                day_date = report.start_week + timedelta(days=day)
+                rows[(*key, AggregatePeriod.DAY, day_date)] = (24, available_hours, report.pk)
+                months.add((*key, day_date.replace(day=1)))
+        if not rows:
+            return
+        cls._upsert(rows)
+        cls._upsert(cls._month_rows(months))
+
+    @classmethod
+    def record_if_missing(cls, report: AvailabilityReport):
+        """Records a report unless the aggregates of its week already come from it (one query when they do)."""
+        if not AvailabilityAggregate.objects.filter(
+            user_profile_id=report.user_profile_id,
+            period=AggregatePeriod.WEEK,
+            slot_minutes=report.slot_minutes,
+            period_start=report.start_week,
+            report=report
+        ).exists():
+            with transaction.atomic():
+                cls.record([(report, report.get_grid())])
+
+    @staticmethod
+    def _month_rows(months):
+        """Sums the day rows of the given (profile id, slot minutes, first day of month) triples."""
+        profile_ids = {profile_id for profile_id, _, _ in months}
+        first_month = min(month for _, _, month in months)
+        last_month = max(month for _, _, month in months)
+        next_month = (last_month + timedelta(days=31)).replace(day=1)
+        totals = AvailabilityAggregate.objects.filter(
+            user_profile_id__in=profile_ids,
+            period=AggregatePeriod.DAY,
+            period_start__gte=first_month,
+            period_start__lt=next_month
+        ).annotate(month=TruncMonth('period_start')).values('user_profile_id', 'slot_minutes', 'month').annotate(
+            total=Sum('total_hours'), available=Sum('available_hours')
+        ).order_by()
+        return {
+            (row['user_profile_id'], row['slot_minutes'], AggregatePeriod.MONTH, row['month']):
+                (row['total'], row['available'], None)
+            for row in totals if (row['user_profile_id'], row['slot_minutes'], row['month']) in months
+        }
+
+    @classmethod
+    def _upsert(cls, rows):
+        """
+        Inserts or updates one aggregate per (profile id, slot minutes, period, period_start):
+        (total_hours, available_hours, source report id).
+        """
+        aggregates = [
+            AvailabilityAggregate(
+                user_profile_id=profile_id,
+                slot_minutes=slot_minutes,
+                period=period,
+                period_start=period_start,
+                total_hours=total_hours,
+                available_hours=available_hours,
+                busy_hours=total_hours - available_hours,
+                availability_ratio=available_hours / total_hours if total_hours else 0.0,
+                report_id=report_id,
+                updated_at=timezone.now()
+            )
+            for (profile_id, slot_minutes, period, period_start), (total_hours, available_hours, report_id) in rows.items()
+        ]
+        # MySQL's ON DUPLICATE KEY UPDATE matches any unique key and takes no conflict target
+        unique_fields = (['user_profile', 'period', 'slot_minutes', 'period_start']
+                         if connection.features.supports_update_conflicts_with_target else None)
+        AvailabilityAggregate.objects.bulk_create(
+            aggregates, batch_size=cls.BATCH_SIZE,
+            update_conflicts=True, unique_fields=unique_fields, update_fields=cls.UPDATE_FIELDS
+        )
+
+
+class FreeSlotService:
+    """Finds the free windows of a user's calendar, straight from an IntervalIndex of their entries."""
+
+    def __init__(self, user_profile: UserProfile):
+        self.user_profile = user_profile
+
+    def build_index(self, start_dt: datetime, end_dt: datetime) -> IntervalIndex:
+        """Indexes the (merged) intervals of the entries overlapping the window."""
+        intervals = list(CalendarEntry.objects.filter(
+            user_profile=self.user_profile,
+            start_time__lt=end_dt,
+            end_time__gt=start_dt
+        ).order_by('start_time').values_list('start_time', 'end_time'))
+        rules = RecurringEntry.objects.filter(user_profile=self.user_profile).overlapping(start_dt, end_dt)
+        intervals += [row[2:4] for row in occurrence_rows(rules, start_dt, end_dt)]
+        return IntervalIndex(intervals)
+
+    def find_free_windows(self, start_dt: datetime, end_dt: datetime, min_duration: timedelta = timedelta(hours=1),
+                          working_hours=None, weekdays_only: bool = False):
+        """Returns the (start, end) free windows of at least min_duration within [start_dt, end_dt)."""
+        index = self.build_index(start_dt, end_dt)
+        return index.free_windows(start_dt, end_dt, min_duration, working_hours, weekdays_only)
+
+
+class CommonAvailabilityService:
+    """
+    Finds the time slots where a group of users is free at the same time, e.g. to pick
+    a meeting slot. All the attendees' entries are read in a single query.
+    """
+
+    def __init__(self, user_profiles, slot_minutes: int = DEFAULT_SLOT_MINUTES):
+        if slot_minutes not in SLOT_MINUTES_CHOICES:
+            raise ValueError(f"Unsupported slot size: {slot_minutes} minutes. Choose from {SLOT_MINUTES_CHOICES}.")
+        self.user_profiles = list(user_profiles)
+        self.slot_minutes = slot_minutes
+
+    def _fetch_intervals_by_user(self, start_dt: datetime, end_dt: datetime):
+        """Groups the (start_time, end_time) intervals overlapping the window by attendee, in one query."""
+        intervals_by_user = {profile.id: [] for profile in self.user_profiles}
+        rows = CalendarEntry.objects.filter(
+            user_profile__in=self.user_profiles,
+            start_time__lt=end_dt,
+            end_time__gt=start_dt
+        ).values_list('user_profile_id', 'start_time', 'end_time')
+        for profile_id, start_time, end_time in rows:
+            intervals_by_user[profile_id].append((start_time, end_time))
+        rules = RecurringEntry.objects.filter(user_profile__in=self.user_profiles).overlapping(start_dt, end_dt)
+        for profile_id, _, start_time, end_time, _ in occurrence_rows(rules, start_dt, end_dt):
+            intervals_by_user[profile_id].append((start_time, end_time))
+        return intervals_by_user
+
+    def calculate(self, start_dt: datetime, end_dt: datetime, min_duration: timedelta = timedelta(0),
+                  working_hours=None, weekdays_only: bool = False):
+        """
+        Returns a dict with:
+        - common_windows: the (start, end) windows where every attendee is free, lasting
+          at least min_duration (optionally restricted to working hours / weekdays);
+        - free_counts: the number of free attendees for each slot of [start_dt, end_dt),
+          to rank partial matches when no common window exists.
+        """
+        # 1. Load every attendee's intervals at once
+        intervals_by_user = self._fetch_intervals_by_user(start_dt, end_dt)
+
+        # 2. AND the per-attendee free bitsets and count free attendees per slot
+        common_free, free_counts, _ = common_availability(
+            intervals_by_user.values(), start_dt, end_dt, self.slot_minutes
+        )
+
+        # 3. Convert the runs of common free slots back into datetime windows
+        slot = timedelta(minutes=self.slot_minutes)
+        windows = [(start_dt + lo * slot, min(start_dt + hi * slot, end_dt)) for lo, hi in iter_bit_runs(common_free)]
+        if working_hours is not None or weekdays_only:
+            windows = intersect_windows(windows, working_windows(start_dt, end_dt, working_hours, weekdays_only))
+
+        return {
+            'attendees': [profile.id for profile in self.user_profiles],
+            'slot_minutes': self.slot_minutes,
+            'common_windows': [(start, end) for start, end in windows if end - start >= min_duration],
+            'free_counts': free_counts,
+        }
+
+
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer produces lines to stream."""
+
+    def write(self, value):
+        return value
 
-            AvailabilityHourlyDetail.objects.bulk_create(details_to_create)
 
-            return report
 class ExportService:
     """
     Service responsible for generating and returning CSV and PDF files
@@ -126,6 +768,23 @@ class ExportService:
     def __init__(self, report: AvailabilityReport):
         self.report = report
 
+    DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    STREAM_CHUNK_SIZE = 100
+
+    @classmethod
+    def _iter_detail_rows(cls, report: AvailabilityReport):
+        """Yields one [day, hour range, status] row per slot of the report."""
+        # Decoded from the packed bitmap when present, so no detail rows are needed
+        slot_minutes = report.slot_minutes
+        for day_of_week, hour_of_day, minute_of_hour, is_available in report.iter_slots():
+            # Mapping for better readability (0=Monday, 6=Sunday)
+            day = cls.DAY_NAMES[day_of_week]
+            slot_start = hour_of_day * 60 + minute_of_hour
+            slot_end = slot_start + slot_minutes
+            hour_range = f"{slot_start // 60:02d}:{slot_start % 60:02d} - {slot_end // 60:02d}:{slot_end % 60:02d}"
+            status = "Available" if is_available else "Busy"
+            yield [day, hour_range, status]
+
     def _get_report_data(self):
         """Helper function to format report data into a list of lists (CSV/Table format)."""
         data = []
@@ -133,39 +792,51 @@ class ExportService:
         data.append(["Day", "Hour (24h)", "Availability Status"])
 
         # Detail rows
-        # Mapping for better readability (0=Monday, 6=Sunday)
-        day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-
-        details = self.report.hourly_details.all()
-
-        for detail in details:
-            day = day_names[detail.day_of_week]
-            hour_range = f"{detail.hour_of_day:02d}:00 - {detail.hour_of_day+1:02d}:00"
-            status = "Available" if detail.is_available else "Busy"
-            data.append([day, hour_range, status])
+        data.extend(self._iter_detail_rows(self.report))
 
         return data
 
+    def _iter_csv_rows(self):
+        """Yields the summary metadata followed by the detail table."""
+        yield ["REPORT SUMMARY", ""]
+        yield ["User", self.report.user_profile.user.username]
+        yield ["Week Start", str(self.report.start_week)]
+        yield ["Total Available Hours", str(self.report.total_available_hours)]
+        yield ["Availability Ratio", f"{self.report.availability_ratio:.3f}"]
+        yield []
+        yield from self._get_report_data()
+
+    @instrumentation.timed('export.csv')
     def generate_csv(self) -> bytes:
         """Generates the report data as a CSV byte stream."""
         # Use io.StringIO for text stream and then encode to bytes
         output = io.StringIO()
         writer = csv.writer(output)
-
-        # Add summary metadata first
-        writer.writerow(["REPORT SUMMARY", ""])
-        writer.writerow(["User", self.report.user_profile.user.username])
-        writer.writerow(["Week Start", str(self.report.start_week)])
-        writer.writerow(["Total Available Hours", str(self.report.total_available_hours)])
-        writer.writerow(["Availability Ratio", f"{self.report.availability_ratio:.3f}"])
-        writer.writerow([])
-
-        # Add detail rows
-        for row in self._get_report_data():
+        for row in self._iter_csv_rows():
             writer.writerow(row)
 
         return output.getvalue().encode('utf-8')
 
+    def stream_csv(self):
+        """Same content as generate_csv, produced line by line for a StreamingHttpResponse."""
+        writer = csv.writer(_Echo())
+        for row in self._iter_csv_rows():
+            yield writer.writerow(row).encode('utf-8')
+
+    @classmethod
+    def stream_reports_csv(cls, reports):
+        """
+        Streams many reports as one flat CSV table, one line per slot. `reports` is a queryset
+        read with .iterator(), so memory stays constant however long the date range is.
+        """
+        writer = csv.writer(_Echo())
+        yield writer.writerow(["User", "Week Start", "Slot Minutes", "Day", "Hour (24h)", "Availability Status"]).encode('utf-8')
+        for report in reports.with_grid_data().iterator(chunk_size=cls.STREAM_CHUNK_SIZE):
+            prefix = [report.user_profile.user.username, str(report.start_week), report.slot_minutes]
+            lines = [writer.writerow(prefix + row) for row in cls._iter_detail_rows(report)]
+            yield ''.join(lines).encode('utf-8')
+
+    @instrumentation.timed('export.pdf')
     def generate_pdf(self) -> bytes:
         """Generates the report data as a PDF byte stream using ReportLab."""
         buffer = io.BytesIO()
@@ -207,4 +878,597 @@ class ExportService:
 
         # Rewind buffer and return bytes
         buffer.seek(0)
-        return buffer.read()
\ No newline at end of file
+        return buffer.read()
+
+    def generate_heatmap_pdf(self) -> bytes:
+        """Generates a one-page PDF showing the week as a day x hour heatmap plus a summary."""
+        return self.render_heatmap_pdf([self.report])
+
+    @classmethod
+    @instrumentation.timed('export.heatmap_pdf')
+    def render_heatmap_pdf(cls, reports) -> bytes:
+        """
+        Draws each report as one compact landscape page: a summary line and a 7-row heatmap
+        (one column per slot) painted directly onto the canvas. Consecutive slots with the
+        same status are drawn as a single rectangle, so a page is a few dozen drawing ops
+        instead of a flowable table spread over several pages.
+        """
+        buffer = io.BytesIO()
+        page_width, page_height = landscape(letter)
+        pdf = canvas.Canvas(buffer, pagesize=(page_width, page_height), pageCompression=1)
+        margin, label_width = 36, 70
+        grid_width = page_width - 2 * margin - label_width
+        row_height = 40
+        grid_top = page_height - margin - 70
+
+        for report in reports:
+            grid = report.get_grid()
+            cell_width = grid_width / grid.slots_per_day
+
+            # 1. Title and Summary
+            pdf.setFont('Helvetica-Bold', 16)
+            pdf.drawString(margin, page_height - margin - 16, f"Availability Report for {report.user_profile.user.username}")
+            pdf.setFont('Helvetica', 10)
+            pdf.drawString(margin, page_height - margin - 36,
+                           f"Week of {report.start_week}. Total Available Hours: {report.total_available_hours} / "
+                           f"{report.total_hours} (Ratio: {report.availability_ratio:.3f}). "
+                           f"{report.slot_minutes}-minute slots.")
+
+            # 2. Hour labels
+            pdf.setFont('Helvetica', 7)
+            for hour in range(24):
+                x = margin + label_width + hour * 60 / report.slot_minutes * cell_width
+                pdf.drawString(x + 1, grid_top + 4, f"{hour:02d}")
+
+            # 3. Heatmap rows, drawn as runs of identical slots
+            for day in range(7):
+                y = grid_top - (day + 1) * row_height
+                pdf.setFillColor(colors.black)
+                pdf.setFont('Helvetica', 9)
+                pdf.drawString(margin, y + row_height / 2 - 3, cls.DAY_NAMES[day])
+                first_slot = day * grid.slots_per_day
+                run_start = 0
+                for offset in range(1, grid.slots_per_day + 1):
+                    if (offset == grid.slots_per_day
+                            or grid.is_available(first_slot + offset) != grid.is_available(first_slot + run_start)):
+                        is_available = grid.is_available(first_slot + run_start)
+                        pdf.setFillColor(colors.mediumseagreen if is_available else colors.indianred)
+                        pdf.rect(margin + label_width + run_start * cell_width, y,
+                                 (offset - run_start) * cell_width, row_height, stroke=0, fill=1)
+                        run_start = offset
+
+            # 4. Hour grid lines and legend
+            pdf.setStrokeColor(colors.white)
+            pdf.setLineWidth(0.5)
+            for hour in range(1, 24):
+                x = margin + label_width + hour * 60 / report.slot_minutes * cell_width
+                pdf.line(x, grid_top, x, grid_top - 7 * row_height)
+            legend_y = grid_top - 7 * row_height - 24
+            for index, (label, color) in enumerate((("Available", colors.mediumseagreen), ("Busy", colors.indianred))):
+                x = margin + label_width + index * 90
+                pdf.setFillColor(color)
+                pdf.rect(x, legend_y, 10, 10, stroke=0, fill=1)
+                pdf.setFillColor(colors.black)
+                pdf.drawString(x + 14, legend_y + 2, label)
+
+            pdf.showPage()
+
+        pdf.save()
+        return buffer.getvalue()
+
+
+class ArtifactService:
+    """
+    Caches rendered exports (ReportArtifact) per report and content hash, and renders them
+    either inline or in a background thread pool (e.g. right after a report is calculated).
+    """
+    # Bump when the CSV/PDF layouts change so previously cached artifacts are re-rendered
+    RENDER_VERSION = 1
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, report: AvailabilityReport):
+        self.report = report
+
+    def content_hash(self) -> str:
+        """Hash of everything the exports are rendered from."""
+        report = self.report
+        content = "|".join(map(str, (
+            self.RENDER_VERSION,
+            report.user_profile.user.username,
+            report.start_week,
+            report.slot_minutes,
+            self._stored_decimal('total_hours'),
+            self._stored_decimal('total_available_hours'),
+            self._stored_decimal('availability_ratio'),
+            report.get_grid().to_bytes().hex(),
+        )))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _stored_decimal(self, name: str) -> str:
+        """
+        A decimal field of the report as the database stores it: a freshly calculated report
+        holds floats where a loaded one holds Decimals, and both must hash alike.
+        """
+        field = AvailabilityReport._meta.get_field(name)
+        return f"{field.to_python(getattr(self.report, name)):.{field.decimal_places}f}"
+
+    def renderer(self, kind: str):
+        """Returns the ExportService method producing the bytes of an export kind."""
+        export_service = ExportService(report=self.report)
+        return {
+            ArtifactKind.CSV: export_service.generate_csv,
+            ArtifactKind.PDF: export_service.generate_pdf,
+            ArtifactKind.HEATMAP_PDF: export_service.generate_heatmap_pdf,
+        }[kind]
+
+    def lookup(self, kind: str):
+        """Returns the artifact of this kind for the current report content, or None."""
+        return ReportArtifact.objects.filter(report=self.report, kind=kind, content_hash=self.content_hash()).first()
+
+    @staticmethod
+    def is_stale(artifact: ReportArtifact) -> bool:
+        """A pending artifact whose renderer never finished (e.g. the process restarted)."""
+        timeout = timedelta(seconds=getattr(settings, 'EXPORT_RENDER_TIMEOUT', 300))
+        return artifact.status == ArtifactStatus.PENDING and artifact.updated_at < timezone.now() - timeout
+
+    def render(self, kind: str) -> ReportArtifact:
+        """Renders the export inline and stores it as the READY artifact for the current content."""
+        content_hash = self.content_hash()
+        try:
+            result = {'data': self.renderer(kind)(), 'status': ArtifactStatus.READY, 'error': ''}
+        except Exception as e:
+            logger.exception("Rendering the %s export of report %s failed", kind, self.report.pk)
+            result = {'data': None, 'status': ArtifactStatus.FAILED, 'error': str(e)}
+        artifact = self._store(kind, content_hash, result)
+        # Artifacts of older report content are never served again
+        ReportArtifact.objects.filter(report=self.report, kind=kind).exclude(content_hash=content_hash).delete()
+        return artifact
+
+    def _store(self, kind: str, content_hash: str, fields) -> ReportArtifact:
+        """
+        Writes the artifact of a kind and content hash. The same artifact may be rendered
+        concurrently (inline by a request and by the background pool): when the other writer
+        inserts the row first, this one updates it instead of failing on the unique key.
+        """
+        lookup = {'report': self.report, 'kind': kind, 'content_hash': content_hash}
+        if not ReportArtifact.objects.filter(**lookup).update(**fields, updated_at=timezone.now()):
+            try:
+                with transaction.atomic():
+                    return ReportArtifact.objects.create(**lookup, **fields)
+            except IntegrityError:
+                # Inserted by the other writer since the update above
+                ReportArtifact.objects.filter(**lookup).update(**fields, updated_at=timezone.now())
+        return ReportArtifact.objects.get(**lookup)
+
+    async def arender(self, kind: str) -> bytes:
+        """
+        Async counterpart of lookup + render for ASGI views: serves the READY artifact of the
+        current content, or renders it and stores it. Returns the bytes. Rendering may read the
+        report's rows, so it runs on Django's thread-sensitive executor like the async ORM does:
+        a plain worker thread would open a database connection that is never closed.
+        """
+        content_hash = self.content_hash()
+        artifact = await ReportArtifact.objects.filter(
+            report=self.report, kind=kind, content_hash=content_hash, status=ArtifactStatus.READY
+        ).afirst()
+        if artifact is not None:
+            return bytes(artifact.data)
+
+        data = await sync_to_async(self.renderer(kind), thread_sensitive=True)()
+        await ReportArtifact.objects.aupdate_or_create(
+            report=self.report, kind=kind, content_hash=content_hash,
+            defaults={'data': data, 'status': ArtifactStatus.READY, 'error': ''}
+        )
+        # Artifacts of older report content are never served again
+        await ReportArtifact.objects.filter(report=self.report, kind=kind).exclude(content_hash=content_hash).adelete()
+        return data
+
+    def schedule(self, kinds) -> list:
+        """Marks the exports as pending and renders them in the background. Returns the artifacts."""
+        content_hash = self.content_hash()
+        artifacts = []
+        for kind in kinds:
+            artifact, created = ReportArtifact.objects.get_or_create(report=self.report, kind=kind, content_hash=content_hash)
+            if not created and artifact.status != ArtifactStatus.FAILED and not self.is_stale(artifact):
+                artifacts.append(artifact)
+                continue
+            if not created:
+                artifact.status, artifact.error = ArtifactStatus.PENDING, ''
+                artifact.save(update_fields=['status', 'error', 'updated_at'])
+            self._submit(self._render_in_background, self.report.pk, kind)
+            artifacts.append(artifact)
+        return artifacts
+
+    @classmethod
+    def _render_in_background(cls, report_id, kind):
+        close_old_connections()
+        try:
+            report = AvailabilityReport.objects.with_grid_data().filter(pk=report_id).first()
+            if report is not None:
+                cls(report).render(kind)
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def _submit(cls, fn, *args):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'EXPORT_RENDER_WORKERS', 2),
+                    thread_name_prefix='export-render'
+                )
+        return cls._executor.submit(fn, *args)
+
+
+class AvailabilityJobService:
+    """
+    Database-backed job queue for report calculations: the API enqueues a row and returns
+    at once, and run_availability_worker processes claim and run the jobs. Claiming uses
+    SELECT ... FOR UPDATE SKIP LOCKED, so several workers never pick the same job.
+    """
+
+    def __init__(self, worker_id: str = ''):
+        self.worker_id = worker_id
+
+    @staticmethod
+    def enqueue(user_profile: UserProfile, target_date: date, slot_minutes: int = DEFAULT_SLOT_MINUTES,
+                force: bool = False) -> AvailabilityJob:
+        if slot_minutes not in SLOT_MINUTES_CHOICES:
+            raise ValueError(f"Unsupported slot size: {slot_minutes} minutes. Choose from {SLOT_MINUTES_CHOICES}.")
+        return AvailabilityJob.objects.create(
+            user_profile=user_profile, target_date=target_date, slot_minutes=slot_minutes, force=force
+        )
+
+    def claim_next(self):
+        """Marks the oldest queued job as running and returns it, or None when the queue is empty."""
+        with transaction.atomic():
+            job = AvailabilityJob.objects.select_for_update(skip_locked=True).filter(
+                status=JobStatus.QUEUED
+            ).order_by('created_at', 'id').first()
+            if job is None:
+                return None
+            job.status = JobStatus.RUNNING
+            job.started_at = timezone.now()
+            job.finished_at = None
+            job.attempts += 1
+            job.worker = self.worker_id
+            job.save(update_fields=['status', 'started_at', 'finished_at', 'attempts', 'worker'])
+        return job
+
+    def run(self, job: AvailabilityJob) -> AvailabilityJob:
+        """Calculates the job's report and records the outcome; failures are retried up to the attempt limit."""
+        try:
+            service = AvailabilityService(job.user_profile, slot_minutes=job.slot_minutes)
+            if job.force:
+                report = service.calculate_availability_for_week(job.target_date)
+            else:
+                report, _ = service.get_or_calculate_for_week(job.target_date)
+        except Exception as e:
+            logger.exception("Availability job %s failed (attempt %s)", job.pk, job.attempts)
+            max_attempts = getattr(settings, 'AVAILABILITY_JOB_MAX_ATTEMPTS', 3)
+            job.status = JobStatus.QUEUED if job.attempts < max_attempts else JobStatus.FAILED
+            job.error = str(e)
+        else:
+            job.status, job.report, job.error = JobStatus.SUCCEEDED, report, ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'report', 'error', 'finished_at'])
+        return job
+
+    def run_next(self):
+        """Claims and runs one job. Returns it, or None when nothing was queued."""
+        job = self.claim_next()
+        return self.run(job) if job is not None else None
+
+    @staticmethod
+    def requeue_stale():
+        """
+        Puts back running jobs whose worker died (running longer than AVAILABILITY_JOB_STALE_SECONDS),
+        or fails them once they used up their attempts. Returns the number of jobs touched.
+        """
+        stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'AVAILABILITY_JOB_STALE_SECONDS', 600))
+        stale = AvailabilityJob.objects.filter(status=JobStatus.RUNNING, started_at__lt=stale_before)
+        max_attempts = getattr(settings, 'AVAILABILITY_JOB_MAX_ATTEMPTS', 3)
+        requeued = stale.filter(attempts__lt=max_attempts).update(status=JobStatus.QUEUED)
+        failed = stale.update(status=JobStatus.FAILED, error="Worker stopped before finishing the job.",
+                              finished_at=timezone.now())
+        return requeued + failed
+
+
+class CalendarImportService:
+    """
+    Imports calendar entries in bulk from parsed rows (see importers.py). Rows are validated a
+    chunk at a time, column by column, and each chunk is written with one lookup, one
+    bulk_create and one bulk_update in its own transaction. A row with an external_id updates
+    the user's entry with the same id, so importing the same file twice changes nothing; rows
+    without one are always created. Invalid rows are reported and skipped, the others are kept.
+
+    Bulk writes bypass the CalendarEntry signals, so the touched weeks are refreshed here once
+    the import is done: memoized fingerprints are invalidated and, with incremental updates
+    enabled, the latest reports of those weeks are recomputed.
+    """
+    CHUNK_SIZE = 500
+    MAX_REPORTED_ERRORS = 100
+    UPDATE_FIELDS = ('title', 'category', 'start_time', 'end_time')
+
+    def __init__(self, user_profile: UserProfile, chunk_size: int = None, max_rows: int = None):
+        self.user_profile = user_profile
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.max_rows = max_rows or getattr(settings, 'AVAILABILITY_IMPORT_MAX_ROWS', 100000)
+
+    def import_rows(self, rows):
+        """
+        Imports (row_number, fields) pairs. Returns the counts of received, created, updated,
+        unchanged and failed rows, and the errors of the first MAX_REPORTED_ERRORS failed rows.
+        A payload that stops being readable halfway ends the import after the rows read so far.
+        """
+        summary = {'received': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'errors': []}
+        seen_ids = {} # external_id -> first row number, across chunks
+        touched_weeks = set()
+        chunk = []
+        try:
+            try:
+                for row in rows:
+                    if summary['received'] >= self.max_rows:
+                        self._add_error(summary, None, None, f"Import stopped after {self.max_rows} rows.")
+                        break
+                    summary['received'] += 1
+                    chunk.append(row)
+                    if len(chunk) >= self.chunk_size:
+                        touched_weeks |= self._import_chunk(chunk, seen_ids, summary)
+                        chunk = []
+            except (ImportFormatError, UnicodeDecodeError) as exc:
+                self._add_error(summary, None, None, f"Import stopped: {exc}")
+            if chunk:
+                touched_weeks |= self._import_chunk(chunk, seen_ids, summary)
+        finally:
+            # Chunks commit one by one: refresh what was written even if a later chunk failed
+            if touched_weeks:
+                transaction.on_commit(lambda: self._refresh_weeks(touched_weeks))
+        return summary
+
+    def _import_chunk(self, chunk, seen_ids, summary):
+        """Validates and writes one chunk. Returns the weeks whose entries changed."""
+        valid, errors = self._validate(chunk, seen_ids)
+        for row_number, external_id, row_errors in errors:
+            self._add_error(summary, row_number, external_id, row_errors)
+        if not valid:
+            return set()
+
+        try:
+            created, updated, spans = self._write(valid)
+        except IntegrityError:
+            # Another import created some of these external ids since the lookup: look again
+            created, updated, spans = self._write(valid)
+        summary['created'] += created
+        summary['updated'] += updated
+        summary['unchanged'] += len(valid) - created - updated
+        weeks = set()
+        for start_time, end_time in spans:
+            weeks.update(report_cache.weeks_spanned(start_time, end_time))
+        return weeks
+
+    def _validate(self, chunk, seen_ids):
+        """
+        Checks a chunk column by column. Returns the valid rows as dicts of model field values,
+        and (row_number, external_id, {field: [messages]}) for each invalid row.
+        """
+        # 1. Rows the parser could not read at all
+        errors = [
+            (row_number, None, {'non_field_errors': [fields['__error__']]})
+            for row_number, fields in chunk if '__error__' in fields
+        ]
+        chunk = [(row_number, fields) for row_number, fields in chunk if '__error__' not in fields]
+        row_numbers = [row_number for row_number, _ in chunk]
+        records = [fields for _, fields in chunk]
+        problems = [{} for _ in records]
+
+        def flag(index, field, message):
+            problems[index].setdefault(field, []).append(message)
+
+        # 2. One pass per column
+        external_ids = [self._text(record.get('external_id')) or None for record in records]
+        titles = [self._text(record.get('title')) for record in records]
+        categories = [
+            resolve_category(record['category']) if self._text(record.get('category')) else EventCategory.OTHER
+            for record in records
+        ]
+        starts = [self._datetime(record.get('start_time')) for record in records]
+        ends = [self._datetime(record.get('end_time')) for record in records]
+
+        for index, external_id in enumerate(external_ids):
+            if external_id is not None and len(external_id) > 255:
+                flag(index, 'external_id', "Ensure this field has no more than 255 characters.")
+        for index, title in enumerate(titles):
+            if not title:
+                flag(index, 'title', "This field is required.")
+            elif len(title) > 255:
+                flag(index, 'title', "Ensure this field has no more than 255 characters.")
+        for index, category in enumerate(categories):
+            if category is None:
+                flag(index, 'category', f"Unknown category. Choose from: {', '.join(EventCategory.values)}.")
+        for field, values in (('start_time', starts), ('end_time', ends)):
+            for index, value in enumerate(values):
+                if value is None:
+                    flag(index, field, "Missing or invalid datetime (ISO 8601 expected).")
+        for index, (start_time, end_time) in enumerate(zip(starts, ends)):
+            if start_time is not None and end_time is not None and start_time >= end_time:
+                flag(index, 'end_time', "End time must occur after start time.")
+        # 3. An external id may appear once per import (the first valid row wins)
+        for index, external_id in enumerate(external_ids):
+            if external_id is None or problems[index]:
+                continue
+            if seen_ids.setdefault(external_id, row_numbers[index]) != row_numbers[index]:
+                flag(index, 'external_id', f"Duplicate of row {seen_ids[external_id]}.")
+
+        valid = []
+        for index, row_problems in enumerate(problems):
+            if row_problems:
+                errors.append((row_numbers[index], external_ids[index], row_problems))
+            else:
+                valid.append({
+                    'external_id': external_ids[index],
+                    'title': titles[index],
+                    'category': categories[index],
+                    'start_time': starts[index],
+                    'end_time': ends[index],
+                })
+        return valid, errors
+
+    def _write(self, valid):
+        """Creates or updates the entries of a chunk. Returns (created, updated, changed spans)."""
+        with transaction.atomic():
+            external_ids = [values['external_id'] for values in valid if values['external_id']]
+            existing = {}
+            if external_ids:
+                existing = {
+                    entry.external_id: entry
+                    for entry in CalendarEntry.objects.filter(
+                        user_profile=self.user_profile,
+                        external_id__in=external_ids
+                    ).only('id', 'external_id', *self.UPDATE_FIELDS)
+                }
+
+            to_create, to_update, spans = [], [], []
+            for values in valid:
+                entry = existing.get(values['external_id'])
+                if entry is None:
+                    to_create.append(CalendarEntry(user_profile=self.user_profile, **values))
+                    spans.append((values['start_time'], values['end_time']))
+                elif any(getattr(entry, field) != values[field] for field in self.UPDATE_FIELDS):
+                    # Both the week the entry leaves and the one it moves to change
+                    spans.append((entry.start_time, entry.end_time))
+                    for field in self.UPDATE_FIELDS:
+                        setattr(entry, field, values[field])
+                    to_update.append(entry)
+                    spans.append((entry.start_time, entry.end_time))
+
+            CalendarEntry.objects.bulk_create(to_create)
+            if to_update:
+                CalendarEntry.objects.bulk_update(to_update, self.UPDATE_FIELDS)
+        return len(to_create), len(to_update), spans
+
+    def _refresh_weeks(self, weeks):
+        if getattr(settings, 'AVAILABILITY_INCREMENTAL_UPDATES', False):
+            AvailabilityService(self.user_profile).refresh_weeks(weeks)
+        report_cache.invalidate_weeks(self.user_profile.pk, weeks)
+
+    def _add_error(self, summary, row_number, external_id, errors):
+        if not isinstance(errors, dict):
+            errors = {'non_field_errors': [errors]}
+        if row_number is not None:
+            summary['failed'] += 1
+        if len(summary['errors']) < self.MAX_REPORTED_ERRORS:
+            summary['errors'].append({'row': row_number, 'external_id': external_id, 'errors': errors})
+
+    @staticmethod
+    def _text(value):
+        return '' if value is None else str(value).strip()
+
+    @staticmethod
+    def _datetime(value):
+        """Returns an aware datetime from a datetime or an ISO 8601 string, or None."""
+        if not isinstance(value, datetime):
+            try:
+                value = parse_datetime(str(value).strip()) if value else None
+            except ValueError:
+                value = None
+        if value is not None and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+
+class ReportRetentionService:
+    """
+    Compacts the AvailabilityReport table, which grows by one report (and its detail rows)
+    on every recalculation. Reports are grouped per (user, week, slot size), newest first:
+    - dedupe: an older report with the same entries_fingerprint as a newer one of its group
+      was computed from the same calendar, so it is a duplicate;
+    - keep_latest: only the N newest reports of a group are kept;
+    - max_age_days: reports created more than that many days ago are removed.
+    The newest report of every group is always kept: it is the one lookups, exports,
+    incremental updates and the aggregates use.
+
+    Users are scanned a page at a time and the selected reports are deleted in small batches,
+    each in its own short transaction with an optional pause in between, so a large backlog
+    never holds long locks on the report and detail tables (MySQL/InnoDB). Cached report ids
+    pointing at deleted reports are harmless: lookups fall back to the database.
+    """
+    BATCH_SIZE = 100 # Reports per delete; each takes its detail rows (168 per hourly report) along
+    USERS_PER_PAGE = 500
+
+    def __init__(self, keep_latest: int = None, max_age_days: int = None, dedupe: bool = True,
+                 batch_size: int = None, pause_seconds: float = 0.0, dry_run: bool = False):
+        if keep_latest is not None and keep_latest < 1:
+            raise ValueError("keep_latest must be at least 1.")
+        if max_age_days is not None and max_age_days < 0:
+            raise ValueError("max_age_days must not be negative.")
+        self.keep_latest = keep_latest
+        self.cutoff = timezone.now() - timedelta(days=max_age_days) if max_age_days is not None else None
+        self.dedupe = dedupe
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.pause_seconds = pause_seconds
+        self.dry_run = dry_run
+
+    def compact(self, on_batch=None):
+        """
+        Deletes (or, in dry-run mode, only counts) the reports the policy selects. Returns the
+        counts of scanned reports, of reports selected as duplicate, over the limit and expired,
+        and of deleted reports and detail rows. on_batch(summary) is called after each batch.
+        """
+        summary = {'scanned': 0, 'duplicate': 0, 'over_limit': 0, 'expired': 0, 'reports_deleted': 0,
+                   'details_deleted': 0}
+        pending = []
+        profile_ids = UserProfile.objects.order_by('pk').values_list('pk', flat=True)
+        last_id = 0
+        while page := list(profile_ids.filter(pk__gt=last_id)[:self.USERS_PER_PAGE]):
+            last_id = page[-1]
+            # Selected before deleting anything, so no cursor stays open on the table being deleted from
+            for report_id in list(self._select(page, summary)):
+                pending.append(report_id)
+                if len(pending) >= self.batch_size:
+                    self._delete(pending, summary, on_batch)
+                    pending = []
+        if pending:
+            self._delete(pending, summary, on_batch)
+        return summary
+
+    def _select(self, profile_ids, summary):
+        """Yields the ids of the reports of some users that the policy removes."""
+        reports = AvailabilityReport.objects.filter(user_profile_id__in=profile_ids).order_by(
+            'user_profile_id', 'start_week', 'slot_minutes', *AvailabilityReportQuerySet.NEWEST_FIRST
+        ).values_list('user_profile_id', 'start_week', 'slot_minutes', 'id', 'entries_fingerprint', 'created_at')
+        for _, group in groupby(reports.iterator(chunk_size=2000), key=lambda row: row[:3]):
+            fingerprints = set()
+            kept = 0
+            for *_, report_id, fingerprint, created_at in group:
+                summary['scanned'] += 1
+                if kept == 0:
+                    kept, fingerprints = 1, {fingerprint}
+                    continue # The newest report of the group
+                if self.dedupe and fingerprint and fingerprint in fingerprints:
+                    summary['duplicate'] += 1
+                elif self.keep_latest is not None and kept >= self.keep_latest:
+                    summary['over_limit'] += 1
+                elif self.cutoff is not None and created_at < self.cutoff:
+                    summary['expired'] += 1
+                else:
+                    kept += 1
+                    fingerprints.add(fingerprint)
+                    continue
+                yield report_id
+
+    def _delete(self, report_ids, summary, on_batch):
+        if self.dry_run:
+            summary['reports_deleted'] += len(report_ids)
+            summary['details_deleted'] += AvailabilityHourlyDetail.objects.filter(report_id__in=report_ids).count()
+        else:
+            # Details and artifacts go in one DELETE each, jobs keep their row with the report unset
+            _, deleted = AvailabilityReport.objects.filter(pk__in=report_ids).delete()
+            summary['reports_deleted'] += deleted.get(AvailabilityReport._meta.label, 0)
+            summary['details_deleted'] += deleted.get(AvailabilityHourlyDetail._meta.label, 0)
+        if on_batch is not None:
+            on_batch(summary)
+        if self.pause_seconds and not self.dry_run:
+            time.sleep(self.pause_seconds)
+
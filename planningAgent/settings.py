@@ -53,8 +53,45 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
+# Availability reports: 'rows' stores one AvailabilityHourlyDetail row per slot next to the
+# packed bitmap, 'packed' only keeps the bitmap on AvailabilityReport.
+AVAILABILITY_DETAIL_STORAGE = os.getenv('AVAILABILITY_DETAIL_STORAGE', 'rows')
+# Cache used to memoize reports per (user, week, slot size, calendar fingerprint).
+# Use a shared backend (Redis/Memcached/database) when running several workers.
+AVAILABILITY_CACHE_ALIAS = 'default'
+AVAILABILITY_CACHE_TIMEOUT = int(os.getenv('AVAILABILITY_CACHE_TIMEOUT', 3600))
+# Patch the latest report of each affected week in place whenever a CalendarEntry changes.
+AVAILABILITY_INCREMENTAL_UPDATES = os.getenv('AVAILABILITY_INCREMENTAL_UPDATES', 'False') == 'True'
+# Weighted availability ratio: categories left out of the ratio instead of counting as busy,
+# and how busy an hour of each category counts (default 1.0), e.g. {'GYM': 0.5}.
+AVAILABILITY_EXCLUDED_CATEGORIES = [category for category in os.getenv('AVAILABILITY_EXCLUDED_CATEGORIES', 'SLEEP').split(',') if category]
+AVAILABILITY_CATEGORY_WEIGHTS = {}
+# Optional dependency: NumPy (pip install numpy) powers GET /api/v1/availability/horizon/ and the
+# 'numpy' engine. Without it the horizon endpoint answers 501; nothing else needs it.
+# Longest date range accepted by the batch calculation and search endpoints.
+AVAILABILITY_MAX_RANGE_DAYS = 366
+# Largest group accepted by the common-availability search.
+AVAILABILITY_MAX_ATTENDEES = 50
+# Queued calculations (run_availability_worker): a running job older than this is considered
+# abandoned by its worker, and a failing job is retried up to the attempt limit.
+AVAILABILITY_JOB_STALE_SECONDS = 600
+AVAILABILITY_JOB_MAX_ATTEMPTS = 3
+# Most rows read from one calendar import (POST /api/v1/calendar/import/).
+AVAILABILITY_IMPORT_MAX_ROWS = 100000
+# Per-phase timings and query counts of the availability and export paths, served at
+# /api/v1/metrics/ (to staff, or with "Authorization: Bearer <AVAILABILITY_METRICS_TOKEN>")
+# and, with AVAILABILITY_SERVER_TIMING, in a Server-Timing header on every response.
+AVAILABILITY_INSTRUMENTATION = os.getenv('AVAILABILITY_INSTRUMENTATION', 'False') == 'True'
+AVAILABILITY_SERVER_TIMING = os.getenv('AVAILABILITY_SERVER_TIMING', 'False') == 'True'
+AVAILABILITY_METRICS_TOKEN = os.getenv('AVAILABILITY_METRICS_TOKEN', '')
+# Exports ('csv', 'pdf') rendered in the background right after each calculation, e.g. "pdf,csv".
+EXPORT_PRERENDER_KINDS = [kind for kind in os.getenv('EXPORT_PRERENDER_KINDS', '').split(',') if kind]
+EXPORT_RENDER_WORKERS = 2
+# Seconds after which a pending render is considered lost and is redone.
+EXPORT_RENDER_TIMEOUT = 300
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'planningAgent.instrumentation.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,6 +120,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'planningAgent.wsgi.application'
+ASGI_APPLICATION = 'planningAgent.asgi.application'
 
 
 # Database
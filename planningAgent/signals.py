@@ -0,0 +1,111 @@
+# planning/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import AvailabilityReport, CalendarEntry, RecurringEntry, UserProfile
+from . import report_cache
+
+
+@receiver(pre_save, sender=CalendarEntry)
+def remember_previous_span(sender, instance, **kwargs):
+    """Keeps the stored interval of an edited entry, so the week it moves out of is refreshed too."""
+    instance._previous_span = None
+    if instance.pk is not None:
+        instance._previous_span = (
+            CalendarEntry.objects.filter(pk=instance.pk)
+            .values_list('user_profile_id', 'start_time', 'end_time', 'category')
+            .first()
+        )
+
+
+def _on_entry_change(entry_id, profile_id, before, after):
+    """
+    After the write commits: patch the affected reports in place when incremental updates
+    are enabled, then invalidate the memoized fingerprints of the touched weeks.
+    """
+    def refresh():
+        if getattr(settings, 'AVAILABILITY_INCREMENTAL_UPDATES', False):
+            # Imported here: services imports the models this module is wired to
+            from .services import AvailabilityService
+            user_profile = UserProfile.objects.filter(pk=profile_id).first()
+            if user_profile is not None:
+                AvailabilityService(user_profile).apply_entry_change(entry_id, before, after)
+        for span in (before, after):
+            if span is not None:
+                report_cache.invalidate_span(profile_id, span[0], span[1])
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=CalendarEntry)
+def refresh_reports_on_save(sender, instance, **kwargs):
+    """Covers every save path, including CalendarEntryViewSet.perform_create and updates."""
+    before = None
+    previous_span = getattr(instance, '_previous_span', None)
+    if previous_span is not None:
+        previous_profile_id, *before = previous_span
+        if previous_profile_id != instance.user_profile_id:
+            # Entry reassigned to another profile: treat as a delete + create
+            _on_entry_change(instance.pk, previous_profile_id, tuple(before), None)
+            before = None
+    after = (instance.start_time, instance.end_time, instance.category)
+    _on_entry_change(instance.pk, instance.user_profile_id, tuple(before) if before else None, after)
+
+
+@receiver(post_delete, sender=CalendarEntry)
+def refresh_reports_on_delete(sender, instance, **kwargs):
+    before = (instance.start_time, instance.end_time, instance.category)
+    _on_entry_change(instance.pk, instance.user_profile_id, before, None)
+
+
+@receiver(pre_save, sender=RecurringEntry)
+def remember_previous_series(sender, instance, **kwargs):
+    """Keeps the stored span of an edited series, so the weeks it no longer covers are refreshed too."""
+    instance._previous_series = None
+    if instance.pk is not None:
+        instance._previous_series = (
+            RecurringEntry.objects.filter(pk=instance.pk)
+            .values_list('user_profile_id', 'start_time', 'series_end')
+            .first()
+        )
+
+
+def _on_series_change(profile_id, spans):
+    """
+    After the write commits: a series can cover any number of weeks, so every memoized
+    fingerprint of the user is invalidated at once. With incremental updates enabled, the
+    latest reports of the weeks the series covered or now covers are recomputed.
+    """
+    def refresh():
+        if getattr(settings, 'AVAILABILITY_INCREMENTAL_UPDATES', False):
+            from .services import AvailabilityService
+            user_profile = UserProfile.objects.filter(pk=profile_id).first()
+            if user_profile is not None:
+                weeks = AvailabilityReport.objects.filter(user_profile=user_profile)
+                weeks = weeks.filter(start_week__gte=report_cache.week_start(min(start for start, _ in spans)))
+                if all(end is not None for _, end in spans):
+                    weeks = weeks.filter(start_week__lt=max(end for _, end in spans))
+                AvailabilityService(user_profile).refresh_weeks(set(weeks.values_list('start_week', flat=True)))
+        report_cache.invalidate_profile(profile_id)
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=RecurringEntry)
+def refresh_reports_on_series_save(sender, instance, **kwargs):
+    spans = [(instance.start_time, instance.series_end)]
+    previous = getattr(instance, '_previous_series', None)
+    if previous is not None:
+        previous_profile_id, *previous_span = previous
+        if previous_profile_id != instance.user_profile_id:
+            _on_series_change(previous_profile_id, [tuple(previous_span)])
+        else:
+            spans.append(tuple(previous_span))
+    _on_series_change(instance.user_profile_id, spans)
+
+
+@receiver(post_delete, sender=RecurringEntry)
+def refresh_reports_on_series_delete(sender, instance, **kwargs):
+    _on_series_change(instance.user_profile_id, [(instance.start_time, instance.series_end)])
@@ -0,0 +1,24 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from planningAgent.models import UserProfile
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Memoized reports are keyed on database ids, which are reused across rolled-back tests."""
+    cache.clear()
+    yield
+    cache.clear()
+
+@pytest.fixture
+def profile(db):
+    user = User.objects.create_user(username='testuser', email='test@example.com', password='password')
+    return UserProfile.objects.create(user=user, first_name='Test', last_name='User')
+
+@pytest.fixture
+def api_client(profile):
+    client = APIClient()
+    client.force_authenticate(user=profile.user)
+    return client
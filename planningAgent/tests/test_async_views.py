@@ -0,0 +1,84 @@
+import base64
+import pytest
+from datetime import date, datetime
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.utils import timezone
+from planningAgent.models import AvailabilityReport, CalendarEntry, EventCategory
+from planningAgent.services import AvailabilityService
+
+pytestmark = pytest.mark.django_db
+
+@pytest.fixture
+def async_client(profile):
+    client = AsyncClient()
+    client.force_login(profile.user)
+    return client
+
+def test_async_calculate_matches_sync_service(async_client, profile):
+    CalendarEntry.objects.create(user_profile=profile, category=EventCategory.MEETING, title="Standup",
+                                 start_time=timezone.make_aware(datetime(2025, 10, 7, 9, 30)),
+                                 end_time=timezone.make_aware(datetime(2025, 10, 7, 11, 0)))
+
+    response = async_to_sync(async_client.post)('/api/v1/async/availability/calculate/',
+                                                 {'date': '2025-10-08'}, content_type='application/json')
+    assert response.status_code == 201
+    report = AvailabilityReport.objects.get(pk=response.json()['id'])
+    expected = AvailabilityService(user_profile=profile).calculate_availability_for_week(date(2025, 10, 8))
+    assert report.get_grid() == expected.get_grid()
+    assert len(response.json()['hourly_details']) == 168
+
+    # Same entries: the stored report is reused
+    response = async_to_sync(async_client.post)('/api/v1/async/availability/calculate/?view=summary',
+                                                 {'date': '2025-10-08'}, content_type='application/json')
+    assert response.status_code == 200
+    assert 'hourly_details' not in response.json()
+
+def test_async_retrieve_and_exports(async_client, profile):
+    report = AvailabilityService(user_profile=profile).calculate_availability_for_week(date(2025, 10, 6))
+
+    response = async_to_sync(async_client.get)(f'/api/v1/async/availability/{report.pk}/', {'view': 'compact'})
+    assert response.status_code == 200
+    assert response.json()['busy_bitmap']
+
+    async def read_csv():
+        response = await async_client.get(f'/api/v1/async/availability/{report.pk}/export-csv/')
+        return b''.join([chunk async for chunk in response.streaming_content])
+    assert len(async_to_sync(read_csv)().decode().splitlines()) > 168
+
+    response = async_to_sync(async_client.get)(f'/api/v1/async/availability/{report.pk}/export-pdf/')
+    assert response.status_code == 200
+    assert response.content.startswith(b'%PDF')
+    assert report.artifacts.count() == 1
+
+    assert async_to_sync(async_client.get)('/api/v1/async/availability/999999/').status_code == 404
+    assert async_to_sync(AsyncClient().get)(f'/api/v1/async/availability/{report.pk}/').status_code == 401
+    credentials = base64.b64encode(b'testuser:password').decode()
+    response = async_to_sync(AsyncClient().get)(f'/api/v1/async/availability/{report.pk}/',
+                                                headers={'Authorization': f'Basic {credentials}'})
+    assert response.status_code == 200
+
+def test_async_views_use_the_drf_authentication_classes(profile):
+    client = AsyncClient(enforce_csrf_checks=True)
+    client.force_login(profile.user)
+    response = async_to_sync(client.post)('/api/v1/async/availability/calculate/',
+                                          {'date': '2025-10-08'}, content_type='application/json')
+    assert response.status_code == 403
+    assert response.json()['detail'].startswith("CSRF Failed")
+
+    credentials = base64.b64encode(b'testuser:wrong').decode()
+    response = async_to_sync(AsyncClient().get)('/api/v1/async/availability/1/',
+                                                headers={'Authorization': f'Basic {credentials}'})
+    assert (response.status_code, response.json()['detail']) == (401, "Invalid username/password.")
+    assert response['WWW-Authenticate'] == 'Basic realm="api"'
+
+def test_async_calculate_logs_failures(async_client, monkeypatch, caplog):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(AvailabilityService, 'aget_or_calculate_for_week', fail)
+
+    response = async_to_sync(async_client.post)('/api/v1/async/availability/calculate/',
+                                                 {'date': '2025-10-08'}, content_type='application/json')
+
+    assert (response.status_code, response.json()['detail']) == (500, "An internal error occurred during calculation.")
+    assert "database went away" in caplog.text
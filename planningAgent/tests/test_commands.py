@@ -0,0 +1,107 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from planningAgent.models import UserProfile, AvailabilityReport
+
+pytestmark = pytest.mark.django_db
+
+@pytest.fixture
+def profiles():
+    result = []
+    for i in range(3):
+        user = User.objects.create_user(username=f'user{i}', password='password')
+        result.append(UserProfile.objects.create(user=user, first_name='Test', last_name=str(i)))
+    return result
+
+def test_recompute_availability_resumes_from_state_file(profiles, tmp_path):
+    """Users recorded as completed in the state file are skipped on --resume."""
+    state_file = tmp_path / 'state.json'
+    run = {'start_date': '2025-10-06', 'end_date': '2025-10-19', 'slot_minutes': 60, 'storage': None}
+    state_file.write_text(json.dumps({'run': run, 'completed_profile_ids': [profiles[0].pk]}))
+
+    call_command('recompute_availability', '--start-date', '2025-10-06', '--end-date', '2025-10-19',
+                 '--workers', '0', '--chunk-size', '1', '--state-file', str(state_file), '--resume')
+
+    assert not AvailabilityReport.objects.filter(user_profile=profiles[0]).exists()
+    assert AvailabilityReport.objects.filter(user_profile__in=profiles[1:]).count() == 4 # 2 users * 2 weeks
+    assert not state_file.exists() # Removed once the run completes
+
+    # A checkpoint of a run with another storage mode is not resumed
+    state_file.write_text(json.dumps({'run': {**run, 'storage': 'packed'}, 'completed_profile_ids': [profiles[0].pk]}))
+    with pytest.raises(CommandError, match='different run'):
+        call_command('recompute_availability', '--start-date', '2025-10-06', '--end-date', '2025-10-19',
+                     '--workers', '0', '--state-file', str(state_file), '--resume')
+
+def test_recompute_availability_in_worker_processes(tmp_path):
+    """
+    The process pool path, on a SQLite file shared by the workers (the test database may live in
+    memory, invisible to other processes), so the command runs in its own manage.py process.
+    """
+    env = {**os.environ, 'BENCHMARK_DB': str(tmp_path / 'db.sqlite3'),
+           'DJANGO_SETTINGS_MODULE': 'planningAgent.config.benchmark_settings'}
+
+    def manage(*args):
+        result = subprocess.run([sys.executable, 'manage.py', *args], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, timeout=300)
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+
+    manage('migrate', '--verbosity', '0')
+    manage('shell', '-c', "from planningAgent import benchmarking; benchmarking.create_profiles('user', 3)")
+    output = manage('recompute_availability', '--start-date', '2025-10-06', '--end-date', '2025-10-19',
+                    '--workers', '2', '--chunk-size', '1', '--state-file', str(tmp_path / 'state.json'))
+    assert 'Done: 3 users, 6 reports' in output
+    counts = manage('shell', '-c', "from django.db.models import Count; from planningAgent.models import AvailabilityReport; "
+                                   "print(sorted(AvailabilityReport.objects.values('user_profile')"
+                                   ".annotate(n=Count('id')).values_list('n', flat=True)))")
+    assert counts.strip().splitlines()[-1] == '[2, 2, 2]' # 3 users * 2 weeks
+
+def test_benchmark_entry_queries_cleans_up(profiles):
+    """The benchmark prints the plan and timings, then removes its synthetic dataset."""
+    from io import StringIO
+    from planningAgent.models import CalendarEntry
+    # Only the rows the run created are deleted, not whatever shares their username prefix
+    User.objects.create_user(username='bench-entries-admin', password='password')
+    out = StringIO()
+    call_command('benchmark_entry_queries', '--noinput', '--users', '2', '--entries-per-user', '20',
+                 '--weeks', '4', '--queries', '5', stdout=out)
+    output = out.getvalue()
+    assert 'Query plan with composite indexes' in output
+    assert 'median' in output
+    assert CalendarEntry.objects.count() == 0
+    assert UserProfile.objects.count() == len(profiles)
+    assert User.objects.filter(username='bench-entries-admin').exists()
+
+    # Dropping indexes is refused outside a benchmark database
+    with pytest.raises(CommandError, match='--compare-without-indexes'):
+        call_command('benchmark_entry_queries', '--noinput', '--compare-without-indexes', stdout=StringIO())
+    assert User.objects.count() == len(profiles) + 1
+
+def test_run_benchmarks_writes_and_compares_results(profiles, tmp_path):
+    """The suite times every operation, writes JSON, flags regressions and removes its dataset."""
+    from io import StringIO
+    from django.core.management.base import CommandError
+    from planningAgent.models import CalendarEntry
+    output = tmp_path / 'results.json'
+    scale = ['--users', '2', '--weeks', '2', '--entries-per-week', '5', '--repeat', '1', '--export-samples', '2']
+    call_command('run_benchmarks', *scale, '--output', str(output), stdout=StringIO())
+
+    results = json.loads(output.read_text())
+    assert set(results['results']) == {'calculate_availability_for_week', 'generate_csv', 'generate_pdf', 'report_list'}
+    assert results['results']['calculate_availability_for_week']['count'] == 4 # 2 users * 2 weeks
+    assert results['meta']['scale']['entries_per_week'] == 5
+    assert CalendarEntry.objects.count() == 0
+    assert UserProfile.objects.count() == len(profiles)
+
+    # A baseline faster than anything this run can do
+    for stats in results['results'].values():
+        stats['median'] = 1e-6
+    output.write_text(json.dumps(results))
+    with pytest.raises(CommandError, match='Slower than the baseline'):
+        call_command('run_benchmarks', *scale, '--compare', str(output), '--fail-on-regression', stdout=StringIO())
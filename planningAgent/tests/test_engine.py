@@ -0,0 +1,176 @@
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from planningAgent.engine import sweep_engine, slot_scan_engine, merge_slot_ranges, interval_to_slots, WeekGrid
+
+WEEK_START = datetime(2025, 10, 6, tzinfo=dt_timezone.utc) # A Monday
+WEEK_END = WEEK_START + timedelta(days=7)
+
+def random_intervals(seed, count):
+    """Generates overlapping intervals, some of them spilling over the week boundaries."""
+    rng = random.Random(seed)
+    intervals = []
+    for _ in range(count):
+        start = WEEK_START + timedelta(minutes=rng.randint(-24 * 60, 8 * 24 * 60))
+        end = start + timedelta(minutes=rng.randint(1, 10 * 60))
+        intervals.append((start, end))
+    return intervals
+
+def test_interval_to_slots_partial_hours():
+    """An interval from 10:30 to 11:30 touches the 10:00 and 11:00 slots."""
+    start = WEEK_START + timedelta(hours=10, minutes=30)
+    assert interval_to_slots(start, start + timedelta(hours=1), WEEK_START) == (10, 12)
+    # Exact slot boundaries do not spill over into the next slot
+    assert interval_to_slots(WEEK_START, WEEK_START + timedelta(hours=2), WEEK_START) == (0, 2)
+
+def test_merge_slot_ranges():
+    assert merge_slot_ranges([(5, 8), (0, 2), (1, 3), (7, 10), (10, 11)]) == [[0, 3], [5, 11]]
+
+def test_week_grid_bitset():
+    grid = WeekGrid(slot_minutes=15)
+    assert grid.total_slots == 672
+    grid.mark_busy(4, 8) # Monday 01:00 - 02:00
+    grid.mark_busy(6, 10)
+    assert grid.busy_count == 6
+    assert grid.available_hours == 168 - 1.5
+    assert not grid.is_available(9) and grid.is_available(10)
+    assert grid.slot_position(97) == (1, 0, 15) # Tuesday 00:15
+
+def test_week_grid_rejects_unsupported_slot_size():
+    with pytest.raises(ValueError):
+        WeekGrid(slot_minutes=20)
+
+@pytest.mark.parametrize("slot_minutes", [15, 30, 60])
+@pytest.mark.parametrize("seed,count", [(0, 0), (1, 1), (2, 10), (3, 100), (4, 1000)])
+def test_sweep_engine_matches_slot_scan(seed, count, slot_minutes):
+    """The sweep engine must produce exactly the grid of the reference slot-by-slot scan."""
+    intervals = random_intervals(seed, count)
+    sweep_grid = sweep_engine(intervals, WEEK_START, WEEK_END, slot_minutes)
+    assert sweep_grid == slot_scan_engine(intervals, WEEK_START, WEEK_END, slot_minutes)
+
+def test_interval_index_free_windows():
+    from planningAgent.engine import IntervalIndex
+    at = lambda day, hour, minute=0: WEEK_START + timedelta(days=day, hours=hour, minutes=minute)
+    index = IntervalIndex([
+        (at(0, 9), at(0, 10)),
+        (at(0, 9, 30), at(0, 12)), # Overlaps the previous one
+        (at(0, 13), at(0, 13, 30)),
+        (at(1, 0), at(1, 8)),
+    ])
+    assert index.busy == [[at(0, 9), at(0, 12)], [at(0, 13), at(0, 13, 30)], [at(1, 0), at(1, 8)]]
+
+    day_windows = index.free_windows(at(0, 0), at(1, 0), timedelta(hours=2))
+    assert day_windows == [(at(0, 0), at(0, 9)), (at(0, 13, 30), at(1, 0))]
+    # The 12:00 - 13:00 gap is exactly one hour long
+    assert (at(0, 12), at(0, 13)) in index.free_windows(at(0, 0), at(1, 0), timedelta(minutes=60))
+
+    working = index.free_windows(at(0, 0), at(7, 0), timedelta(hours=2), working_hours=(9 * 60, 17 * 60), weekdays_only=True)
+    assert working[0] == (at(0, 13, 30), at(0, 17))
+    assert (at(1, 9), at(1, 17)) in working
+    assert all(start.weekday() < 5 for start, _ in working)
+    assert len(working) == 5
+
+@pytest.mark.parametrize("slot_minutes", [15, 60])
+def test_common_availability_matches_per_user_grids(slot_minutes):
+    from planningAgent.engine import common_availability, iter_bit_runs
+    users = [random_intervals(seed, 15) for seed in range(5)]
+    common_free, free_counts, total_slots = common_availability(users, WEEK_START, WEEK_END, slot_minutes)
+
+    grids = [sweep_engine(intervals, WEEK_START, WEEK_END, slot_minutes) for intervals in users]
+    assert total_slots == grids[0].total_slots
+    for slot in range(total_slots):
+        free = [grid.is_available(slot) for grid in grids]
+        assert free_counts[slot] == sum(free)
+        assert bool((common_free >> slot) & 1) == all(free)
+
+    runs = list(iter_bit_runs(common_free))
+    assert sum(hi - lo for lo, hi in runs) == common_free.bit_count()
+    assert list(iter_bit_runs(0b1110011)) == [(0, 2), (4, 7)]
+
+@pytest.mark.parametrize("slot_minutes", [15, 30, 60])
+@pytest.mark.parametrize("seed,count", [(0, 0), (2, 10), (4, 1000)])
+def test_numpy_engine_matches_sweep(seed, count, slot_minutes):
+    pytest.importorskip("numpy")
+    from planningAgent.engine import numpy_engine
+    intervals = random_intervals(seed, count)
+    assert numpy_engine(intervals, WEEK_START, WEEK_END, slot_minutes) == sweep_engine(intervals, WEEK_START, WEEK_END, slot_minutes)
+
+def test_period_bounds():
+    pytest.importorskip("numpy")
+    from datetime import date
+    from planningAgent.vectorized import period_bounds
+    # 2025-10-08 is a Wednesday
+    assert period_bounds(date(2025, 10, 8), date(2025, 10, 20), 'week') == [
+        date(2025, 10, 8), date(2025, 10, 13), date(2025, 10, 20), date(2025, 10, 21)
+    ]
+    assert period_bounds(date(2025, 11, 15), date(2026, 1, 31), 'month') == [
+        date(2025, 11, 15), date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1)
+    ]
+    assert len(period_bounds(date(2025, 10, 8), date(2025, 10, 8), 'day')) == 2
+
+def recurring(start, duration=timedelta(hours=1), frequency='WEEKLY', **fields):
+    """An unsaved-model stand-in for planningAgent.recurrence."""
+    from types import SimpleNamespace
+    defaults = {'interval': 1, 'by_weekday': '', 'until': None, 'count': None, 'excluded_dates': []}
+    return SimpleNamespace(start_time=start, end_time=start + duration, frequency=frequency, **{**defaults, **fields})
+
+def naive_expansion(rule, window_start, window_end, horizon=2000):
+    """Reference: walk every candidate from the series start, no fast-forwarding."""
+    from planningAgent.recurrence import _candidate_starts, _local
+    from django.utils import timezone
+    first = _local(rule.start_time)
+    result = []
+    for index, naive_start in _candidate_starts(rule, first, first):
+        if index >= horizon or (rule.count is not None and index >= rule.count):
+            break
+        start = timezone.make_aware(naive_start)
+        if rule.until is not None and start > rule.until:
+            break
+        end = start + (rule.end_time - rule.start_time)
+        if naive_start.date().isoformat() not in rule.excluded_dates and start < window_end and end > window_start:
+            result.append((start, end))
+    return result
+
+@pytest.mark.parametrize('rule', [
+    recurring(datetime(2024, 1, 3, 9, tzinfo=dt_timezone.utc), by_weekday='MO,WE,FR', excluded_dates=['2025-10-08']),
+    recurring(datetime(2024, 1, 3, 9, tzinfo=dt_timezone.utc), by_weekday='TU,SU', interval=3, count=200),
+    recurring(datetime(2025, 9, 30, 22, tzinfo=dt_timezone.utc), timedelta(hours=8), frequency='DAILY', interval=2),
+    recurring(datetime(2025, 1, 31, 12, tzinfo=dt_timezone.utc), frequency='MONTHLY'),
+    recurring(datetime(2025, 1, 1, 7, tzinfo=dt_timezone.utc), frequency='DAILY',
+              until=datetime(2025, 10, 9, 7, tzinfo=dt_timezone.utc)),
+])
+def test_recurrence_expansion_matches_full_walk(rule):
+    from planningAgent.recurrence import occurrences
+    for window_start in (WEEK_START, WEEK_START + timedelta(days=3, hours=5), datetime(2025, 3, 31, tzinfo=dt_timezone.utc)):
+        window_end = window_start + timedelta(days=7)
+        assert list(occurrences(rule, window_start, window_end)) == naive_expansion(rule, window_start, window_end)
+
+def test_recurrence_details():
+    from planningAgent.recurrence import occurrences, series_end, format_rrule
+    # Monthly on the 31st skips the shorter months
+    monthly = recurring(datetime(2025, 1, 31, 12, tzinfo=dt_timezone.utc), frequency='MONTHLY', count=4)
+    starts = [start for start, _ in occurrences(monthly, monthly.start_time, datetime(2026, 1, 1, tzinfo=dt_timezone.utc))]
+    assert [start.month for start in starts] == [1, 3, 5, 7]
+    assert series_end(monthly) == datetime(2025, 7, 31, 13, tzinfo=dt_timezone.utc)
+
+    # The occurrence running over midnight into the window is included; COUNT includes excluded dates
+    nightly = recurring(datetime(2025, 10, 1, 22, tzinfo=dt_timezone.utc), timedelta(hours=8), frequency='DAILY',
+                        count=6, excluded_dates=['2025-10-06'])
+    assert [start.day for start, _ in occurrences(nightly, WEEK_START, WEEK_END)] == [5]
+    assert series_end(nightly) is not None and series_end(recurring(WEEK_START)) is None
+    assert format_rrule(recurring(WEEK_START, by_weekday='MO,FR', count=3)) == 'FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,FR;COUNT=3'
+
+def test_recurrence_keeps_local_time_across_dst(settings):
+    from planningAgent.recurrence import occurrences
+    from django.utils import timezone
+    settings.TIME_ZONE = 'Europe/Paris'
+    timezone.activate('Europe/Paris')
+    try:
+        rule = recurring(timezone.make_aware(datetime(2025, 10, 20, 9, 0)), by_weekday='MO')
+        window_start = timezone.make_aware(datetime(2025, 10, 27))
+        [(start, _)] = occurrences(rule, window_start, window_start + timedelta(days=7))
+        assert timezone.localtime(start).hour == 9 # Summer time ended in between
+        assert start.astimezone(dt_timezone.utc) - rule.start_time.astimezone(dt_timezone.utc) == timedelta(days=7, hours=1)
+    finally:
+        timezone.deactivate()
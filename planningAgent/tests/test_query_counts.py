@@ -0,0 +1,63 @@
+import pytest
+from datetime import date, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from planningAgent.models import AvailabilityReport
+from planningAgent.services import AvailabilityService
+
+# Query-count regression tests: list, retrieve and export must not issue per-report queries
+pytestmark = pytest.mark.django_db
+
+def create_reports(profile, count, legacy=0):
+    """Creates `count` weekly reports; the first `legacy` ones have detail rows but no packed bitmap."""
+    service = AvailabilityService(user_profile=profile, storage='rows')
+    reports = [service.calculate_availability_for_week(date(2025, 1, 6) + timedelta(weeks=week)) for week in range(count)]
+    AvailabilityReport.objects.filter(pk__in=[report.pk for report in reports[:legacy]]).update(availability_bitmap=None)
+    return reports
+
+def count_queries(client, url, params=None):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, params or {})
+        assert response.status_code == 200
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return len(context.captured_queries)
+
+def test_report_list_query_count_is_constant(api_client, profile, django_assert_max_num_queries):
+    create_reports(profile, 2, legacy=1)
+    few = count_queries(api_client, '/api/v1/availability/')
+    create_reports(profile, 10, legacy=5)
+    many = count_queries(api_client, '/api/v1/availability/')
+    assert few == many
+
+    # Profile, page count, reports (with the owner joined) and legacy detail rows
+    with django_assert_max_num_queries(4):
+        response = api_client.get('/api/v1/availability/', {'page_size': 100})
+    assert response.data['count'] == 12
+    # Legacy reports are decoded from their prefetched rows, the others from the bitmap
+    assert all(len(report['hourly_details']) == 168 for report in response.data['results'])
+
+def test_report_list_is_paginated(api_client, profile):
+    create_reports(profile, 3)
+    response = api_client.get('/api/v1/availability/', {'page_size': 2})
+    assert response.data['count'] == 3
+    assert len(response.data['results']) == 2
+    assert response.data['next'] is not None
+
+def test_retrieve_and_exports_query_counts(api_client, profile, django_assert_max_num_queries, monkeypatch):
+    from planningAgent.services import ArtifactService
+    monkeypatch.setattr(ArtifactService, '_submit', classmethod(lambda cls, fn, *args: None))
+    legacy, packed = create_reports(profile, 2, legacy=1)
+
+    for report in (legacy, packed):
+        with django_assert_max_num_queries(3):
+            api_client.get(f'/api/v1/availability/{report.pk}/')
+        # Report lookup, artifact lookup and streaming: no per-slot or per-relation queries
+        assert count_queries(api_client, f'/api/v1/availability/{report.pk}/export-csv/') <= 5
+        # The PDF is rendered and stored inline on the first request
+        assert count_queries(api_client, f'/api/v1/availability/{report.pk}/export-pdf/') <= 10
+
+    few = count_queries(api_client, '/api/v1/availability/export-csv-range/', {'start_date': '2025-01-06', 'end_date': '2025-01-13'})
+    create_reports(profile, 6, legacy=3)
+    many = count_queries(api_client, '/api/v1/availability/export-csv-range/', {'start_date': '2025-01-06', 'end_date': '2025-02-16'})
+    assert few == many
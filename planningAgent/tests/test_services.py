@@ -1,7 +1,9 @@
 import pytest
 from datetime import datetime, timedelta, date
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.utils import timezone
+from io import StringIO
 from  planningAgent.models import *
 from planningAgent.services import *
 
@@ -84,4 +86,454 @@ def test_availability_service_partial_hour_event(setup_user_and_profile):
     # Check specific hours
     assert not report.hourly_details.get(day_of_week=0, hour_of_day=10).is_available
     assert not report.hourly_details.get(day_of_week=0, hour_of_day=11).is_available
-    assert report.hourly_details.get(day_of_week=0, hour_of_day=9).is_available # Check adjacent hour is free
\ No newline at end of file
+    assert report.hourly_details.get(day_of_week=0, hour_of_day=9).is_available # Check adjacent hour is free
+def test_availability_service_engines_parity(setup_user_and_profile):
+    """The sweep and scan engines produce identical reports and hourly details."""
+    profile = setup_user_and_profile
+    create_entry(profile, EventCategory.SLEEP, datetime(2025, 10, 5, 22, 0), datetime(2025, 10, 6, 7, 0))
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 8, 9, 15), datetime(2025, 10, 8, 10, 45))
+    create_entry(profile, EventCategory.WORK, datetime(2025, 10, 8, 10, 0), datetime(2025, 10, 8, 17, 0))
+    create_entry(profile, EventCategory.GYM, datetime(2025, 10, 12, 23, 30), datetime(2025, 10, 13, 1, 0))
+
+    test_date = date(2025, 10, 8)
+    sweep_report = AvailabilityService(user_profile=profile, engine='sweep').calculate_availability_for_week(test_date)
+    scan_report = AvailabilityService(user_profile=profile, engine='scan').calculate_availability_for_week(test_date)
+
+    assert sweep_report.total_available_hours == scan_report.total_available_hours == 168 - 7 - 8 - 1
+    assert sweep_report.availability_ratio == scan_report.availability_ratio
+    fields = ('day_of_week', 'hour_of_day', 'minute_of_hour', 'is_available')
+    assert list(sweep_report.hourly_details.values_list(*fields)) == list(scan_report.hourly_details.values_list(*fields))
+
+def test_availability_service_quarter_hour_slots(setup_user_and_profile):
+    """With 15-minute slots a 10:30 - 11:30 event only blocks the four quarters it covers."""
+    profile = setup_user_and_profile
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 6, 10, 30), datetime(2025, 10, 6, 11, 30))
+
+    service = AvailabilityService(user_profile=profile, slot_minutes=15)
+    report = service.calculate_availability_for_week(date(2025, 10, 6))
+
+    assert report.slot_minutes == 15
+    assert report.total_available_hours == 167.0
+    assert report.hourly_details.count() == 672
+    assert report.hourly_details.filter(is_available=False).count() == 4
+    assert report.hourly_details.get(day_of_week=0, hour_of_day=10, minute_of_hour=15).is_available
+    assert not report.hourly_details.get(day_of_week=0, hour_of_day=10, minute_of_hour=30).is_available
+
+def test_packed_storage_matches_detail_rows(setup_user_and_profile):
+    """Packed reports skip the detail rows but serialize and export exactly like row-backed ones."""
+    from planningAgent.serializers import AvailabilityReportSerializer
+    profile = setup_user_and_profile
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 6, 10, 30), datetime(2025, 10, 6, 11, 30))
+    create_entry(profile, EventCategory.SLEEP, datetime(2025, 10, 9, 0, 0), datetime(2025, 10, 9, 8, 0))
+
+    rows_report = AvailabilityService(user_profile=profile, storage='rows').calculate_availability_for_week(date(2025, 10, 6))
+    packed_report = AvailabilityService(user_profile=profile, storage='packed').calculate_availability_for_week(date(2025, 10, 6))
+
+    assert packed_report.hourly_details.count() == 0
+    assert packed_report.get_grid() == rows_report.get_grid()
+    # The legacy row-based decoding agrees with the bitmap
+    rows_report.availability_bitmap = None
+    assert rows_report.get_grid() == packed_report.get_grid()
+
+    rows_data = AvailabilityReportSerializer(rows_report).data
+    packed_data = AvailabilityReportSerializer(packed_report).data
+    assert rows_data['hourly_details'] == packed_data['hourly_details']
+    assert len(packed_data['hourly_details']) == 168
+    assert ExportService(rows_report)._get_report_data() == ExportService(packed_report)._get_report_data()
+
+def test_get_or_calculate_reuses_report_until_calendar_changes(setup_user_and_profile, django_capture_on_commit_callbacks):
+    """The memoized path returns the same report until an entry of that week is written."""
+    profile = setup_user_and_profile
+    service = AvailabilityService(user_profile=profile)
+    with django_capture_on_commit_callbacks(execute=True):
+        entry = create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 6, 10, 0), datetime(2025, 10, 6, 11, 0))
+
+    report, created = service.get_or_calculate_for_week(date(2025, 10, 8))
+    assert created
+    assert service.get_or_calculate_for_week(date(2025, 10, 6)) == (report, False)
+    # A different slot size is a different report
+    assert AvailabilityService(user_profile=profile, slot_minutes=30).get_or_calculate_for_week(date(2025, 10, 6))[1]
+
+    # Editing an entry of another week leaves this week's report untouched
+    with django_capture_on_commit_callbacks(execute=True):
+        create_entry(profile, EventCategory.GYM, datetime(2025, 10, 14, 7, 0), datetime(2025, 10, 14, 8, 0))
+    assert service.get_or_calculate_for_week(date(2025, 10, 6)) == (report, False)
+
+    # Moving the entry out of the week invalidates it
+    with django_capture_on_commit_callbacks(execute=True):
+        entry.start_time += timedelta(days=7)
+        entry.end_time += timedelta(days=7)
+        entry.save()
+    new_report, created = service.get_or_calculate_for_week(date(2025, 10, 6))
+    assert created and new_report.pk != report.pk
+    assert new_report.total_available_hours == 168.0
+
+def test_incremental_updates_patch_latest_reports(setup_user_and_profile, settings, django_capture_on_commit_callbacks):
+    """Entry writes patch the latest report of every touched week in place, matching a full recompute."""
+    settings.AVAILABILITY_INCREMENTAL_UPDATES = True
+    profile = setup_user_and_profile
+    service = AvailabilityService(user_profile=profile)
+    week1 = service.calculate_availability_for_week(date(2025, 10, 6))
+    week2 = service.calculate_availability_for_week(date(2025, 10, 13))
+
+    def assert_fresh(report):
+        report.refresh_from_db()
+        fresh = service.calculate_availability_for_week(report.start_week)
+        assert report.get_grid() == fresh.get_grid()
+        assert report.total_available_hours == fresh.total_available_hours
+        assert report.entries_fingerprint == fresh.entries_fingerprint
+        assert report.category_hours == fresh.category_hours
+        assert float(report.weighted_availability_ratio) == fresh.weighted_availability_ratio
+        fields = ('day_of_week', 'hour_of_day', 'minute_of_hour', 'is_available')
+        assert list(report.hourly_details.values_list(*fields)) == list(fresh.hourly_details.values_list(*fields))
+        fresh.delete()
+
+    # An entry spanning Sunday night into Monday touches both weeks
+    with django_capture_on_commit_callbacks(execute=True):
+        entry = create_entry(profile, EventCategory.SLEEP, datetime(2025, 10, 12, 22, 0), datetime(2025, 10, 13, 6, 30))
+    assert_fresh(week1)
+    assert_fresh(week2)
+    assert week1.total_available_hours == 166.0
+    assert week2.total_available_hours == 161.0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        entry.start_time = timezone.make_aware(datetime(2025, 10, 13, 1, 0))
+        entry.save()
+    assert_fresh(week1)
+    assert_fresh(week2)
+    assert week1.total_available_hours == 168.0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        entry.delete()
+    assert_fresh(week2)
+    assert week2.total_available_hours == 168.0
+    assert AvailabilityReport.objects.count() == 2 # Patched in place, no new reports
+
+def test_incremental_updates_patch_the_latest_report_of_each_slot_size(setup_user_and_profile, settings, django_capture_on_commit_callbacks):
+    """A week with 15- and 60-minute reports gets both latest reports patched, each at its own slot size."""
+    settings.AVAILABILITY_INCREMENTAL_UPDATES = True
+    profile = setup_user_and_profile
+    hourly = AvailabilityService(profile, slot_minutes=60)
+    quarterly = AvailabilityService(profile, slot_minutes=15)
+    superseded = hourly.calculate_availability_for_week(date(2025, 10, 6))
+    latest = {60: hourly.calculate_availability_for_week(date(2025, 10, 6)),
+              15: quarterly.calculate_availability_for_week(date(2025, 10, 6))}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 7, 9, 15), datetime(2025, 10, 7, 10, 0))
+
+    for slot_minutes, report in latest.items():
+        report.refresh_from_db()
+        fresh = AvailabilityService(profile, slot_minutes=slot_minutes).calculate_availability_for_week(date(2025, 10, 6))
+        assert report.get_grid() == fresh.get_grid()
+        assert (report.category_hours, report.entries_fingerprint) == (fresh.category_hours, fresh.entries_fingerprint)
+    assert latest[15].total_available_hours == 167.25
+    assert latest[60].total_available_hours == 167
+    superseded.refresh_from_db()
+    assert superseded.total_available_hours == 168 # Only the latest report of each slot size is patched
+
+def test_incremental_updates_adjust_category_hours_in_the_touched_slots(setup_user_and_profile, settings, monkeypatch,
+                                                                         django_capture_on_commit_callbacks):
+    """Without weighted or excluded categories, a patch only sweeps the changed categories' rows under the write."""
+    settings.AVAILABILITY_INCREMENTAL_UPDATES = True
+    settings.AVAILABILITY_EXCLUDED_CATEGORIES = []
+    profile = setup_user_and_profile
+    for day in range(6, 13):
+        create_entry(profile, EventCategory.WORK, datetime(2025, 10, day, 9, 0), datetime(2025, 10, day, 17, 0))
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 7, 10, 0), datetime(2025, 10, 7, 11, 0))
+    service = AvailabilityService(profile, slot_minutes=30)
+    report = service.calculate_availability_for_week(date(2025, 10, 6))
+
+    swept = []
+    monkeypatch.setattr('planningAgent.services.category_masks',
+                        lambda rows, *args: swept.append(len(rows)) or category_masks(rows, *args))
+    with django_capture_on_commit_callbacks(execute=True):
+        # Overlaps the meeting and the Tuesday work block, then moves into the evening as another category
+        entry = create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 7, 10, 30), datetime(2025, 10, 7, 12, 0))
+    with django_capture_on_commit_callbacks(execute=True):
+        entry.category = EventCategory.GYM
+        entry.start_time = timezone.make_aware(datetime(2025, 10, 7, 16, 30))
+        entry.end_time = timezone.make_aware(datetime(2025, 10, 7, 18, 0))
+        entry.save()
+    assert swept and max(swept) <= 2 # Never the whole week's rows
+
+    monkeypatch.undo()
+    report.refresh_from_db()
+    fresh = service.calculate_availability_for_week(date(2025, 10, 6))
+    assert report.category_hours == fresh.category_hours == {'GYM': 1.5, 'MEET': 1.0, 'WORK': 56.0}
+    assert float(report.weighted_availability_ratio) == float(fresh.weighted_availability_ratio)
+    assert report.get_grid() == fresh.get_grid()
+
+def test_bulk_service_matches_weekly_service(setup_user_and_profile, django_assert_max_num_queries):
+    """The batch path produces the same reports as one weekly calculation per user and week."""
+    profile = setup_user_and_profile
+    other_user = User.objects.create_user(username='other', password='password')
+    other = UserProfile.objects.create(user=other_user, first_name='Other', last_name='User')
+    create_entry(profile, EventCategory.SLEEP, datetime(2025, 10, 12, 22, 0), datetime(2025, 10, 13, 6, 0))
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 21, 9, 30), datetime(2025, 10, 21, 11, 0))
+    create_entry(other, EventCategory.WORK, datetime(2025, 10, 7, 9, 0), datetime(2025, 10, 7, 17, 0))
+
+    # 1 entry query + 1 report insert + a few batched detail inserts (SQLite caps bind parameters)
+    # + 3 aggregate queries (day/week upsert, month sums, month upsert)
+    with django_assert_max_num_queries(15):
+        reports = BulkAvailabilityService([profile, other]).calculate_for_range(date(2025, 10, 8), date(2025, 10, 22))
+    assert len(reports) == 6 # 2 users * 3 weeks
+
+    fields = ('day_of_week', 'hour_of_day', 'minute_of_hour', 'is_available')
+    for report in reports:
+        expected = AvailabilityService(report.user_profile).calculate_availability_for_week(report.start_week)
+        assert report.total_available_hours == expected.total_available_hours
+        assert report.entries_fingerprint == expected.entries_fingerprint
+        assert report.category_hours == expected.category_hours
+        assert report.weighted_availability_ratio == expected.weighted_availability_ratio
+        assert list(report.hourly_details.values_list(*fields)) == list(expected.hourly_details.values_list(*fields))
+
+def test_bulk_service_rereads_ids_of_its_own_reports(setup_user_and_profile):
+    """Without ids from the bulk insert, reports are matched by created_at, not taken as the newest of their week."""
+    profile = setup_user_and_profile
+    service = BulkAvailabilityService([profile])
+    reports = service.calculate_for_range(date(2025, 10, 6), date(2025, 10, 19))
+    ids = [report.pk for report in reports]
+    # Another writer's report of the same week, inserted after the batch
+    AvailabilityService(profile).calculate_availability_for_week(date(2025, 10, 6))
+
+    for report in reports:
+        report.pk = None
+    service._fetch_report_ids(reports, service.weeks_in_range(date(2025, 10, 6), date(2025, 10, 19)))
+    assert [report.pk for report in reports] == ids
+
+def test_category_breakdown_and_weighted_ratio(setup_user_and_profile, settings):
+    """Per-category busy hours and the weighted ratio come out of the same calculation."""
+    settings.AVAILABILITY_EXCLUDED_CATEGORIES = ['SLEEP']
+    settings.AVAILABILITY_CATEGORY_WEIGHTS = {'GYM': 0.5}
+    profile = setup_user_and_profile
+    create_entry(profile, EventCategory.SLEEP, datetime(2025, 10, 6, 0, 0), datetime(2025, 10, 6, 8, 0))
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 6, 7, 0), datetime(2025, 10, 6, 9, 0))
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 7, 10, 0), datetime(2025, 10, 7, 11, 0))
+    create_entry(profile, EventCategory.GYM, datetime(2025, 10, 8, 18, 0), datetime(2025, 10, 8, 20, 0))
+
+    for engine in ('sweep', 'scan'):
+        report = AvailabilityService(user_profile=profile, engine=engine).calculate_availability_for_week(date(2025, 10, 6))
+        assert report.total_available_hours == 168 - 12
+        assert report.category_hours == {'GYM': 2.0, 'MEET': 3.0, 'SLEEP': 8.0}
+        # 07:00 - 08:00 is both sleep and a meeting: it counts as busy, not excluded.
+        # 161 hours considered, 3 meeting hours + 2 gym hours at half weight.
+        assert report.weighted_availability_ratio == round((161 - 3 - 1) / 161, 3)
+
+def test_export_service_streams_csv(setup_user_and_profile):
+    """The streamed CSV equals the buffered one; range streams emit one line per slot."""
+    profile = setup_user_and_profile
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 6, 10, 0), datetime(2025, 10, 6, 11, 0))
+    report = AvailabilityService(user_profile=profile).calculate_availability_for_week(date(2025, 10, 6))
+    AvailabilityService(user_profile=profile, slot_minutes=30).calculate_availability_for_week(date(2025, 10, 13))
+
+    export_service = ExportService(report)
+    assert b''.join(export_service.stream_csv()) == export_service.generate_csv()
+
+    lines = b''.join(ExportService.stream_reports_csv(AvailabilityReport.objects.order_by('start_week'))).decode().splitlines()
+    assert len(lines) == 1 + 168 + 336
+    assert lines[11] == "testuser,2025-10-06,60,Monday,10:00 - 11:00,Busy"
+    assert lines[-1] == "testuser,2025-10-13,30,Sunday,23:30 - 24:00,Available"
+
+def test_horizon_matches_weekly_reports(setup_user_and_profile):
+    """The vectorized horizon pass must agree with the per-week algorithm."""
+    pytest.importorskip("numpy")
+    profile = setup_user_and_profile
+    create_entry(profile, EventCategory.WORK, datetime(2025, 10, 5, 22, 0), datetime(2025, 10, 6, 9, 15))
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 15, 10, 30), datetime(2025, 10, 15, 11, 10))
+    create_entry(profile, EventCategory.SLEEP, datetime(2025, 10, 26, 23, 0), datetime(2025, 10, 28, 7, 0))
+
+    service = AvailabilityService(user_profile=profile, slot_minutes=15)
+    weeks = service.calculate_horizon(date(2025, 10, 6), date(2025, 11, 2), 'week')
+    assert [week['period_start'] for week in weeks] == [date(2025, 10, 6) + timedelta(weeks=i) for i in range(4)]
+    for week in weeks:
+        report = AvailabilityService(user_profile=profile, slot_minutes=15).calculate_availability_for_week(week['period_start'])
+        numpy_report = AvailabilityService(user_profile=profile, engine='numpy', slot_minutes=15).calculate_availability_for_week(week['period_start'])
+        assert numpy_report.get_grid() == report.get_grid()
+        assert report.total_available_hours == week['total_available_hours']
+        assert report.availability_ratio == pytest.approx(week['availability_ratio'])
+
+    days = service.calculate_horizon(date(2025, 10, 6), date(2025, 11, 2), 'day')
+    assert len(days) == 28
+    assert sum(day['total_available_hours'] for day in days) == sum(week['total_available_hours'] for week in weeks)
+    assert days[0]['total_available_hours'] == 24 - 9.25
+
+def test_job_service_retries_then_fails(setup_user_and_profile, settings, monkeypatch):
+    """Failed jobs go back to the queue until the attempt limit, and abandoned ones are recovered."""
+    settings.AVAILABILITY_JOB_MAX_ATTEMPTS = 2
+    profile = setup_user_and_profile
+    job = AvailabilityJobService.enqueue(profile, date(2025, 10, 6))
+    worker = AvailabilityJobService(worker_id='test')
+
+    def broken(self, target_date):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(AvailabilityService, 'get_or_calculate_for_week', broken)
+    assert worker.run_next().status == JobStatus.QUEUED
+    job = worker.run_next()
+    assert (job.status, job.attempts, job.error) == (JobStatus.FAILED, 2, "database went away")
+    assert worker.run_next() is None
+
+    monkeypatch.undo()
+    stale = AvailabilityJobService.enqueue(profile, date(2025, 10, 13))
+    worker.claim_next()
+    AvailabilityJob.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(hours=1))
+    assert AvailabilityJobService.requeue_stale() == 1
+    assert worker.run_next().status == JobStatus.SUCCEEDED
+
+def test_calendar_import_upserts_by_external_id(setup_user_and_profile, settings, django_capture_on_commit_callbacks):
+    from planningAgent.importers import iter_import_rows
+    profile = setup_user_and_profile
+    settings.AVAILABILITY_INCREMENTAL_UPDATES = True
+    service = AvailabilityService(user_profile=profile)
+    report = service.calculate_availability_for_week(date(2025, 10, 6))
+    csv_lines = [
+        "external_id,title,category,start_time,end_time\n",
+        "a,Standup,Meeting,2025-10-06T09:00,2025-10-06T10:00\n",
+        "b,Lunch,MEAL,2025-10-07T12:00,2025-10-07T13:00\n",
+        ",Gym,GYM,2025-10-08T18:00,2025-10-08T19:00\n",
+        "c,Broken,WORK,2025-10-08T18:00,2025-10-08T17:00\n",
+    ]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        summary = CalendarImportService(profile, chunk_size=2).import_rows(iter_import_rows(csv_lines, 'csv'))
+    assert (summary['created'], summary['updated'], summary['failed']) == (3, 0, 1)
+    assert summary['errors'] == [{'row': 5, 'external_id': 'c', 'errors': {'end_time': ["End time must occur after start time."]}}]
+    # Bulk writes send no signals: the import itself refreshed the latest report
+    report.refresh_from_db()
+    assert report.total_available_hours == 165
+
+    # Same file again: nothing changes; a moved entry is updated in place
+    csv_lines[1] = "a,Standup,MEET,2025-10-06T09:00,2025-10-06T11:00\n"
+    with django_capture_on_commit_callbacks(execute=True):
+        summary = CalendarImportService(profile).import_rows(iter_import_rows(csv_lines[:3], 'csv'))
+    assert (summary['created'], summary['updated'], summary['unchanged']) == (0, 1, 1)
+    assert CalendarEntry.objects.filter(user_profile=profile).count() == 3
+    report.refresh_from_db()
+    assert report.total_available_hours == 164
+
+def test_recurring_entries_are_expanded_per_week(setup_user_and_profile, django_capture_on_commit_callbacks):
+    profile = setup_user_and_profile
+    with django_capture_on_commit_callbacks(execute=True):
+        rule = RecurringEntry.objects.create(
+            user_profile=profile, category=EventCategory.WORK, title="Office",
+            start_time=timezone.make_aware(datetime(2025, 1, 6, 9)), end_time=timezone.make_aware(datetime(2025, 1, 6, 17)),
+            frequency='WEEKLY', by_weekday='MO,TU,WE,TH,FR'
+        )
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 11, 10), datetime(2025, 10, 11, 12))
+    service = AvailabilityService(user_profile=profile)
+
+    report, _ = service.get_or_calculate_for_week(date(2025, 10, 8))
+    assert report.total_available_hours == 168 - 5 * 8 - 2
+    assert report.category_hours == {'MEET': 2.0, 'WORK': 40.0}
+    [bulk_report] = BulkAvailabilityService([profile]).calculate_for_range(date(2025, 10, 6), date(2025, 10, 12))
+    assert bulk_report.availability_bitmap == report.availability_bitmap
+
+    # Editing the series invalidates the memoized week
+    with django_capture_on_commit_callbacks(execute=True):
+        rule.excluded_dates = ['2025-10-08']
+        rule.save()
+    report, created = service.get_or_calculate_for_week(date(2025, 10, 8))
+    assert created and report.total_available_hours == 168 - 4 * 8 - 2
+    assert AvailabilityService(user_profile=profile).calculate_availability_for_week(date(2024, 12, 30)).total_available_hours == 168
+
+def test_aggregates_follow_the_latest_report(setup_user_and_profile):
+    """Day, week and month aggregates are upserted with each report; a week straddling two months feeds both."""
+    profile = setup_user_and_profile
+    create_entry(profile, EventCategory.WORK, datetime(2025, 9, 30, 9, 0), datetime(2025, 9, 30, 17, 0))
+    create_entry(profile, EventCategory.WORK, datetime(2025, 10, 2, 9, 0), datetime(2025, 10, 2, 13, 0))
+    service = AvailabilityService(profile)
+    service.calculate_availability_for_week(date(2025, 9, 29))
+
+    def aggregate(period, period_start):
+        return AvailabilityAggregate.objects.get(user_profile=profile, period=period, period_start=period_start)
+
+    assert aggregate(AggregatePeriod.WEEK, date(2025, 9, 29)).busy_hours == 12
+    assert aggregate(AggregatePeriod.DAY, date(2025, 9, 30)).available_hours == 16
+    assert float(aggregate(AggregatePeriod.DAY, date(2025, 10, 2)).availability_ratio) == pytest.approx(20 / 24, abs=0.001)
+    september = aggregate(AggregatePeriod.MONTH, date(2025, 9, 1))
+    assert (september.total_hours, september.busy_hours) == (48, 8) # Sep 29-30 only
+    assert aggregate(AggregatePeriod.MONTH, date(2025, 10, 1)).busy_hours == 4
+
+    # A newer report of the same week replaces its contribution instead of adding to it
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 7, 10, 0), datetime(2025, 10, 7, 12, 0))
+    create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 3, 10, 0), datetime(2025, 10, 3, 12, 0))
+    service.calculate_availability_for_week(date(2025, 9, 29))
+    BulkAvailabilityService([profile]).calculate_for_range(date(2025, 10, 6), date(2025, 10, 12))
+    october = aggregate(AggregatePeriod.MONTH, date(2025, 10, 1))
+    assert (october.total_hours, october.busy_hours) == (24 * 12, 8)
+    assert AvailabilityAggregate.objects.filter(period=AggregatePeriod.WEEK).count() == 2
+    assert AvailabilityAggregate.objects.filter(period=AggregatePeriod.DAY).count() == 14
+
+def test_latest_report_is_the_newest_by_created_at(setup_user_and_profile):
+    """Exports, the aggregate rebuild and the memo agree on the latest report, even when ids disagree with created_at."""
+    profile = setup_user_and_profile
+    service = AvailabilityService(profile)
+    older = service.calculate_availability_for_week(date(2025, 10, 6))
+    create_entry(profile, EventCategory.WORK, datetime(2025, 10, 7, 9, 0), datetime(2025, 10, 7, 17, 0))
+    higher_id = service.calculate_availability_for_week(date(2025, 10, 6))
+    # e.g. rows copied in from another database: the lower id is the newer report
+    AvailabilityReport.objects.filter(pk=older.pk).update(created_at=higher_id.created_at + timedelta(minutes=1))
+
+    assert list(AvailabilityReport.objects.latest_per_week()) == [older]
+    call_command('rebuild_availability_aggregates', '--clear', stdout=StringIO())
+    week = AvailabilityAggregate.objects.get(user_profile=profile, period=AggregatePeriod.WEEK)
+    assert (week.report_id, week.busy_hours) == (older.pk, 0)
+    assert AvailabilityReport.objects.filter(user_profile=profile).newest_first().first() == older
+
+def test_report_retention_dedupes_and_keeps_the_newest(setup_user_and_profile):
+    """Compaction drops duplicates, then reports over the limit or too old, never the newest of a week."""
+    profile = setup_user_and_profile
+    service = AvailabilityService(profile)
+    week, other_week = date(2025, 10, 6), date(2025, 10, 13)
+    for _ in range(3):
+        service.calculate_availability_for_week(week)
+    create_entry(profile, EventCategory.WORK, datetime(2025, 10, 7, 9, 0), datetime(2025, 10, 7, 17, 0))
+    newest = service.calculate_availability_for_week(week)
+    old_reports = [service.calculate_availability_for_week(other_week) for _ in range(2)]
+    AvailabilityReport.objects.filter(pk__in=[report.pk for report in old_reports]).update(
+        created_at=timezone.now() - timedelta(days=90)
+    )
+
+    dry_run = ReportRetentionService(dry_run=True, batch_size=1).compact()
+    assert (dry_run['scanned'], dry_run['duplicate'], dry_run['reports_deleted'], dry_run['details_deleted']) == (6, 3, 3, 3 * 168)
+    assert AvailabilityReport.objects.count() == 6
+
+    summary = ReportRetentionService(max_age_days=30, dedupe=False).compact()
+    assert (summary['expired'], summary['reports_deleted']) == (1, 1) # The newest of an old week stays
+    assert not AvailabilityReport.objects.filter(pk=old_reports[0].pk).exists()
+
+    summary = ReportRetentionService(batch_size=1).compact()
+    assert (summary['duplicate'], summary['reports_deleted'], summary['details_deleted']) == (2, 2, 2 * 168)
+    assert AvailabilityReport.objects.filter(start_week=week).count() == 2 # The newest and one per older calendar
+
+    summary = ReportRetentionService(keep_latest=1).compact()
+    assert (summary['over_limit'], summary['reports_deleted']) == (1, 1)
+    assert set(AvailabilityReport.objects.values_list('pk', flat=True)) == {newest.pk, old_reports[1].pk}
+    assert AvailabilityHourlyDetail.objects.count() == 2 * 168
+
+def test_aggregates_are_kept_per_slot_size_and_follow_memo_hits(setup_user_and_profile, django_capture_on_commit_callbacks):
+    """Reports at another granularity do not overwrite the aggregates, and a reused report is re-recorded."""
+    profile = setup_user_and_profile
+    week = date(2025, 10, 6)
+    create_entry(profile, EventCategory.WORK, datetime(2025, 10, 7, 9, 0), datetime(2025, 10, 7, 9, 30))
+    AvailabilityService(profile, slot_minutes=60).calculate_availability_for_week(week)
+    AvailabilityService(profile, slot_minutes=30).calculate_availability_for_week(week)
+
+    def week_busy_hours(slot_minutes):
+        return AvailabilityAggregate.objects.get(user_profile=profile, period=AggregatePeriod.WEEK,
+                                                 slot_minutes=slot_minutes, period_start=week).busy_hours
+    assert (week_busy_hours(60), week_busy_hours(30)) == (1, 0.5)
+
+    # Calendar edited then reverted: the original report is reused and the aggregates follow it
+    service = AvailabilityService(profile, slot_minutes=60)
+    original, _ = service.get_or_calculate_for_week(week)
+    with django_capture_on_commit_callbacks(execute=True):
+        extra = create_entry(profile, EventCategory.MEETING, datetime(2025, 10, 8, 9, 0), datetime(2025, 10, 8, 12, 0))
+    assert service.get_or_calculate_for_week(week)[1]
+    assert week_busy_hours(60) == 4
+    with django_capture_on_commit_callbacks(execute=True):
+        extra.delete()
+    assert service.get_or_calculate_for_week(week) == (original, False)
+    assert week_busy_hours(60) == 1
+    assert AvailabilityAggregate.objects.get(user_profile=profile, period=AggregatePeriod.MONTH,
+                                             slot_minutes=60, period_start=date(2025, 10, 1)).busy_hours == 1
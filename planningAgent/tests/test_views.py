@@ -0,0 +1,350 @@
+import pytest
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from planningAgent.models import UserProfile
+from planningAgent.services import AvailabilityService
+
+pytestmark = pytest.mark.django_db
+
+def test_export_csv_range_streams_latest_report_per_week(api_client, profile):
+    service = AvailabilityService(user_profile=profile)
+    service.calculate_availability_for_week(date(2025, 10, 6))
+    latest = service.calculate_availability_for_week(date(2025, 10, 6))
+    service.calculate_availability_for_week(date(2025, 10, 13))
+    service.calculate_availability_for_week(date(2025, 12, 1)) # Outside the range
+
+    response = api_client.get('/api/v1/availability/export-csv-range/', {'start_date': '2025-10-08', 'end_date': '2025-10-19'})
+
+    assert response.status_code == 200
+    assert response.streaming
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert len(lines) == 1 + 2 * 168
+
+    response = api_client.get('/api/v1/availability/export-csv-range/', {'ids': str(latest.pk)})
+    assert len(b''.join(response.streaming_content).decode().splitlines()) == 1 + 168
+
+def test_export_range_limits_the_number_of_ids(api_client, settings):
+    settings.AVAILABILITY_MAX_RANGE_DAYS = 30
+    ids = ','.join(str(pk) for pk in range(1, 7))
+
+    response = api_client.get('/api/v1/availability/export-csv-range/', {'ids': ids})
+
+    assert (response.status_code, response.json()['detail']) == (400, "At most 5 reports can be exported at once.")
+    assert api_client.get('/api/v1/availability/export-pdf-range/', {'ids': ids}).status_code == 400
+    assert api_client.get('/api/v1/availability/export-csv-range/', {'ids': ids[:-2]}).status_code == 200
+
+def test_export_pdf_is_rendered_once_and_cached(api_client, profile, monkeypatch):
+    from planningAgent.services import ExportService
+    report = AvailabilityService(user_profile=profile).calculate_availability_for_week(date(2025, 10, 6))
+
+    response = api_client.get(f'/api/v1/availability/{report.pk}/export-pdf/')
+    assert response.status_code == 200
+    assert response.content.startswith(b'%PDF')
+
+    def fail(self):
+        raise AssertionError("The cached artifact should have been served")
+    monkeypatch.setattr(ExportService, 'generate_pdf', fail)
+    cached = api_client.get(f'/api/v1/availability/{report.pk}/export-pdf/')
+    assert cached.status_code == 200
+    assert cached.content == response.content
+    assert report.artifacts.count() == 1
+
+def test_content_hash_is_the_same_before_and_after_reload(profile):
+    """Artifacts pre-rendered from a fresh report must be found from the report loaded by the views."""
+    from datetime import datetime
+    from django.utils import timezone
+    from planningAgent.models import AvailabilityReport, CalendarEntry, EventCategory
+    from planningAgent.services import ArtifactService
+    # 137h available: the ratio 0.81547... is stored as 0.816 (4 significant digits, then 3 places)
+    CalendarEntry.objects.create(user_profile=profile, category=EventCategory.WORK, title="Work",
+                                 start_time=timezone.make_aware(datetime(2025, 10, 6, 0, 0)),
+                                 end_time=timezone.make_aware(datetime(2025, 10, 7, 7, 0)))
+    for slot_minutes in (15, 60):
+        report = AvailabilityService(user_profile=profile, slot_minutes=slot_minutes).calculate_availability_for_week(
+            date(2025, 10, 6))
+        reloaded = AvailabilityReport.objects.get(pk=report.pk)
+        assert ArtifactService(report).content_hash() == ArtifactService(reloaded).content_hash()
+
+def test_async_export_returns_202_until_rendered(api_client, profile, monkeypatch):
+    from planningAgent.services import ArtifactService
+    report = AvailabilityService(user_profile=profile).calculate_availability_for_week(date(2025, 10, 6))
+    submitted = []
+    monkeypatch.setattr(ArtifactService, '_submit', classmethod(lambda cls, fn, *args: submitted.append((fn, args))))
+
+    url = f'/api/v1/availability/{report.pk}/export-csv/'
+    response = api_client.get(url, {'async': 'true'})
+    assert response.status_code == 202
+    assert response['Location'] == response.data['poll_url']
+    assert api_client.get(url).status_code == 202 # Still rendering
+
+    fn, args = submitted.pop()
+    fn(*args)
+    response = api_client.get(url)
+    assert response.status_code == 200
+    assert response.content.startswith(b'REPORT SUMMARY')
+
+def test_export_render_survives_a_concurrent_render(api_client, profile, monkeypatch):
+    """When the background pool stores the same artifact first, the inline render updates its row."""
+    from django.db.models import QuerySet
+    from planningAgent.models import ReportArtifact, ArtifactKind
+    from planningAgent.services import ArtifactService
+    monkeypatch.setattr(ArtifactService, '_submit', classmethod(lambda cls, fn, *args: None))
+    report = AvailabilityService(user_profile=profile).calculate_availability_for_week(date(2025, 10, 6))
+    report.artifacts.all().delete()
+    report.refresh_from_db() # Hash the stored values, as the view does
+    content_hash = ArtifactService(report).content_hash()
+
+    update, raced = QuerySet.update, []
+    def update_then_lose_the_race(queryset, **kwargs):
+        if queryset.model is ReportArtifact and not raced:
+            # The background render inserts the row right after this update found nothing
+            raced.append(ReportArtifact.objects.create(report=report, kind=ArtifactKind.PDF, content_hash=content_hash))
+            return 0
+        return update(queryset, **kwargs)
+    monkeypatch.setattr(QuerySet, 'update', update_then_lose_the_race)
+
+    response = api_client.get(f'/api/v1/availability/{report.pk}/export-pdf/')
+    assert response.status_code == 200
+    assert response.content.startswith(b'%PDF')
+    assert raced
+    assert list(report.artifacts.values_list('status', flat=True)) == ['READY']
+
+def test_heatmap_pdf_exports(api_client, profile):
+    service = AvailabilityService(user_profile=profile)
+    report = service.calculate_availability_for_week(date(2025, 10, 6))
+    AvailabilityService(user_profile=profile, slot_minutes=15).calculate_availability_for_week(date(2025, 10, 13))
+
+    response = api_client.get(f'/api/v1/availability/{report.pk}/export-pdf/', {'layout': 'heatmap'})
+    assert response.status_code == 200
+    assert response.content.startswith(b'%PDF')
+    assert response.content.count(b'/Type /Page\n') == 1
+
+    response = api_client.get('/api/v1/availability/export-pdf-range/', {'start_date': '2025-10-06', 'end_date': '2025-10-19'})
+    assert response.status_code == 200
+    assert response.content.count(b'/Type /Page\n') == 2 # One page per week
+
+def test_free_slots_endpoint(api_client, profile):
+    from datetime import datetime
+    from django.utils import timezone
+    from planningAgent.models import CalendarEntry, EventCategory
+    CalendarEntry.objects.create(user_profile=profile, category=EventCategory.MEETING, title="Standup",
+                                 start_time=timezone.make_aware(datetime(2025, 10, 6, 10, 0)),
+                                 end_time=timezone.make_aware(datetime(2025, 10, 6, 15, 0)))
+
+    response = api_client.get('/api/v1/availability/free-slots/', {
+        'start_date': '2025-10-06', 'end_date': '2025-10-06', 'min_hours': 1, 'working_hours': '09:00-17:00',
+    })
+    assert response.status_code == 200
+    assert response.data['count'] == 2
+    assert [window['duration_hours'] for window in response.data['windows']] == [1.0, 2.0]
+
+    response = api_client.get('/api/v1/availability/free-slots/', {
+        'start_date': '2025-10-06', 'end_date': '2025-10-06', 'working_hours': '17:00-09:00',
+    })
+    assert response.status_code == 400
+
+    for min_hours in ('nan', 'inf', '-1', '1e12', 'abc'):
+        response = api_client.get('/api/v1/availability/free-slots/', {
+            'start_date': '2025-10-06', 'end_date': '2025-10-06', 'min_hours': min_hours,
+        })
+        assert response.status_code == 400, min_hours
+
+def test_common_availability_endpoint(api_client, profile):
+    from datetime import datetime
+    from django.utils import timezone
+    from planningAgent.models import CalendarEntry, EventCategory
+    other = UserProfile.objects.create(user=User.objects.create_user(username='other', password='password'),
+                                       first_name='Other', last_name='User')
+    at = lambda hour: timezone.make_aware(datetime(2025, 10, 6, hour, 0))
+    CalendarEntry.objects.create(user_profile=profile, category=EventCategory.MEETING, title="Standup",
+                                 start_time=at(9), end_time=at(11))
+    CalendarEntry.objects.create(user_profile=other, category=EventCategory.WORK, title="Focus",
+                                 start_time=at(13), end_time=at(16))
+
+    payload = {'profile_ids': [other.id], 'start_date': '2025-10-06', 'end_date': '2025-10-06',
+               'working_hours': '09:00-17:00'}
+    # Other users' calendars are only visible to staff
+    response = api_client.post('/api/v1/availability/common-availability/', payload, format='json')
+    assert response.status_code == 403
+    profile.user.is_staff = True
+    profile.user.save()
+
+    response = api_client.post('/api/v1/availability/common-availability/', payload, format='json')
+    assert response.status_code == 200
+    assert sorted(response.data['attendees']) == sorted([profile.id, other.id])
+    # Both are free 11:00 - 13:00 and 16:00 - 17:00
+    assert [window['duration_hours'] for window in response.data['windows']] == [2.0, 1.0]
+    assert len(response.data['free_counts']) == 24
+    assert response.data['free_counts'][9:17] == [1, 1, 2, 2, 1, 1, 1, 2]
+
+    response = api_client.post('/api/v1/availability/common-availability/', {
+        'profile_ids': [9999], 'start_date': '2025-10-06', 'end_date': '2025-10-06',
+    }, format='json')
+    assert response.status_code == 400
+    for profile_ids in ('12', ['abc'], [True], {'id': 1}):
+        response = api_client.post('/api/v1/availability/common-availability/', {
+            **payload, 'profile_ids': profile_ids,
+        }, format='json')
+        assert response.status_code == 400, profile_ids
+    response = api_client.post('/api/v1/availability/common-availability/', {**payload, 'min_hours': 'nan'}, format='json')
+    assert response.status_code == 400
+
+def test_calculate_range_for_own_or_other_profiles(api_client, profile):
+    other = UserProfile.objects.create(user=User.objects.create_user(username='other', password='password'),
+                                       first_name='Other', last_name='User')
+    payload = {'start_date': '2025-10-06', 'end_date': '2025-10-19'}
+
+    response = api_client.post('/api/v1/availability/calculate-range/', {**payload, 'profile_ids': [profile.id]}, format='json')
+    assert response.status_code == 201
+    assert len(response.data) == 2
+    for profile_ids in ([other.id], [profile.id, other.id]):
+        response = api_client.post('/api/v1/availability/calculate-range/', {**payload, 'profile_ids': profile_ids},
+                                   format='json')
+        assert response.status_code == 403, profile_ids
+
+def test_report_representations(api_client, profile):
+    import base64
+    from planningAgent.engine import WeekGrid
+    report = AvailabilityService(user_profile=profile).calculate_availability_for_week(date(2025, 10, 6))
+
+    summary = api_client.get('/api/v1/availability/', {'view': 'summary'}).data['results'][0]
+    assert summary['id'] == report.id
+    assert 'hourly_details' not in summary and 'busy_bitmap' not in summary
+
+    compact = api_client.get(f'/api/v1/availability/{report.pk}/', {'view': 'compact'}).data
+    assert 'hourly_details' not in compact
+    assert WeekGrid.from_bytes(base64.b64decode(compact['busy_bitmap'])) == report.get_grid()
+
+    full = api_client.get(f'/api/v1/availability/{report.pk}/').data
+    assert len(full['hourly_details']) == 168
+
+    assert api_client.get('/api/v1/availability/', {'view': 'everything'}).status_code == 400
+
+def test_async_calculation_job(api_client, profile):
+    from io import StringIO
+    from django.core.management import call_command
+    from planningAgent.models import AvailabilityJob, JobStatus
+
+    response = api_client.post('/api/v1/availability/calculate/', {'date': '2025-10-08', 'async': True}, format='json')
+    assert response.status_code == 202
+    assert response['Location'] == response.data['status_url']
+    job_id = response.data['id']
+    assert api_client.get(response['Location']).data['status'] == JobStatus.QUEUED
+
+    call_command('run_availability_worker', '--once', stdout=StringIO())
+
+    status_data = api_client.get(f'/api/v1/availability/jobs/{job_id}/').data
+    assert status_data['status'] == JobStatus.SUCCEEDED
+    assert status_data['run_seconds'] is not None
+    report = api_client.get(status_data['report_url']).data
+    assert report['start_week'] == '2025-10-06'
+    assert AvailabilityJob.objects.get(pk=job_id).attempts == 1
+
+def test_calendar_import_endpoint(api_client, profile):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from planningAgent.models import CalendarEntry, EventCategory
+
+    ics = (
+        "BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nUID:standup@example.com\r\nSUMMARY:Daily\r\n  standup\r\n"
+        "CATEGORIES:Team,Meeting\r\nDTSTART;TZID=Europe/Paris:20251006T090000\r\nDURATION:PT30M\r\n"
+        "END:VEVENT\r\nBEGIN:VEVENT\r\nUID:holiday@example.com\r\nSUMMARY:Holiday\r\n"
+        "DTSTART;VALUE=DATE:20251010\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n"
+    )
+    for _ in range(2):
+        response = api_client.post('/api/v1/calendar/import/', ics, content_type='text/calendar')
+        assert response.status_code == 200
+    assert (response.data['created'], response.data['unchanged']) == (0, 2)
+    standup = CalendarEntry.objects.get(external_id='standup@example.com')
+    assert (standup.title, standup.category) == ("Daily standup", EventCategory.MEETING)
+    assert standup.end_time - standup.start_time == timedelta(minutes=30)
+    assert standup.start_time.hour == 7 # 09:00 in Paris is 07:00 UTC in October
+    holiday = CalendarEntry.objects.get(external_id='holiday@example.com')
+    assert holiday.end_time - holiday.start_time == timedelta(days=1)
+
+    upload = SimpleUploadedFile('entries.ndjson', b'{"title": "Focus", "start_time": "2025-10-07T09:00:00Z", '
+                                                  b'"end_time": "2025-10-07T11:00:00Z"}\nnot json\n')
+    response = api_client.post('/api/v1/calendar/import/', {'file': upload}, format='multipart')
+    assert (response.data['created'], response.data['failed']) == (1, 1)
+    assert response.data['errors'][0]['row'] == 2
+
+    assert api_client.post('/api/v1/calendar/import/', '[{', content_type='application/json').status_code == 400
+    assert api_client.post('/api/v1/calendar/import/', 'a,b', content_type='text/plain').status_code == 400
+
+def test_instrumentation_metrics_and_server_timing(api_client, profile, settings):
+    from planningAgent import instrumentation
+    instrumentation.REGISTRY.reset()
+    assert 'Server-Timing' not in api_client.post('/api/v1/availability/calculate/', {'date': '2025-10-08'}, format='json')
+    assert api_client.get('/api/v1/metrics/').status_code == 404
+
+    settings.AVAILABILITY_INSTRUMENTATION = True
+    settings.AVAILABILITY_SERVER_TIMING = True
+    settings.AVAILABILITY_METRICS_TOKEN = 'scrape-me'
+    response = api_client.post('/api/v1/availability/calculate/', {'date': '2025-10-15'}, format='json')
+    assert response.status_code == 201
+    phases = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+    assert phases == ['db', 'availability.fetch_entries', 'availability.grid', 'availability.save',
+                      'availability.serialize', 'total']
+
+    assert api_client.get('/api/v1/metrics/').status_code == 403
+    response = api_client.get('/api/v1/metrics/', HTTP_AUTHORIZATION='Bearer scrape-me')
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    body = response.content.decode()
+    assert 'availability_phase_seconds_count{phase="availability.grid"} 1' in body
+    assert 'availability_slots_total 168' in body
+    assert '# TYPE availability_phase_queries_total counter' in body
+
+def test_recurring_entry_endpoints(api_client, profile):
+    payload = {'category': 'GYM', 'title': 'Gym', 'start_time': '2025-10-06T18:00:00Z', 'end_time': '2025-10-06T19:30:00Z',
+               'frequency': 'WEEKLY', 'by_weekday': 'fr, mo', 'count': 4}
+    response = api_client.post('/api/v1/recurring/', payload, format='json')
+    assert response.status_code == 201
+    assert response.data['rrule'] == 'FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,FR;COUNT=4'
+    assert response.data['series_end'] == '2025-10-17T19:30:00Z'
+
+    occurrences = api_client.get(f"/api/v1/recurring/{response.data['id']}/occurrences/",
+                                 {'start_date': '2025-10-01', 'end_date': '2025-12-31'}).json()
+    assert [occurrence['start_time'][:10] for occurrence in occurrences] == ['2025-10-06', '2025-10-10', '2025-10-13', '2025-10-17']
+
+    payload.update(until='2025-12-01T00:00:00Z')
+    assert 'count' in api_client.post('/api/v1/recurring/', payload, format='json').data
+    payload.update(until=None, frequency='DAILY')
+    assert 'by_weekday' in api_client.post('/api/v1/recurring/', payload, format='json').data
+
+def test_aggregates_endpoint(api_client, profile):
+    AvailabilityService(profile).calculate_availability_for_week(date(2025, 10, 6))
+    AvailabilityService(profile).calculate_availability_for_week(date(2025, 10, 20))
+
+    data = api_client.get('/api/v1/availability/aggregates/', {'start_date': '2025-10-01', 'end_date': '2025-10-31'}).json()
+    assert (data['period'], data['slot_minutes']) == ('week', 60)
+    assert [row['period_start'] for row in data['aggregates']] == ['2025-10-06', '2025-10-20']
+
+    days = api_client.get('/api/v1/availability/aggregates/',
+                          {'period': 'day', 'start_date': '2025-10-10', 'end_date': '2025-10-21'}).json()['aggregates']
+    assert [row['period_start'] for row in days] == ['2025-10-10', '2025-10-11', '2025-10-12', '2025-10-20', '2025-10-21']
+    assert api_client.get('/api/v1/availability/aggregates/', {'slot_minutes': 15, 'start_date': '2025-10-01',
+                                                               'end_date': '2025-10-31'}).json()['aggregates'] == []
+
+    assert api_client.get('/api/v1/availability/aggregates/', {'period': 'year', 'start_date': '2025-10-01',
+                                                               'end_date': '2025-10-31'}).status_code == 400
+    assert api_client.get('/api/v1/availability/aggregates/', {'start_date': '2025-10-31',
+                                                               'end_date': '2025-10-01'}).status_code == 400
+
+@pytest.mark.parametrize('method, url', [
+    ('get', '/api/v1/availability/free-slots/'),
+    ('get', '/api/v1/availability/horizon/'),
+    ('get', '/api/v1/availability/aggregates/'),
+    ('post', '/api/v1/availability/calculate-range/'),
+    ('post', '/api/v1/availability/common-availability/'),
+    ('get', '/api/v1/availability/export-csv-range/'),
+    ('get', '/api/v1/availability/export-pdf-range/'),
+])
+def test_range_endpoints_validate_ranges_alike(api_client, method, url, settings):
+    settings.AVAILABILITY_MAX_RANGE_DAYS = 30
+    cases = [
+        ({'start_date': '2025-10-31', 'end_date': '2025-10-01'}, "'end_date' must not be before 'start_date'."),
+        ({'start_date': '2025-10-01', 'end_date': '2025-12-01'}, "Date range is limited to 30 days."),
+        ({'start_date': '2025-13-01', 'end_date': '2025-12-01'}, "Missing or invalid 'start_date'/'end_date' parameters (YYYY-MM-DD)."),
+    ]
+    for params, detail in cases:
+        response = getattr(api_client, method)(url, params, **({'format': 'json'} if method == 'post' else {}))
+        assert (response.status_code, response.json()['detail']) == (400, detail)
@@ -9,10 +9,14 @@ from .views import (
     UserProfileView,
     HomeView,
     CalendarEntryViewSet,
-    AvailabilityReportViewSet
+    RecurringEntryViewSet,
+    AvailabilityReportViewSet,
+    metrics
 )
+from . import async_views
 router = DefaultRouter()
 router.register(r'calendar', CalendarEntryViewSet, basename='calendar')
+router.register(r'recurring', RecurringEntryViewSet, basename='recurring')
 router.register(r'availability', AvailabilityReportViewSet, basename='availability')
 
 urlpatterns = [
@@ -27,5 +31,14 @@ urlpatterns = [
     path('profile/', UserProfileView.as_view(), name='user-profile'),
     path('', include(router.urls)),
     path('', include(router.urls)),
+
+    # Prometheus scrape target (see planningAgent.instrumentation)
+    path('metrics/', metrics, name='metrics'),
+
+    # Async (ASGI) versions of the report endpoints
+    path('async/availability/calculate/', async_views.calculate_report, name='async-availability-calculate'),
+    path('async/availability/<int:pk>/', async_views.retrieve_report, name='async-availability-detail'),
+    path('async/availability/<int:pk>/export-csv/', async_views.export_csv, name='async-availability-export-csv'),
+    path('async/availability/<int:pk>/export-pdf/', async_views.export_pdf, name='async-availability-export-pdf'),
     # Calendar and Reporting endpoints will be added here later...
 ]
\ No newline at end of file
@@ -0,0 +1,84 @@
+# planning/vectorized.py
+"""
+NumPy implementation of the availability computation, for long horizons.
+
+Entry intervals are converted into slot indices in one vectorized step, and busy slots
+are marked with a difference array: +1 where an interval starts, -1 where it ends, and
+a cumulative sum gives the number of entries covering each slot. Availability per
+period (day, week, month) is then read from the cumulative sum of free slots at the
+period boundaries, so a year of 15-minute slots is computed in a single pass.
+
+NumPy is an optional dependency; this module is only imported by the 'numpy' engine
+and the horizon calculation.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from .engine import HORIZON_PERIODS
+
+
+def busy_slots(intervals, window_start, total_slots: int, slot_minutes: int) -> np.ndarray:
+    """Returns a boolean array with one item per slot of the window, True where the slot is busy."""
+    intervals = list(intervals)
+    if not intervals or total_slots <= 0:
+        return np.zeros(max(total_slots, 0), dtype=bool)
+
+    # 1. Offsets from the window start, in seconds
+    origin = window_start.timestamp()
+    starts = np.fromiter((start.timestamp() for start, _ in intervals), dtype=np.float64, count=len(intervals))
+    ends = np.fromiter((end.timestamp() for _, end in intervals), dtype=np.float64, count=len(intervals))
+    slot_seconds = slot_minutes * 60
+
+    # 2. Half-open slot ranges [lo, hi) touched by each interval, clamped to the window
+    lo = np.clip(np.floor((starts - origin) / slot_seconds), 0, total_slots).astype(np.int64)
+    hi = np.clip(np.ceil((ends - origin) / slot_seconds), 0, total_slots).astype(np.int64)
+    keep = lo < hi
+    lo, hi = lo[keep], hi[keep]
+
+    # 3. Difference array, then a running sum: a slot is busy when covered at least once
+    diff = np.bincount(lo, minlength=total_slots + 1) - np.bincount(hi, minlength=total_slots + 1)
+    return np.cumsum(diff[:total_slots]) > 0
+
+
+def pack_busy(busy: np.ndarray) -> bytes:
+    """Packs a busy array into the little-endian bitmap layout of WeekGrid.to_bytes()."""
+    return np.packbits(busy, bitorder='little').tobytes()
+
+
+def period_bounds(start_date: date, end_date: date, period: str):
+    """
+    Splits the inclusive date range into consecutive periods ('day', 'week' starting on
+    Monday, or calendar 'month'). The first and last periods are clipped to the range.
+    Returns the list of boundary dates: each period's first day, then end_date + 1 day.
+    """
+    if period not in HORIZON_PERIODS:
+        raise ValueError(f"Unknown period '{period}'. Choose from: {', '.join(HORIZON_PERIODS)}.")
+    bounds = [start_date]
+    current = start_date
+    stop = end_date + timedelta(days=1)
+    while True:
+        if period == 'day':
+            current = current + timedelta(days=1)
+        elif period == 'week':
+            current = current + timedelta(days=7 - current.weekday())
+        else:
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        if current >= stop:
+            break
+        bounds.append(current)
+    bounds.append(stop)
+    return bounds
+
+
+def period_availability(busy: np.ndarray, boundary_slots, slot_minutes: int):
+    """
+    Returns (total_hours, available_hours) arrays, one item per period, given the slot
+    index of every period boundary.
+    """
+    boundary_slots = np.asarray(boundary_slots, dtype=np.int64)
+    free_so_far = np.concatenate(([0], np.cumsum(~busy, dtype=np.int64)))
+    available_slots = free_so_far[boundary_slots[1:]] - free_so_far[boundary_slots[:-1]]
+    total_slots = np.diff(boundary_slots)
+    hours_per_slot = slot_minutes / 60
+    return total_slots * hours_per_slot, available_slots * hours_per_slot
@@ -3,22 +3,132 @@ from django.contrib.auth import authenticate, login, logout
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from drf_yasg.utils import no_body, swagger_auto_schema
 from rest_framework import viewsets
 from rest_framework import mixins
+from rest_framework import serializers
 from rest_framework.decorators import action
-from .services import AvailabilityService, ExportService
-from .models import AvailabilityReport
-from .serializers import AvailabilityReportSerializer
+from .services import AvailabilityService, BulkAvailabilityService, ExportService, ArtifactService, FreeSlotService
+from .services import CommonAvailabilityService, AvailabilityJobService, CalendarImportService
+from .importers import iter_import_rows, CONTENT_TYPES as IMPORT_CONTENT_TYPES
+from .importers import PARSERS as IMPORT_PARSERS
+from .engine import DEFAULT_SLOT_MINUTES, SLOT_MINUTES_CHOICES, HORIZON_PERIODS
+from .models import AvailabilityReport, UserProfile, ArtifactKind, ArtifactStatus, AvailabilityJob
+from .models import AvailabilityAggregate, AggregatePeriod
+from .serializers import AvailabilityReportSerializer, FreeWindowSerializer, HorizonPeriodSerializer
+from .serializers import REPORT_REPRESENTATIONS, AvailabilityJobSerializer, AvailabilityAggregateSerializer
+from .pagination import ReportPagination
+from . import instrumentation
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from .models import CalendarEntry
-from .serializers import CalendarEntrySerializer
-from datetime import datetime
-from django.http import HttpResponse
+from .models import CalendarEntry, RecurringEntry
+from .serializers import CalendarEntrySerializer, RecurringEntrySerializer
+from . import recurrence
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.utils import timezone
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ParseError
+from django.conf import settings
+import codecs
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_date(value):
+    """Parses a YYYY-MM-DD string, returning None when it is missing or invalid."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_bool(value):
+    """Interprets a request flag such as 'force' or 'async'."""
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def _parse_working_hours(value):
+    """Parses 'HH:MM-HH:MM' into (start, end) minutes since midnight, or None when invalid."""
+    try:
+        bounds = []
+        for part in value.split('-'):
+            hours, minutes = part.strip().split(':')
+            bounds.append(int(hours) * 60 + int(minutes))
+        start_minute, end_minute = bounds
+    except ValueError:
+        return None
+    if not 0 <= start_minute < end_minute <= 24 * 60:
+        return None
+    return start_minute, end_minute
+
+
+def _parse_slot_minutes(value):
+    """Returns the slot size as an int, or None when it is not one of the supported sizes."""
+    try:
+        slot_minutes = int(value)
+    except (TypeError, ValueError):
+        return None
+    return slot_minutes if slot_minutes in SLOT_MINUTES_CHOICES else None
+
+
+def _parse_min_hours(value):
+    """
+    Returns the minimum window length of a free-time search in hours, or None unless it is a
+    finite number between 0 (any window) and the longest range the searches accept.
+    """
+    try:
+        min_hours = float(value)
+    except (TypeError, ValueError):
+        return None
+    max_hours = (getattr(settings, 'AVAILABILITY_MAX_RANGE_DAYS', 366) + 1) * 24
+    return min_hours if math.isfinite(min_hours) and 0 <= min_hours <= max_hours else None
+
+
+_PROFILE_IDS_FIELD = serializers.ListField(child=serializers.IntegerField(min_value=1))
+
+
+def _parse_profile_ids(value):
+    """Returns the 'profile_ids' of a request as a set of ints (empty when absent), or None unless it is a list of ids."""
+    if value is None or value == '':
+        return set()
+    try:
+        return set(_PROFILE_IDS_FIELD.run_validation(value))
+    except serializers.ValidationError:
+        return None
+
+
+def _parse_range(params, with_slot_minutes=False):
+    """
+    Validates the 'start_date' and 'end_date' (YYYY-MM-DD, inclusive) of a range request
+    against AVAILABILITY_MAX_RANGE_DAYS and, with with_slot_minutes, its 'slot_minutes'.
+    Returns ((start_date, end_date, slot_minutes), None), or (None, a 400 Response).
+    """
+    def error(detail):
+        return None, Response({"detail": detail}, status=status.HTTP_400_BAD_REQUEST)
+
+    start_date = _parse_date(params.get('start_date'))
+    end_date = _parse_date(params.get('end_date'))
+    if start_date is None or end_date is None:
+        return error("Missing or invalid 'start_date'/'end_date' parameters (YYYY-MM-DD).")
+    if end_date < start_date:
+        return error("'end_date' must not be before 'start_date'.")
+    max_days = getattr(settings, 'AVAILABILITY_MAX_RANGE_DAYS', 366)
+    if (end_date - start_date).days > max_days:
+        return error(f"Date range is limited to {max_days} days.")
+    slot_minutes = None
+    if with_slot_minutes:
+        slot_minutes = _parse_slot_minutes(params.get('slot_minutes', DEFAULT_SLOT_MINUTES))
+        if slot_minutes is None:
+            return error(f"Invalid 'slot_minutes'. Choose from {', '.join(map(str, SLOT_MINUTES_CHOICES))}.")
+    return (start_date, end_date, slot_minutes), None
+
 class UserRegistrationView(APIView):
     """
     Handles POST requests for new user registration (Sign Up).
@@ -117,15 +227,103 @@ class CalendarEntryViewSet(viewsets.ModelViewSet):
         # Get the UserProfile from the request's authenticated user
         user_profile = self.request.user.profile
         serializer.save(user_profile=user_profile)
+
+    @swagger_auto_schema(method='post', request_body=no_body, manual_parameters=[openapi.Parameter(
+        'input_format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(IMPORT_PARSERS),
+        description="Payload format, when the Content-Type (or the uploaded file's extension) does not tell."
+    )])
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_entries(self, request):
+        """
+        POST /api/v1/calendar/import/
+        Bulk-imports entries from an ICS, CSV, JSON or NDJSON payload, sent either as the request
+        body (text/calendar, text/csv, application/json, application/x-ndjson) or as a multipart
+        'file' upload. The payload is read as a stream and written in batches. Entries with an
+        'external_id' (the UID in ICS files) replace the user's entry with the same id.
+        Invalid rows are reported in 'errors' and skipped; the other rows are imported.
+        """
+        file_format = request.query_params.get('input_format')
+        content_type = request.content_type.split(';')[0].strip().lower()
+        if content_type.startswith('multipart/'):
+            stream = request.FILES.get('file')
+            if stream is None:
+                raise ParseError("Missing 'file' upload.")
+            extension = stream.name.rsplit('.', 1)[-1].lower()
+            file_format = file_format or IMPORT_CONTENT_TYPES.get(stream.content_type) or extension
+        else:
+            # Read straight from the request body, without loading it into request.data
+            stream = request.stream
+            file_format = file_format or IMPORT_CONTENT_TYPES.get(content_type)
+        if file_format not in IMPORT_PARSERS:
+            raise ParseError(f"Unknown import format. Set 'input_format' to one of: {', '.join(IMPORT_PARSERS)}.")
+        if stream is None:
+            raise ParseError("The request body is empty.")
+
+        rows = iter_import_rows(codecs.iterdecode(stream, 'utf-8-sig'), file_format)
+        summary = CalendarImportService(request.user.profile).import_rows(rows)
+        # Nothing could be read: the payload itself is malformed
+        if summary['received'] == 0 and summary['errors']:
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
+class RecurringEntryViewSet(viewsets.ModelViewSet):
+    """
+    CRUD for recurring entries (GET/POST /api/v1/recurring/, GET/PUT/PATCH/DELETE /api/v1/recurring/{id}/).
+    A series is stored once and expanded into occurrences only for the calculated week.
+    """
+    serializer_class = RecurringEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return RecurringEntry.objects.filter(user_profile=self.request.user.profile)
+
+    def perform_create(self, serializer):
+        serializer.save(user_profile=self.request.user.profile)
+
+    @action(detail=True, methods=['get'])
+    def occurrences(self, request, pk=None):
+        """
+        GET /api/v1/recurring/{id}/occurrences/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
+        The occurrences of the series between the two dates (inclusive).
+        """
+        parsed, error = _parse_range(request.query_params)
+        if error is not None:
+            return error
+        start_date, end_date, _ = parsed
+
+        window_start, window_end = (
+            timezone.make_aware(datetime.combine(day, datetime.min.time()))
+            for day in (start_date, end_date + timedelta(days=1))
+        )
+        return Response([
+            {'start_time': start_time, 'end_time': end_time}
+            for start_time, end_time in recurrence.occurrences(self.get_object(), window_start, window_end)
+        ])
+
+
 class AvailabilityReportViewSet(mixins.ListModelMixin,
                                 mixins.RetrieveModelMixin,
                                 viewsets.GenericViewSet):
     serializer_class = AvailabilityReportSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ReportPagination
+
+    def _representation(self):
+        view = self.request.query_params.get('view', 'full')
+        if view not in REPORT_REPRESENTATIONS:
+            raise ParseError(f"Invalid 'view'. Choose from {', '.join(REPORT_REPRESENTATIONS)}.")
+        return view
+
+    def get_serializer_class(self):
+        return REPORT_REPRESENTATIONS[self._representation()]
 
     def get_queryset(self):
         user_profile = self.request.user.profile
-        return AvailabilityReport.objects.filter(user_profile=user_profile).order_by('-start_week')
+        reports = AvailabilityReport.objects.filter(user_profile=user_profile).order_by('-start_week', '-id')
+        if self.action == 'list' and self._representation() == 'summary':
+            # The grid is not serialized: skip the bitmap column and the legacy detail rows
+            return reports.defer('availability_bitmap')
+        # Owner and legacy detail rows are loaded up front: no per-report queries
+        return reports.with_grid_data()
 
     @action(detail=False, methods=['post'], url_path='calculate')
     def calculate_report(self, request):
@@ -138,38 +336,347 @@ class AvailabilityReportViewSet(mixins.ListModelMixin,
         except ValueError:
             return Response({"detail": "Invalid date format. Use YYYY-MM-DD."},
                             status=status.HTTP_400_BAD_REQUEST)
+        slot_minutes = _parse_slot_minutes(request.data.get('slot_minutes', DEFAULT_SLOT_MINUTES))
+        if slot_minutes is None:
+            return Response({"detail": f"Invalid 'slot_minutes'. Choose from {', '.join(map(str, SLOT_MINUTES_CHOICES))}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # 'force' skips the memoized report and always recalculates
+        force = _parse_bool(request.data.get('force'))
+        if _parse_bool(request.data.get('async')):
+            # Queue it for run_availability_worker and let the client poll the job
+            job = AvailabilityJobService.enqueue(request.user.profile, target_date, slot_minutes, force)
+            response = Response(AvailabilityJobSerializer(job, context={'request': request}).data,
+                                status=status.HTTP_202_ACCEPTED)
+            response['Location'] = response.data['status_url']
+            return response
         try:
-            service = AvailabilityService(user_profile=request.user.profile)
-            report = service.calculate_availability_for_week(target_date)
-            serializer = self.get_serializer(report)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            print(f"Error during availability calculation: {e}")
+            service = AvailabilityService(user_profile=request.user.profile, slot_minutes=slot_minutes)
+            if force:
+                report, created = service.calculate_availability_for_week(target_date), True
+            else:
+                report, created = service.get_or_calculate_for_week(target_date)
+            # Optionally render the exports in the background once the report is committed
+            prerender_kinds = getattr(settings, 'EXPORT_PRERENDER_KINDS', [])
+            if _parse_bool(request.data.get('prerender')):
+                prerender_kinds = [ArtifactKind.CSV, ArtifactKind.PDF]
+            if prerender_kinds:
+                transaction.on_commit(lambda: ArtifactService(report).schedule(prerender_kinds))
+            with instrumentation.span('availability.serialize'):
+                data = self.get_serializer(report).data
+            return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        except Exception:
+            logger.exception("Availability calculation failed for profile %s (week of %s)",
+                             request.user.profile.pk, target_date)
             return Response({"detail": "An internal error occurred during calculation."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>\d+)', url_name='job-status')
+    def job_status(self, request, job_id=None):
+        """Status and timings of a queued calculation, with a link to the report once it succeeded."""
+        job = AvailabilityJob.objects.filter(pk=job_id, user_profile=request.user.profile).first()
+        if job is None:
+            return Response({"detail": "Job not found or not authorized."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(AvailabilityJobSerializer(job, context={'request': request}).data)
+
+    @action(detail=False, methods=['post'], url_path='calculate-range')
+    def calculate_range(self, request):
+        """
+        Calculates one report per week between 'start_date' and 'end_date' (YYYY-MM-DD) in a
+        single batch. Staff users may pass 'profile_ids' to calculate for several users; other
+        users may only pass their own profile id.
+        """
+        parsed, error = _parse_range(request.data, with_slot_minutes=True)
+        if error is not None:
+            return error
+        start_date, end_date, slot_minutes = parsed
+
+        profile_ids = _parse_profile_ids(request.data.get('profile_ids'))
+        if profile_ids is None:
+            return Response({"detail": "'profile_ids' must be a list of profile ids."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if profile_ids:
+            if not request.user.is_staff and profile_ids != {request.user.profile.pk}:
+                return Response({"detail": "Only staff users can calculate reports for other profiles."},
+                                status=status.HTTP_403_FORBIDDEN)
+            profiles = list(UserProfile.objects.filter(pk__in=profile_ids))
+            if len(profiles) != len(profile_ids):
+                return Response({"detail": "Unknown profile id in 'profile_ids'."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        else:
+            profiles = [request.user.profile]
+
+        reports = BulkAvailabilityService(profiles, slot_minutes=slot_minutes).calculate_for_range(start_date, end_date)
+        serializer = self.get_serializer(reports, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='free-slots')
+    def free_slots(self, request):
+        """
+        Lists the free windows of at least 'min_hours' (default 1) between 'start_date' and
+        'end_date' (inclusive, YYYY-MM-DD). 'working_hours=HH:MM-HH:MM' and 'weekdays_only=true'
+        restrict the results to working time.
+        """
+        parsed, error = _parse_range(request.query_params)
+        if error is not None:
+            return error
+        start_date, end_date, _ = parsed
+        min_hours = _parse_min_hours(request.query_params.get('min_hours', 1))
+        if min_hours is None:
+            return Response({"detail": "'min_hours' must be a number of hours, 0 or more, within the date range limit."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        working_hours = None
+        if request.query_params.get('working_hours'):
+            working_hours = _parse_working_hours(request.query_params['working_hours'])
+            if working_hours is None:
+                return Response({"detail": "Invalid 'working_hours'. Use HH:MM-HH:MM, e.g. 09:00-17:00."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        start_dt = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        end_dt = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        windows = FreeSlotService(request.user.profile).find_free_windows(
+            start_dt, end_dt, timedelta(hours=min_hours), working_hours,
+            _parse_bool(request.query_params.get('weekdays_only'))
+        )
+        serializer = FreeWindowSerializer([{'start': start, 'end': end} for start, end in windows], many=True)
+        return Response({"count": len(windows), "windows": serializer.data})
+
+    @action(detail=False, methods=['get'], url_path='horizon')
+    def horizon(self, request):
+        """
+        Returns the availability ratio of every 'period' (day, week or month; default week)
+        between 'start_date' and 'end_date' (inclusive, YYYY-MM-DD), computed in one
+        vectorized pass without creating reports. Requires NumPy, an optional dependency of the
+        server: without it the endpoint answers 501.
+        """
+        parsed, error = _parse_range(request.query_params, with_slot_minutes=True)
+        if error is not None:
+            return error
+        start_date, end_date, slot_minutes = parsed
+        period = request.query_params.get('period', 'week')
+        if period not in HORIZON_PERIODS:
+            return Response({"detail": f"Invalid 'period'. Choose from {', '.join(HORIZON_PERIODS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        service = AvailabilityService(request.user.profile, slot_minutes=slot_minutes)
+        try:
+            periods = service.calculate_horizon(start_date, end_date, period)
+        except ImportError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        serializer = HorizonPeriodSerializer(periods, many=True)
+        return Response({"period": period, "slot_minutes": slot_minutes, "periods": serializer.data})
+
+    @action(detail=False, methods=['get'], url_path='aggregates')
+    def aggregates(self, request):
+        """
+        Returns the maintained daily, weekly or monthly aggregates ('period': day, week or month;
+        default week) of the user's reports at 'slot_minutes' (default 60) starting between
+        'start_date' and 'end_date' (inclusive, YYYY-MM-DD). Only weeks that have a report are
+        covered; each uses its latest report. Reads the aggregate table only, so long ranges
+        stay cheap.
+        """
+        parsed, error = _parse_range(request.query_params, with_slot_minutes=True)
+        if error is not None:
+            return error
+        start_date, end_date, slot_minutes = parsed
+        period = request.query_params.get('period', 'week').upper()
+        if period not in AggregatePeriod.values:
+            return Response({"detail": f"Invalid 'period'. Choose from {', '.join(HORIZON_PERIODS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        aggregates = AvailabilityAggregate.objects.filter(
+            user_profile=request.user.profile,
+            period=period,
+            slot_minutes=slot_minutes,
+            period_start__gte=start_date,
+            period_start__lte=end_date
+        ).order_by('period_start')
+        serializer = AvailabilityAggregateSerializer(aggregates, many=True)
+        return Response({"period": period.lower(), "slot_minutes": slot_minutes, "aggregates": serializer.data})
+
+    @action(detail=False, methods=['post'], url_path='common-availability')
+    def common_availability(self, request):
+        """
+        Finds the windows where the current user and every profile in 'profile_ids' (staff
+        users only) are all free between 'start_date' and 'end_date' (inclusive, YYYY-MM-DD). Accepts the same
+        'min_hours', 'working_hours' and 'weekdays_only' filters as free-slots, plus
+        'slot_minutes'. 'free_counts' gives the number of free attendees for every slot.
+        """
+        parsed, error = _parse_range(request.data, with_slot_minutes=True)
+        if error is not None:
+            return error
+        start_date, end_date, slot_minutes = parsed
+        min_hours = _parse_min_hours(request.data.get('min_hours', 1))
+        if min_hours is None:
+            return Response({"detail": "'min_hours' must be a number of hours, 0 or more, within the date range limit."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        working_hours = None
+        if request.data.get('working_hours'):
+            working_hours = _parse_working_hours(request.data['working_hours'])
+            if working_hours is None:
+                return Response({"detail": "Invalid 'working_hours'. Use HH:MM-HH:MM, e.g. 09:00-17:00."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        profile_ids = _parse_profile_ids(request.data.get('profile_ids'))
+        if profile_ids is None:
+            return Response({"detail": "'profile_ids' must be a list of profile ids."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # The requesting user is always an attendee; only staff may read other users' calendars
+        profile_ids.add(request.user.profile.id)
+        if len(profile_ids) > 1 and not request.user.is_staff:
+            return Response({"detail": "Only staff users can search the availability of other profiles."},
+                            status=status.HTTP_403_FORBIDDEN)
+        max_attendees = getattr(settings, 'AVAILABILITY_MAX_ATTENDEES', 50)
+        if len(profile_ids) > max_attendees:
+            return Response({"detail": f"At most {max_attendees} attendees are supported."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        profiles = list(UserProfile.objects.filter(pk__in=profile_ids).order_by('pk'))
+        if len(profiles) != len(profile_ids):
+            return Response({"detail": "Unknown profile id in 'profile_ids'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        start_dt = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        end_dt = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        result = CommonAvailabilityService(profiles, slot_minutes).calculate(
+            start_dt, end_dt, timedelta(hours=min_hours), working_hours,
+            _parse_bool(request.data.get('weekdays_only'))
+        )
+        windows = FreeWindowSerializer(
+            [{'start': start, 'end': end} for start, end in result['common_windows']], many=True
+        )
+        return Response({
+            "attendees": result['attendees'],
+            "start": start_dt,
+            "slot_minutes": slot_minutes,
+            "count": len(windows.data),
+            "windows": windows.data,
+            "free_counts": result['free_counts'],
+        })
+
     @action(detail=True, methods=['get'], url_path='export-csv')
     def export_csv(self, request, pk=None):
         try:
             report = self.get_object()
         except NotFound:
             return Response({"detail": "Report not found or not authorized."}, status=status.HTTP_404_NOT_FOUND)
-        export_service = ExportService(report=report)
-        csv_data = export_service.generate_csv()
         filename = f"availability_report_{report.start_week}_{report.id}.csv"
-        response = HttpResponse(csv_data, content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename=\"{filename}\"'
+        response = self._cached_export(request, report, ArtifactKind.CSV)
+        if response is None:
+            # Not pre-rendered: stream it rather than holding the whole file in memory
+            export_service = ExportService(report=report)
+            response = StreamingHttpResponse(export_service.stream_csv(), content_type='text/csv')
+        if response.status_code == status.HTTP_200_OK:
+            response['Content-Disposition'] = f'attachment; filename=\"{filename}\"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='export-csv-range')
+    def export_csv_range(self, request):
+        """
+        Streams the latest report of every week between 'start_date' and 'end_date'
+        (YYYY-MM-DD query parameters), or the reports listed in 'ids', as one CSV download.
+        """
+        reports, name = self._reports_for_range_export(request)
+        response = StreamingHttpResponse(ExportService.stream_reports_csv(reports), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename=\"{name}.csv\"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='export-pdf-range')
+    def export_pdf_range(self, request):
+        """Same selection as export-csv-range, rendered as one compact heatmap page per week."""
+        reports, name = self._reports_for_range_export(request)
+        pdf_data = ExportService.render_heatmap_pdf(
+            reports.with_grid_data().iterator(chunk_size=ExportService.STREAM_CHUNK_SIZE)
+        )
+        response = HttpResponse(pdf_data, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename=\"{name}.pdf\"'
         return response
 
+    def _reports_for_range_export(self, request):
+        """Returns the reports selected by the 'ids' or 'start_date'/'end_date' query parameters and a file name."""
+        # The exporters load the related data themselves, chunk by chunk
+        reports = AvailabilityReport.objects.filter(user_profile=request.user.profile)
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                ids = {int(pk) for pk in ids.split(',')}
+            except ValueError:
+                raise ParseError("'ids' must be a comma-separated list of report ids.")
+            # As many reports as there are weeks in the longest range accepted below
+            max_reports = getattr(settings, 'AVAILABILITY_MAX_RANGE_DAYS', 366) // 7 + 1
+            if len(ids) > max_reports:
+                raise ParseError(f"At most {max_reports} reports can be exported at once.")
+            reports = reports.filter(pk__in=ids)
+            name = "availability_reports"
+        else:
+            parsed, error = _parse_range(request.query_params)
+            if error is not None:
+                raise ParseError(error.data['detail'])
+            start_date, end_date, _ = parsed
+            reports = reports.filter(start_week__gte=start_date - timedelta(days=start_date.weekday()),
+                                     start_week__lte=end_date)
+            # Recalculated weeks have several reports: only export the latest one per week and slot size
+            reports = reports.latest_per_week()
+            name = f"availability_reports_{start_date}_{end_date}"
+        return reports.order_by('start_week', 'slot_minutes', 'id'), name
+
     @action(detail=True, methods=['get'], url_path='export-pdf')
     def export_pdf(self, request, pk=None):
         try:
             report = self.get_object()
         except NotFound:
             return Response({"detail": "Report not found or not authorized."}, status=status.HTTP_404_NOT_FOUND)
-        export_service = ExportService(report=report)
-        pdf_data = export_service.generate_pdf()
         filename = f"availability_report_{report.start_week}_{report.id}.pdf"
-        response = HttpResponse(pdf_data, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=\"{filename}\"'
-        return response
\ No newline at end of file
+        # 'layout=heatmap' renders the compact one-page heatmap instead of the hourly table
+        kind = ArtifactKind.HEATMAP_PDF if request.query_params.get('layout') == 'heatmap' else ArtifactKind.PDF
+        response = self._cached_export(request, report, kind)
+        if response is None:
+            artifact = ArtifactService(report).render(kind)
+            if artifact.status != ArtifactStatus.READY:
+                return Response({"detail": "An internal error occurred while rendering the PDF."},
+                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            response = HttpResponse(bytes(artifact.data), content_type='application/pdf')
+        if response.status_code == status.HTTP_200_OK:
+            response['Content-Disposition'] = f'attachment; filename=\"{filename}\"'
+        return response
+
+    def _cached_export(self, request, report, kind):
+        """
+        Serves the cached artifact of an export, or answers 202 with a poll URL while it is
+        rendering in the background (?async=true starts a background render).
+        Returns None when the caller should produce the export inline.
+        """
+        artifact_service = ArtifactService(report)
+        artifact = artifact_service.lookup(kind)
+        if artifact is not None and artifact.status == ArtifactStatus.READY:
+            content_type = 'text/csv' if kind == ArtifactKind.CSV else 'application/pdf'
+            return HttpResponse(bytes(artifact.data), content_type=content_type)
+
+        rendering = (artifact is not None and artifact.status == ArtifactStatus.PENDING
+                     and not artifact_service.is_stale(artifact))
+        if not rendering and _parse_bool(request.query_params.get('async')):
+            artifact_service.schedule([kind])
+            rendering = True
+        if not rendering:
+            return None
+
+        poll_url = request.build_absolute_uri()
+        response = Response({"status": ArtifactStatus.PENDING, "poll_url": poll_url}, status=status.HTTP_202_ACCEPTED)
+        response['Location'] = poll_url
+        response['Retry-After'] = '1'
+        return response
+
+
+def metrics(request):
+    """
+    GET /api/v1/metrics/
+    Instrumentation counters and timings in the Prometheus text format. Available when
+    AVAILABILITY_INSTRUMENTATION is on, to staff users or with the bearer token set in
+    AVAILABILITY_METRICS_TOKEN (for the Prometheus scraper).
+    """
+    if not instrumentation.enabled():
+        raise Http404("Instrumentation is disabled.")
+    token = getattr(settings, 'AVAILABILITY_METRICS_TOKEN', '')
+    authorized = request.user.is_staff or (
+        token and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+    )
+    if not authorized:
+        return HttpResponse("Forbidden.\n", status=status.HTTP_403_FORBIDDEN, content_type='text/plain')
+    return HttpResponse(instrumentation.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')